@@ -1,23 +1,50 @@
+import time
 import streamlit as st
 import pandas as pd
-import google.generativeai as genai
-import razorpay
-from dotenv import load_dotenv
-import os
+from ledger import get_ledger, add_member, add_expense, add_payment
+from money import HOME_CURRENCY, to_paise, to_rupees, format_inr
+from export import ExportCache, lazy_download_button
+from expense_index import ExpenseIndex, paginated_expense_table
+from splits import encode, split_members
+from model import compact_group
+from clients import get_genai, get_razorpay_client
+from insights import InsightsService, summarize_group
+from payments import PaymentOrchestrator
+from settlement import settle
 
-# Load API Keys
-load_dotenv()
-GENAI_API_KEY = os.getenv("GOOGLE_API_KEY")
-RAZORPAY_KEY = os.getenv("RAZORPAY_KEY")
-RAZORPAY_SECRET = os.getenv("RAZORPAY_SECRET")
+AI_TIMEOUT = 60  # seconds
+
+
+@st.cache_resource
+def get_insights_service():
+    return InsightsService(lambda: get_genai().GenerativeModel("gemini-1.5-flash"))
+
+
+@st.fragment(run_every=1)
+def poll_insights():
+    # Rerun the page once the pending AI request finishes or times out
+    request = st.session_state.insights_request
+    if request["future"].done() or time.monotonic() - request["started"] > AI_TIMEOUT:
+        st.rerun()
+    st.info("Generating AI insights...")
+
+
+def apply_write(group, apply):
+    # Every change bumps the group's version, which keys its cached views
+    # like the stored version does in test.py (the ledger's restarts at 0
+    # whenever the ledger is rebuilt)
+    apply()
+    group["version"] += 1
 
-# Configure APIs
-genai.configure(api_key=GENAI_API_KEY)
-razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY, RAZORPAY_SECRET))
 
 # Expense Data
 if "groups" not in st.session_state:
     st.session_state.groups = {}
+if "exports" not in st.session_state:
+    st.session_state.exports = ExportCache()
+# Groups only live in this session, so their Razorpay orders do too
+if "payments" not in st.session_state:
+    st.session_state.payments = PaymentOrchestrator(get_razorpay_client)
 
 st.title("💰 Smart Expense Splitter with AI & Payments")
 
@@ -25,25 +52,26 @@ st.title("💰 Smart Expense Splitter with AI & Payments")
 group_name = st.text_input("Enter Group Name:")
 if st.button("Create Group"):
     if group_name:
-        st.session_state.groups[group_name] = {
+        st.session_state.groups[group_name] = compact_group({
             "members": [],
             "expenses": [],
-            "paid_status": {}
-        }
+            "payments": [],
+            "version": 0
+        })
         st.success(f"Group '{group_name}' created!")
 
 if st.session_state.groups:
     selected_group = st.selectbox("Select Group:", list(st.session_state.groups.keys()))
-    members = st.session_state.groups[selected_group]["members"]
-    expenses = st.session_state.groups[selected_group]["expenses"]
-    paid_status = st.session_state.groups[selected_group]["paid_status"]
+    group = st.session_state.groups[selected_group]
+    members = group["members"]
+    expenses = group["expenses"]
+    ledger = get_ledger(group)
 
     # 2️⃣ Add Members
     new_member = st.text_input("Add Member Name:")
     if st.button("Add Member"):
         if new_member and new_member not in members:
-            members.append(new_member)
-            paid_status[new_member] = False  # Default unpaid
+            apply_write(group, lambda: add_member(group, new_member))
             st.success(f"{new_member} added to {selected_group}!")
 
     # 3️⃣ Add Expense
@@ -54,85 +82,94 @@ if st.session_state.groups:
     split_among = st.multiselect("Split Among:", members, default=members)
 
     if st.button("Add Expense"):
-        if paid_by and split_among:
-            expenses.append({
+        if amount <= 0:
+            st.warning("Enter an amount greater than zero.")
+        elif paid_by and split_among:
+            apply_write(group, lambda: add_expense(group, {
                 "desc": description,
-                "amount": round(amount, 2),  # Ensure 2-decimal precision
+                "amount_minor": to_paise(amount),  # Exact integer paise
                 "paid_by": paid_by,
-                "split_among": split_among
-            })
+                "split": encode(members, split_among)  # Equal split, as a member mask
+            }))
             st.success("Expense Added!")
 
     # 4️⃣ Show Expenses
     st.subheader("📜 Expense List")
     if expenses:
-        df_expenses = pd.DataFrame(expenses)
-        # Make the index start from 1
-        df_expenses.index = df_expenses.index + 1
-
-        styled_df = (
-            df_expenses.style
-            .format({"amount": "{:.2f}"})
-            .set_table_styles(
-                [
-                    {"selector": "th", "props": [("font-size", "16px"), ("text-align", "center")]},
-                    {"selector": "td", "props": [("font-size", "16px"), ("text-align", "center"), ("border", "1px solid #ccc")]}
-                ]
+        # Sorted/filtered through an index; only the visible page is built and styled
+        if group.get("index_version") != group["version"]:
+            group["index"] = ExpenseIndex(expenses, members)
+            group["index_version"] = group["version"]
+        paginated_expense_table(
+            f"expense_list_{selected_group}",
+            group["index"],
+            members,
+            style=lambda page: (
+                page.style
+                .format({"amount": "{:.2f}"})
+                .set_table_styles(
+                    [
+                        {"selector": "th", "props": [("font-size", "16px"), ("text-align", "center")]},
+                        {"selector": "td", "props": [("font-size", "16px"), ("text-align", "center"), ("border", "1px solid #ccc")]}
+                    ]
+                )
+                .set_properties(**{"width": "150px"})
             )
-            .set_properties(**{"width": "150px"})
         )
-        st.dataframe(styled_df, use_container_width=True)
 
-        # 4.1) Download Expense Sheet CSV
+        # 4.1) Download Expense Sheet (generated only on request)
         st.markdown("#### Download Expense Sheet")
-        expense_csv = df_expenses.to_csv(index=True).encode('utf-8')
-        st.download_button(
-            label="Download Expense CSV",
-            data=expense_csv,
-            file_name=f"{selected_group}_expenses.csv",
-            mime="text/csv"
+        lazy_download_button(
+            "Expense Sheet",
+            key=f"expenses_{selected_group}",
+            file_stem=f"{selected_group}_expenses",
+            columns=["desc", "amount", "paid_by", "split_among"],
+            make_rows=lambda: (
+                (e.desc, to_rupees(e.amount_minor), members[e.payer], split_members(e.split, members))
+                for e in expenses
+            ),
+            content=(selected_group, group["version"]),
+            cache=st.session_state.exports
         )
 
-    # 5️⃣ Mark Payments
-    st.subheader("✅ Mark Payments")
-    for member in members:
-        paid_checkbox = st.checkbox(
-            f"{member} has paid",
-            value=paid_status.get(member, False),
-            key=f"paid_{member}"
-        )
-        paid_status[member] = paid_checkbox
+    # 5️⃣ Record Payments (full or partial; the rest stays outstanding)
+    st.subheader("✅ Record a Payment")
+    record_from = st.selectbox("Paid From:", members if members else ["No Members Yet"])
+    record_to = st.selectbox("Paid To:", members if members else ["No Members Yet"])
+    record_amount = st.number_input("Amount Paid (₹)", min_value=0.0, format="%.2f")
+    record_order = st.text_input("Razorpay Order ID (optional):")
+    if st.button("Record Payment"):
+        if members and record_from != record_to and record_amount > 0:
+            apply_write(group, lambda: add_payment(group, {
+                "payer": record_from,
+                "payee": record_to,
+                "amount_minor": to_paise(record_amount),
+                "order_id": record_order or None
+            }))
+            st.success("Payment Recorded!")
+        else:
+            st.warning("Choose two different members and an amount greater than zero.")
 
     # 6️⃣ Calculate Balances
     st.subheader("📊 Balance Sheet (Updated)")
 
-    # First, calculate raw balances from the expense data
-    balances = {member: 0 for member in members}
-    for expense in expenses:
-        per_person = expense["amount"] / len(expense["split_among"])
-        for member in expense["split_among"]:
-            if member != expense["paid_by"]:
-                balances[member] -= per_person
-                balances[expense["paid_by"]] += per_person
-
-    # If a member is marked as paid, set their balance to 0
-    for member in members:
-        if paid_status.get(member, False):
-            balances[member] = 0
+    # Balances net of recorded payments are kept up to date by the group's ledger
+    # (this page records everything in rupees)
+    balances = ledger.in_currency(HOME_CURRENCY)
 
     # Display who needs to pay or receive
     for person, balance in balances.items():
         if balance < 0:
-            st.warning(f"{person} needs to pay ₹{-balance:.2f}")
+            st.warning(f"{person} needs to pay {format_inr(-balance)}")
         elif balance > 0:
-            st.success(f"{person} will receive ₹{balance:.2f}")
+            st.success(f"{person} will receive {format_inr(balance)}")
         else:
             st.info(f"{person} is settled up.")
 
     # 6.1) Show the Balance Sheet in a table
     st.markdown("#### Balance Sheet Table")
     df_balances = pd.DataFrame(list(balances.items()), columns=["Member", "Balance"])
-    df_balances["Balance"] = df_balances["Balance"].round(2)
+    df_balances["Balance"] = df_balances["Balance"] / 100
     df_balances.index = df_balances.index + 1  # index starts at 1
 
     styled_balances = (
@@ -148,14 +185,16 @@ if st.session_state.groups:
     )
     st.dataframe(styled_balances, use_container_width=True)
 
-    # 6.2) Download Balance Sheet CSV
+    # 6.2) Download Balance Sheet (generated only on request)
     st.markdown("#### Download Balance Sheet")
-    balance_csv = df_balances.to_csv(index=True).encode('utf-8')
-    st.download_button(
-        label="Download Balance CSV",
-        data=balance_csv,
-        file_name=f"{selected_group}_balances.csv",
-        mime="text/csv"
+    lazy_download_button(
+        "Balance Sheet",
+        key=f"balances_{selected_group}",
+        file_stem=f"{selected_group}_balances",
+        columns=["Member", "Balance"],
+        make_rows=lambda: ((member, to_rupees(balance)) for member, balance in balances.items()),
+        content=(selected_group, group["version"]),
+        cache=st.session_state.exports
     )
 
     # 7️⃣ Shared Wallet
@@ -167,38 +206,77 @@ if st.session_state.groups:
     # 8️⃣ AI Insights (Google Gemini)
     st.subheader("🔍 AI Insights")
     if st.button("Get AI Suggestions"):
-        model = genai.GenerativeModel("gemini-1.5-flash")  # or "gemini-2", etc.
-        response = model.generate_content(
-            f"Analyze this expense data and generate a well-explained summary in indian rupees:\n{expenses}"
-        )
-        st.write(response.text)
+        # Same compact summary and background service as the main app; the
+        # model runs off the script thread and a fragment polls for the answer
+        st.session_state.insights_request = {
+            "group": selected_group,
+            "future": get_insights_service().request(summarize_group(group, balances)),
+            "started": time.monotonic()
+        }
+    request = st.session_state.get("insights_request")
+    if request and request["group"] == selected_group:
+        future = request["future"]
+        if future.done():
+            try:
+                st.write(future.result())
+            except Exception as e:
+                st.error(f"AI error: {str(e)}")
+        elif time.monotonic() - request["started"] > AI_TIMEOUT:
+            st.error("AI request timed out. Please try again.")
+        else:
+            poll_insights()
 
     # 9️⃣ Leaderboard & Gamification
     st.subheader("🏆 Leaderboard")
     sorted_balances = sorted(balances.items(), key=lambda x: x[1], reverse=True)
     for idx, (member, balance) in enumerate(sorted_balances):
-        st.write(f"🥇 Rank {idx+1}: {member} (₹{balance:.2f})")
+        st.write(f"🥇 Rank {idx+1}: {member} ({format_inr(balance)})")
 
     # 🔟 Dynamic Group Expense Charts & Reports
     st.subheader("📉 Group Expense Reports")
     chart_data = pd.DataFrame({
         "Members": list(balances.keys()),
-        "Balances": list(balances.values())
+        "Balances": [to_rupees(b) for b in balances.values()]
     })
     st.bar_chart(chart_data.set_index("Members"))
 
     # 11️⃣ Payment Integration (Razorpay)
     st.subheader("💳 Make a Payment")
-    pay_to = st.selectbox("Pay To:", [p for p in balances if balances[p] > 0] or ["No one to pay"])
-    pay_amount = st.number_input("Amount to Pay (₹)", min_value=0.0, format="%.2f")
+    # Minimal list of transfers that settles the group
+    if group.get("transfers_version") != group["version"]:
+        group["transfers"] = settle(balances)
+        group["transfers_version"] = group["version"]
+    transfers = group["transfers"]
+    for payer, payee, transfer_amount in transfers:
+        st.write(f"{payer} pays {payee} {format_inr(transfer_amount)}")
 
+    # Prefill payee and amount from the settlement plan
+    transfer_idx = st.selectbox(
+        "Pay To:",
+        range(len(transfers)) if transfers else [None],
+        format_func=lambda i: "No one to pay" if i is None else f"{transfers[i][0]} → {transfers[i][1]}"
+    )
+    pay_amount = st.number_input(
+        "Amount to Pay (₹)",
+        min_value=0.0,
+        value=0.0 if transfer_idx is None else to_rupees(transfers[transfer_idx][2]),
+        format="%.2f",
+        key=f"pay_amount_{transfer_idx}"
+    )
+
+    # Orders carry a receipt id derived from the transfer, so repeated
+    # clicks return the existing order instead of creating a new one
     if st.button("Pay Now"):
-        if pay_to != "No one to pay" and pay_amount > 0:
-            payment = razorpay_client.order.create({
-                "amount": int(pay_amount * 100),  # Convert to paise
-                "currency": "INR",
-                "payment_capture": "1"
-            })
-            st.success(f"Payment Link (Order ID): {payment['id']}")
+        if transfer_idx is not None and pay_amount > 0:
+            payer, payee, _ = transfers[transfer_idx]
+            order = st.session_state.payments.create_order(
+                selected_group, group["version"], payer, payee, to_paise(pay_amount)
+            )
+            if order["order_id"]:
+                st.success(f"Payment Link (Order ID): {order['order_id']}")
+            elif order["error"]:
+                st.error(f"Payment error: {order['error']}")
+            else:
+                st.info("Payment order is being created...")
         else:
             st.warning("Please select a valid payee and amount.")
@@ -0,0 +1,364 @@
+"""Backend service that owns shared groups, expenses and personal expenses.
+
+Several Streamlit processes (and users) can point at one backend by
+setting BACKEND_URL, so everyone in a trip sees and edits the same group.
+The service is a thin JSON layer over SQLiteStorage. Every group write
+bumps the group's version; a write carrying an `If-Match: <version>`
+header is rejected with 409 Conflict if the group has moved on, so a
+client acting on a stale view never overwrites someone else's change.
+Appends (new members, new expenses) don't need a version: they commute,
+and each one is committed atomically.
+
+It runs on Tornado, which Streamlit already depends on:
+
+    python backend.py --port 8000 --db expenses.db
+
+Request latencies per handler and method are exported at /metrics in
+the Prometheus text format (see instrumentation.py).
+"""
+import argparse
+import json
+from datetime import date
+
+import tornado.ioloop
+import tornado.web
+
+from instrumentation import prometheus_text, record
+from payments import CREATED, FAILED, PENDING
+from storage import ORDER_FIELDS, SQLiteStorage, VersionConflict
+
+
+class BaseHandler(tornado.web.RequestHandler):
+    def initialize(self, storage):
+        self.storage = storage
+
+    def body(self):
+        try:
+            body = json.loads(self.request.body or b"{}")
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="Body must be JSON")
+        require(isinstance(body, dict), "Body must be a JSON object")
+        return body
+
+    def expected_version(self):
+        header = self.request.headers.get("If-Match")
+        if header is None:
+            return None
+        try:
+            return int(header.strip('"'))
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="If-Match must be a group version")
+
+    def int_argument(self, name, default=None):
+        """A non-negative int query argument, or `default` when it is absent."""
+        value = self.get_query_argument(name, None)
+        if value is None:
+            return default
+        try:
+            number = int(value)
+        except ValueError:
+            number = -1
+        if number < 0:
+            raise tornado.web.HTTPError(400, reason=f"{name} must be a non-negative integer")
+        return number
+
+    def on_finish(self):
+        record(f"{type(self).__name__} {self.request.method}", self.request.request_time() * 1000)
+
+    def reply(self, data, status=200):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps(data))
+
+    def write_group(self, write):
+        """Run a group write; `write(expected_version)` returns a result with the new "version"."""
+        try:
+            result = write(self.expected_version())
+        except KeyError:
+            raise tornado.web.HTTPError(404, reason="No such group or expense")
+        except ValueError as e:
+            raise tornado.web.HTTPError(400, reason=str(e))
+        except VersionConflict as e:
+            self.reply({"error": "version conflict", "version": e.version}, status=409)
+            return
+        self.set_header("ETag", f'"{result["version"]}"')
+        self.reply(result)
+
+
+def require(valid, reason):
+    if not valid:
+        raise tornado.web.HTTPError(400, reason=reason)
+
+
+def is_amount(value):
+    # JSON integers only: no floats, numeric strings or booleans
+    return type(value) is int
+
+
+def is_name(value):
+    return isinstance(value, str) and bool(value.strip())
+
+
+def is_optional_string(value):
+    return value is None or isinstance(value, str)
+
+
+class GroupsHandler(BaseHandler):
+    def get(self):
+        self.reply({"groups": self.storage.list_groups()})
+
+    def post(self):
+        name = self.body().get("name")
+        require(is_name(name), "Group name is required")
+        self.storage.create_group(name)
+        self.reply({"name": name}, status=201)
+
+
+class GroupHandler(BaseHandler):
+    def get(self, name):
+        try:
+            group = self.storage.load_group(name)
+        except KeyError:
+            raise tornado.web.HTTPError(404, reason="No such group")
+        self.set_header("ETag", f'"{group["version"]}"')
+        self.reply(group)
+
+
+class VersionHandler(BaseHandler):
+    def get(self, name):
+        try:
+            self.reply({"version": self.storage.group_version(name)})
+        except KeyError:
+            raise tornado.web.HTTPError(404, reason="No such group")
+
+
+class HistoryHandler(BaseHandler):
+    def get(self, name):
+        since = self.int_argument("since", 0)
+        limit = self.int_argument("limit")
+        try:
+            events = self.storage.group_history(name, since, limit)
+        except KeyError:
+            raise tornado.web.HTTPError(404, reason="No such group")
+        self.reply({"events": events})
+
+
+class GroupAtHandler(BaseHandler):
+    def get(self, name):
+        version = self.int_argument("version")
+        timestamp = self.get_query_argument("timestamp", None)
+        try:
+            group = self.storage.group_at(name, version, None if timestamp is None else float(timestamp))
+        except KeyError:
+            raise tornado.web.HTTPError(404, reason="No such group")
+        except ValueError as e:
+            raise tornado.web.HTTPError(400, reason=str(e))
+        self.reply(group)
+
+
+class MembersHandler(BaseHandler):
+    def post(self, name):
+        member = self.body().get("member")
+        require(is_name(member), "Member name is required")
+        self.write_group(lambda version: {"version": self.storage.add_member(name, member, version)})
+
+
+class PaymentsHandler(BaseHandler):
+    def post(self, name):
+        body = self.body()
+        # Storage checks membership, the amount's sign, currency and date
+        require(is_name(body.get("payer")) and is_name(body.get("payee")), "A payment needs a payer and a payee")
+        require(is_amount(body.get("amount_minor")), "amount_minor must be an integer")
+        require(
+            all(is_optional_string(body.get(key)) for key in ("order_id", "currency", "date")),
+            "order_id, currency and date must be strings",
+        )
+        payment = {key: body.get(key) for key in ("payer", "payee", "amount_minor", "order_id", "currency", "date")}
+
+        def write(version):
+            version = self.storage.add_payment(name, payment, version)
+            return {"version": version, "id": payment["id"]}
+
+        self.write_group(write)
+
+
+class ExpensesHandler(BaseHandler):
+    def post(self, name):
+        expenses = self.body().get("expenses")
+        if not isinstance(expenses, list):
+            raise tornado.web.HTTPError(400, reason="Expected a list of expenses")
+        rows = [expense_from_json(e) for e in expenses]
+
+        def write(version):
+            version = self.storage.add_expenses(name, rows, version)
+            return {"version": version, "ids": [row["id"] for row in rows]}
+
+        self.write_group(write)
+
+
+def expense_from_json(e):
+    # Storage checks the payer, the amount's sign, the split spec (see splits.py), currency and date
+    require(isinstance(e, dict), "Malformed expense")
+    require(isinstance(e.get("desc"), str), "An expense needs a desc string")
+    require(is_amount(e.get("amount_minor")), "amount_minor must be an integer")
+    require(is_name(e.get("paid_by")), "An expense needs a paid_by member")
+    require(isinstance(e.get("split"), list), "An expense needs a split spec")
+    require(all(is_optional_string(e.get(key)) for key in ("currency", "date")), "currency and date must be strings")
+    return {key: e.get(key) for key in ("desc", "amount_minor", "paid_by", "split", "currency", "date")}
+
+
+class ExpenseHandler(BaseHandler):
+    def put(self, name, expense_id):
+        expense = expense_from_json(self.body())
+        self.write_group(
+            lambda version: {"version": self.storage.edit_expense(name, int(expense_id), expense, version)}
+        )
+
+    def delete(self, name, expense_id):
+        self.write_group(
+            lambda version: {"version": self.storage.delete_expense(name, int(expense_id), version)}
+        )
+
+
+class PersonalExpensesHandler(BaseHandler):
+    def get(self, year, month):
+        self.reply({"rows": self.storage.personal_expenses(int(year), int(month))})
+
+    def post(self):
+        rows = self.body().get("rows")
+        if not isinstance(rows, list):
+            raise tornado.web.HTTPError(400, reason="Expected a list of rows")
+        self.storage.add_personal_expenses([personal_row_from_json(row) for row in rows])
+        self.reply({"added": len(rows)}, status=201)
+
+
+def personal_row_from_json(row):
+    # A tracker row is ["YYYY-MM-DD", item, amount_paise]
+    try:
+        day, item, amount = row
+        date.fromisoformat(day)
+    except (TypeError, ValueError):
+        raise tornado.web.HTTPError(400, reason="Malformed row: expected [YYYY-MM-DD date, item, amount]")
+    require(len(day) == 10, f"Not a YYYY-MM-DD date: {day}")
+    require(is_name(item), "A row needs an item")
+    require(is_amount(amount) and amount > 0, "A row needs a positive amount in paise")
+    return day, item, amount
+
+
+class RecurringExpensesHandler(BaseHandler):
+    def get(self):
+        self.reply({"rules": self.storage.recurring_expenses()})
+
+    def post(self):
+        body = self.body()
+        rule = {key: body.get(key) for key in ("item", "amount_paise", "start", "frequency", "every", "end")}
+        require(is_name(rule["item"]), "A recurring expense needs an item")
+        require(is_amount(rule["amount_paise"]) and is_amount(rule["every"] or 1), "Amounts and periods must be integers")
+        if rule["every"] is None:
+            rule["every"] = 1
+        try:
+            self.storage.add_recurring_expense(rule)
+        except ValueError as e:
+            raise tornado.web.HTTPError(400, reason=str(e))
+        self.reply({"id": rule["id"]}, status=201)
+
+    def delete(self, rule_id):
+        self.storage.delete_recurring_expense(int(rule_id))
+        self.reply({})
+
+
+class BudgetsHandler(BaseHandler):
+    def get(self):
+        self.reply({"budgets": self.storage.budgets()})
+
+    def put(self):
+        body = self.body()
+        name, amount_paise = body.get("name"), body.get("amount_paise")
+        require(is_name(name), "A budget needs a name")
+        require(amount_paise is None or (is_amount(amount_paise) and amount_paise > 0), "Malformed budget")
+        self.storage.set_budget(name, amount_paise)
+        self.reply({})
+
+
+class OrdersHandler(BaseHandler):
+    """Razorpay order records (see payments.py); they are not group writes, so no versions."""
+
+    def get(self, name):
+        try:
+            self.reply({"orders": self.storage.orders(name)})
+        except KeyError:
+            raise tornado.web.HTTPError(404, reason="No such group")
+
+    def post(self, name):
+        body = self.body()
+        order = order_from_json(body.get("order"))
+        stale_after = body.get("stale_after")
+        require(type(stale_after) in (int, float) and stale_after >= 0, "stale_after must be a number of seconds")
+        try:
+            order, claimed = self.storage.claim_order(name, order, stale_after)
+        except KeyError:
+            raise tornado.web.HTTPError(404, reason="No such group")
+        self.reply({"order": order, "claimed": claimed})
+
+    def put(self, name, receipt):
+        order = order_from_json(self.body())
+        require(order["receipt"] == receipt, "The order's receipt does not match the URL")
+        require(order["state"] in (PENDING, CREATED, FAILED), "Unknown order state")
+        require(is_amount(order["attempts"]), "attempts must be an integer")
+        require(is_optional_string(order["order_id"]) and is_optional_string(order["error"]), "Malformed order")
+        try:
+            self.storage.update_order(name, order)
+        except KeyError:
+            raise tornado.web.HTTPError(404, reason="No such group")
+        self.reply({})
+
+
+def order_from_json(order):
+    require(isinstance(order, dict), "Malformed order")
+    require(all(is_name(order.get(key)) for key in ("receipt", "payer", "payee", "currency")), "Malformed order")
+    require(is_amount(order.get("amount_minor")), "amount_minor must be an integer")
+    return {key: order.get(key) for key in ORDER_FIELDS}
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.finish(prometheus_text("expense_backend"))
+
+
+def make_app(storage):
+    args = {"storage": storage}
+    name = r"/groups/([^/]+)"
+    return tornado.web.Application([
+        (r"/groups", GroupsHandler, args),
+        (name, GroupHandler, args),
+        (name + r"/version", VersionHandler, args),
+        (name + r"/events", HistoryHandler, args),
+        (name + r"/at", GroupAtHandler, args),
+        (name + r"/members", MembersHandler, args),
+        (name + r"/orders", OrdersHandler, args),
+        (name + r"/orders/([^/]+)", OrdersHandler, args),
+        (name + r"/payments", PaymentsHandler, args),
+        (name + r"/expenses", ExpensesHandler, args),
+        (name + r"/expenses/(\d+)", ExpenseHandler, args),
+        (r"/personal", PersonalExpensesHandler, args),
+        (r"/personal/(\d+)/(\d+)", PersonalExpensesHandler, args),
+        (r"/recurring", RecurringExpensesHandler, args),
+        (r"/recurring/(\d+)", RecurringExpensesHandler, args),
+        (r"/budgets", BudgetsHandler, args),
+        (r"/metrics", MetricsHandler),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--db", default="expenses.db")
+    args = parser.parse_args()
+    make_app(SQLiteStorage(args.db)).listen(args.port)
+    print(f"Backend listening on http://127.0.0.1:{args.port}")
+    tornado.ioloop.IOLoop.current().start()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+"""Timing helpers shared by the benchmark scripts."""
+import time
+
+
+def timed_call(func, *args):
+    """Run `func(*args)` once; return (its result, wall-clock seconds)."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def timed(func, *args):
+    """Wall-clock seconds of one `func(*args)` call."""
+    return timed_call(func, *args)[1]
@@ -0,0 +1,75 @@
+"""Compare balance computation backends on synthetic groups.
+
+Run from the repository root:  python benchmarks/bench_balances.py [--max 1000000]
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _util import timed
+from ledger import BalanceLedger
+from model import ExpenseTable, Members
+from splits import encode
+from vectorized import vectorized_balances
+
+
+def random_group(num_members, num_expenses, seed=0):
+    rng = random.Random(seed)
+    members = [f"member{i}" for i in range(num_members)]
+    expenses = []
+    for _ in range(num_expenses):
+        split_among = members if rng.random() < 0.3 else rng.sample(members, rng.randint(1, 6))
+        expenses.append({
+            "desc": "expense",
+            "amount_minor": rng.randint(100, 1000000),
+            "paid_by": rng.choice(members),
+            "split_among": split_among,  # for the original loop
+            "split": encode(members, split_among),
+        })
+    return members, expenses
+
+
+def original_loop(members, expenses):
+    # The float loop that used to run on every rerun in app.py/test.py
+    balances = {member: 0 for member in members}
+    for expense in expenses:
+        per_person = expense["amount_minor"] / 100 / len(expense["split_among"])
+        for member in expense["split_among"]:
+            if member != expense["paid_by"]:
+                balances[member] -= per_person
+                balances[expense["paid_by"]] += per_person
+    return balances
+
+
+def scalar_ledger(members, table):
+    ledger = BalanceLedger(members)
+    for expense in table:
+        ledger._apply(expense, 1)
+    return ledger.balances
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--members", type=int, default=20)
+    parser.add_argument("--max", type=int, default=1000000, help="largest expense count to run")
+    args = parser.parse_args()
+
+    print(f"{'expenses':>9} {'loop (s)':>10} {'ledger (s)':>11} {'numpy (s)':>10}")
+    for num_expenses in [1000, 100000, 1000000]:
+        if num_expenses > args.max:
+            break
+        members, expenses = random_group(args.members, num_expenses)
+        table = ExpenseTable.from_dicts(expenses, Members(members))
+        print(
+            f"{num_expenses:>9} "
+            f"{timed(original_loop, members, expenses):>10.3f} "
+            f"{timed(scalar_ledger, members, table):>11.3f} "
+            f"{timed(vectorized_balances, members, table):>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
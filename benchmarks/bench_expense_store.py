@@ -0,0 +1,45 @@
+"""Benchmark sequential tracker adds: pd.concat per add vs ExpenseStore.
+
+Run from the repository root:  python benchmarks/bench_expense_store.py [--adds 100000]
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _util import timed
+from expense_store import ExpenseStore
+
+
+def concat_adds(n):
+    # What the tracker used to do on every "Add Expense"
+    expenses = pd.DataFrame(columns=["Date", "Item", "Amount"])
+    for i in range(n):
+        new_expense = pd.DataFrame({"Date": [f"2025-01-{i % 28 + 1:02d}"], "Item": [f"item{i % 50}"], "Amount": [i % 1000 + 0.5]})
+        expenses = pd.concat([expenses, new_expense], ignore_index=True)
+    return expenses
+
+
+def store_adds(n):
+    store = ExpenseStore()
+    for i in range(n):
+        store.append(f"2025-01-{i % 28 + 1:02d}", f"item{i % 50}", i % 1000 + 0.5)
+    return store.to_frame()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--adds", type=int, default=100000)
+    parser.add_argument("--concat-max", type=int, default=20000, help="pd.concat is quadratic; cap its run")
+    args = parser.parse_args()
+
+    concat_n = min(args.adds, args.concat_max)
+    print(f"ExpenseStore: {args.adds} adds in {timed(store_adds, args.adds):.3f} s")
+    print(f"pd.concat:    {concat_n} adds in {timed(concat_adds, concat_n):.3f} s")
+
+
+if __name__ == "__main__":
+    main()
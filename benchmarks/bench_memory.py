@@ -0,0 +1,59 @@
+"""Compare the memory held by a group's expenses as dicts and as an ExpenseTable.
+
+Run from the repository root:  python benchmarks/bench_memory.py [--max 1000000]
+
+The dict shape is what storage and the backend return (decoded from JSON,
+so no strings are shared); the table is what the app keeps after
+model.compact_group. Sizes are the bytes still allocated once each
+structure is built, measured with tracemalloc.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from model import ExpenseTable, Members
+from synthetic import synthetic_group
+
+
+def retained(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--members", type=int, default=20)
+    parser.add_argument("--max", type=int, default=1000000, help="largest expense count to run")
+    args = parser.parse_args()
+
+    print(f"{'expenses':>9} {'dicts (MB)':>11} {'table (MB)':>11} {'B/expense':>16} {'ratio':>6}")
+    for num_expenses in [1000, 100000, 1000000]:
+        if num_expenses > args.max:
+            break
+        group = synthetic_group(args.members, num_expenses)
+        members = Members(group["members"])
+        text = json.dumps(group["expenses"])
+        del group
+        dicts = retained(lambda: json.loads(text))
+        table = retained(lambda: ExpenseTable.from_dicts(json.loads(text), members))
+        print(
+            f"{num_expenses:>9} {dicts / 1e6:>11.1f} {table / 1e6:>11.1f} "
+            f"{dicts // num_expenses:>7} -> {table // num_expenses:<6} {dicts / table:>6.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Settle a 50-person group against the stub Razorpay server.
+
+Run from the repository root:  python benchmarks/bench_payments.py
+Compares one-at-a-time order creation with the bounded thread pool and
+checks that re-submitting the same settlement creates no new orders.
+"""
+import os
+import sys
+import threading
+
+import razorpay
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _util import timed_call
+from payments import PaymentOrchestrator
+from stub_razorpay import make_server
+
+
+def main(members=50, latency=0.1, failure_rate=0.1):
+    server = make_server(latency=latency, failure_rate=failure_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    client = razorpay.Client(auth=("rzp_test_stub", "secret"), base_url=base_url)
+    transfers = [(f"member{i}", "member0", 10000 + i) for i in range(1, members)]
+
+    for name, workers in [("sequential", 1), ("thread pool", 8)]:
+        orchestrator = PaymentOrchestrator(lambda: client, max_workers=workers, backoff=0.05)
+        orders, elapsed = timed_call(orchestrator.settle, name, 1, transfers)
+        created = sum(order["state"] == "created" for order in orders)
+        print(f"{name:12} {len(transfers)} transfers: {created} created in {elapsed:.2f} s")
+
+    before = len(server.orders)
+    orchestrator.settle("thread pool", 1, transfers)
+    print(f"re-submitted settlement created {len(server.orders) - before} new orders")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
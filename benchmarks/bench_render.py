@@ -0,0 +1,106 @@
+"""Per-interaction render time: a baseline full rerun vs today's fragments and caches.
+
+Run from the repository root:  python benchmarks/bench_render.py [expenses]
+Seeds a group in a temporary database, drives the app with Streamlit's
+AppTest and reads the per-panel spans from instrumentation.py, twice:
+
+- baseline: st.fragment and st.cache_resource are replaced by plain
+  functions and the group's cached views are dropped before every
+  interaction, so each one reruns and rebuilds every panel, as the app
+  did before it had fragments or caches;
+- current: the app as it is. AppTest still reruns the whole script, so
+  its whole-page time is every panel reading its cached views; in the
+  browser a widget change only reruns the fragment that owns it, here
+  the Members panel.
+"""
+import os
+import random
+import sys
+import tempfile
+from contextlib import contextmanager
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import instrumentation
+from _util import timed
+from splits import encode
+from storage import SQLiteStorage
+
+
+def seed(path, n_expenses, n_members=8, seed=0):
+    rng = random.Random(seed)
+    members = [f"member{i}" for i in range(n_members)]
+    storage = SQLiteStorage(path)
+    storage.create_group("bench")
+    for member in members:
+        storage.add_member("bench", member)
+    storage.add_expenses("bench", [
+        {
+            "desc": f"expense {i}",
+            "amount_minor": rng.randint(100, 500000),
+            "paid_by": rng.choice(members),
+            "split": encode(members, rng.sample(members, rng.randint(1, n_members))),
+        }
+        for i in range(n_expenses)
+    ])
+    storage.close()
+
+
+def type_member_names(at, runs, drop_views=False):
+    # Typing a member name: only the Members tab depends on it
+    for i in range(runs):
+        if drop_views:
+            for group in at.session_state["groups"].values():
+                group.pop("views", None)
+        at.text_input(key="new_member_input").set_value(f"typed {i}").run()
+
+
+def _plain(func=None, **options):
+    # Stands in for a decorator used both bare and with options
+    return func if func is not None else (lambda func: func)
+
+
+@contextmanager
+def without_fragments_or_caching():
+    with mock.patch.object(st, "fragment", _plain), mock.patch.object(st, "cache_resource", _plain):
+        yield
+
+
+def measure(runs, baseline):
+    """Return (ms per whole-page interaction, {span: mean ms}) for one mode."""
+    at = AppTest.from_file("test.py", default_timeout=120).run()  # loads the group, builds caches
+    assert not at.exception, at.exception
+    instrumentation.reset()
+    full_ms = timed(type_member_names, at, runs, baseline) * 1000 / runs
+    assert not at.exception, at.exception
+    return full_ms, {row["span"]: row["mean_ms"] for row in instrumentation.timings()}
+
+
+def main():
+    n_expenses = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    runs = 5
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["EXPENSE_DB"] = os.path.join(tmp, "bench.db")
+        seed(os.environ["EXPENSE_DB"], n_expenses)
+        os.chdir(ROOT)
+        with without_fragments_or_caching():
+            baseline_ms, baseline = measure(runs, baseline=True)
+        current_ms, current = measure(runs, baseline=False)
+
+    print(f"{n_expenses} expenses, mean of {runs} interactions, in ms")
+    # "Expense Splitter" spans the whole page, i.e. every panel
+    print(f"{'span':24} {'baseline':>10} {'current':>10}")
+    for span in sorted(baseline.keys() | current.keys()):
+        cells = [f"{spans[span]:>10.2f}" if span in spans else f"{'-':>10}" for spans in (baseline, current)]
+        print(f"{span:24} {' '.join(cells)}")
+    print(f"{'whole-page rerun':24} {baseline_ms:>10.1f} {current_ms:>10.1f}")
+    print(f"{'Members interaction':24} {baseline_ms:>10.1f} {current['Members']:>10.2f}  (current: fragment rerun only)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""Benchmark the settlement engine on synthetic groups.
+
+Run from the repository root:  python benchmarks/bench_settlement.py
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _util import timed_call
+from settlement import EXACT_LIMIT, settle
+
+
+def random_balances(n, seed=0):
+    rng = random.Random(seed)
+    paise = [rng.randint(-500000, 500000) for _ in range(n)]
+    paise[-1] -= sum(paise)  # balances always sum to zero
+    return {f"member{i}": p for i, p in enumerate(paise)}
+
+
+def main():
+    for n in [EXACT_LIMIT, 100, 1000, 10000]:
+        balances = random_balances(n)
+        transfers, elapsed = timed_call(settle, balances)
+        print(f"{n:>6} members: {len(transfers):>6} transfers in {elapsed * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Startup and per-rerun cost of SDK setup: eager module-top vs clients.py.
+
+Run from the repository root:  python benchmarks/bench_startup.py
+Cold start is measured in fresh interpreters; per-rerun cost repeats the
+setup block that the app script used to execute on every interaction.
+"""
+import os
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+EAGER = """
+import google.generativeai as genai
+import razorpay
+from dotenv import load_dotenv
+import os
+load_dotenv()
+genai.configure(api_key=os.getenv("GOOGLE_API_KEY") or "test")
+razorpay.Client(auth=(os.getenv("RAZORPAY_KEY"), os.getenv("RAZORPAY_SECRET")))
+"""
+
+LAZY = """
+from clients import get_config
+get_config("GOOGLE_API_KEY")
+get_config("RAZORPAY_KEY")
+get_config("RAZORPAY_SECRET")
+"""
+
+
+def cold_start(setup, runs=5):
+    code = f"import time\nstart = time.perf_counter()\n{setup}\nprint(time.perf_counter() - start)"
+    times = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return min(times)
+
+
+def per_rerun(setup, number=200):
+    exec(setup, {})  # warm: modules imported, as on every rerun after the first
+    return timeit.timeit(lambda: exec(setup, {}), number=number) / number
+
+
+def main():
+    print(f"{'':12} {'cold start (ms)':>16} {'per rerun (ms)':>15}")
+    for name, setup in [("eager", EAGER), ("clients.py", LAZY)]:
+        print(f"{name:12} {cold_start(setup) * 1000:>16.1f} {per_rerun(setup) * 1000:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+"""Benchmark suite for the splitter and tracker hot paths.
+
+Run from the repository root:
+
+    python benchmarks/bench_suite.py [--scales small,medium] [--repeat 5]
+        [--output results.json] [--compare previous.json]
+
+Generates synthetic groups and personal histories (see synthetic.py) at
+each scale and times the code paths the app runs on interactions:
+balances, balances converted from mixed currencies (vectorized, and
+expense by expense for comparison), the settlement listing, the expense
+list page, CSV export, expense appends, the tracker's Top Expenses and
+Top Categories rollups (and the pandas groupby they replaced), tagging
+an import's items with categories, calendar highlighting, tracker
+appends, expanding recurring expenses into the viewed months and budget
+vs actual. No browser, network or API keys are needed.
+
+Each case is run `repeat` times with its setup untimed and the garbage
+collector off, as timeit does. A summary table goes to stderr and the
+results to stdout (or --output) as JSON. With --compare, cases whose
+median got slower than --threshold times the previous run's are listed
+and the exit status is 1.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from calendar_view import calendar_html
+from categories import Classifier, read_rules
+from expense_index import ExpenseIndex
+from expense_store import ExpenseStore
+from export import iter_csv
+from fx import load_rates
+from ledger import BalanceLedger, add_expense, converted_balances, get_ledger
+from model import ExpenseTable, Members, compact_group
+from money import HOME_CURRENCY, format_inr, to_rupees
+from recurring import FREQUENCIES, OVERALL
+from settlement import settle
+from splits import describe_split, split_members
+from storage import SQLiteStorage
+from synthetic import personal_history, synthetic_group
+
+SCALES = {
+    "small": {"members": 8, "expenses": 1000, "years": 1},
+    "medium": {"members": 20, "expenses": 20000, "years": 3},
+    "large": {"members": 50, "expenses": 200000, "years": 10},
+}
+APPENDS = 1000  # expenses appended per run of the append cases
+FX_CURRENCIES = ["INR", "USD", "EUR", "JPY"]  # cycled through in the mixed-currency cases
+FX_DATES = ["2024-02-10", "2024-09-01", "2025-03-15", None]
+STORAGE_APPENDS = 100  # single-expense storage writes per run
+RULES = 24  # recurring expense rules in the recurring cases
+
+
+# Group cases: setup(data) -> zero-argument callable that does the timed work
+
+def expense_table(data):
+    # The group as the app holds it after loading (see model.compact_group)
+    if "table" not in data:
+        data["table"] = ExpenseTable.from_dicts(data["expenses"], Members(data["members"]))
+    return data["table"]
+
+
+def fx_group(data):
+    # The group with its expenses spread over several currencies and dates
+    if "fx_group" not in data:
+        expenses = [
+            dict(e, currency=FX_CURRENCIES[i % len(FX_CURRENCIES)], date=FX_DATES[i // 7 % len(FX_DATES)])
+            for i, e in enumerate(data["expenses"])
+        ]
+        data["fx_group"] = compact_group({"members": list(data["members"]), "expenses": expenses})
+    return data["fx_group"]
+
+
+def balances(data):
+    table = expense_table(data)
+    return lambda: BalanceLedger.from_expenses(data["members"], table)
+
+
+def fx_balances(data):
+    group, rates = fx_group(data), load_rates()
+    get_ledger(group)
+    return lambda: converted_balances(group, "EUR", rates)
+
+
+def fx_balances_per_expense(data):
+    # Converting expense by expense and replaying the ledger, as a baseline
+    group, rates = fx_group(data), load_rates()
+
+    def run():
+        ledger = BalanceLedger(group["members"])
+        for expense in group["expenses"]:
+            expense.amount_minor = rates.convert_one(expense.amount_minor, expense.currency, expense.date, "EUR")
+            expense.currency = "EUR"
+            ledger.add_expense(expense)
+        return ledger.in_currency("EUR")
+    return run
+
+
+def settlement_listing(data):
+    ledger = BalanceLedger.from_expenses(data["members"], expense_table(data))
+    return lambda: [
+        f"{payer} pays {payee} {format_inr(amount)}"
+        for payer, payee, amount in settle(ledger.in_currency(HOME_CURRENCY))
+    ]
+
+
+def expense_page(data):
+    table = expense_table(data)
+
+    def run():
+        index = ExpenseIndex(table, data["members"])
+        return index.page(index.query(sort="amount", descending=True), 0, 25)
+    return run
+
+
+def expense_csv(data):
+    table, members = expense_table(data), data["members"]
+    return lambda: b"".join(iter_csv(
+        ["desc", "amount", "paid_by", "split_among", "split"],
+        (
+            (e.desc, to_rupees(e.amount_minor), members[e.payer],
+             split_members(e.split, members), describe_split(e.split, members))
+            for e in table
+        ),
+    ))
+
+
+def expense_appends(data):
+    group = compact_group({"members": list(data["members"]), "expenses": expense_table(data).to_dicts(data["members"])})
+    get_ledger(group)
+    new = synthetic_group(len(data["members"]), APPENDS, seed=1)["expenses"]
+
+    def run():
+        for expense in new:
+            add_expense(group, expense)
+    return run
+
+
+def storage_appends(data):
+    # One seeded database per scale; each run appends to it
+    if "db" not in data:
+        data["tmp"] = tempfile.TemporaryDirectory()
+        data["db"] = SQLiteStorage(os.path.join(data["tmp"].name, "bench.db"))
+        data["db"].create_group("bench")
+        for member in data["members"]:
+            data["db"].add_member("bench", member)
+        data["db"].add_expenses("bench", [dict(e) for e in data["expenses"]])
+    storage = data["db"]
+    new = synthetic_group(len(data["members"]), STORAGE_APPENDS, seed=2)["expenses"]
+
+    def run():
+        for expense in new:
+            storage.add_expenses("bench", [dict(expense)])
+    return run
+
+
+# Tracker cases, on a personal history
+
+def loaded_store(rows):
+    store = ExpenseStore()
+    store.extend(rows)
+    return store
+
+
+def months(rows):
+    return sorted({(int(d[:4]), int(d[5:7])) for d, _, _ in rows})
+
+
+def tracker_load(rows):
+    return lambda: loaded_store(rows)
+
+
+def top_expenses(rows):
+    store = loaded_store(rows)
+    viewed = months(rows)
+    return lambda: [store.top_items(year, month, 5) for year, month in viewed]
+
+
+def top_categories(rows):
+    store = loaded_store(rows)
+    viewed = months(rows)
+    return lambda: [store.top_categories(year, month, 5) for year, month in viewed]
+
+
+def categorize_import(rows):
+    # Tagging an import's items with a fresh classifier: each distinct item is classified once
+    rules = read_rules()
+    items = [item for _, item, _ in rows]
+    return lambda: Classifier(rules).categorize_many(items)
+
+
+def top_expenses_groupby(rows):
+    # The per-rerun pandas groupby that the store's rollup replaced
+    store = loaded_store(rows)
+    frames = [store.month(year, month) for year, month in months(rows)]
+    return lambda: [frame.groupby("Item")["Amount"].sum().nlargest(5) for frame in frames]
+
+
+def calendar(rows):
+    store = loaded_store(rows)
+    viewed = months(rows)
+    return lambda: [calendar_html(year, month, store.expense_days(year, month)) for year, month in viewed]
+
+
+def tracker_csv(rows):
+    store = loaded_store(rows)
+    frames = [store.month(year, month) for year, month in months(rows)]
+    return lambda: [
+        b"".join(iter_csv(
+            ["Date", "Item", "Amount"],
+            zip(frame["Date"].dt.strftime("%Y-%m-%d"), frame["Item"], frame["Amount"]),
+        ))
+        for frame in frames
+    ]
+
+
+def tracker_appends(rows):
+    store = loaded_store(rows)
+    new = personal_history(1, seed=1)[:APPENDS]
+    return lambda: [store.append(d, item, amount / 100) for d, item, amount in new]
+
+
+def recurring_rules(rows):
+    # A few dozen rent/subscription-style rules starting on the history's first day
+    start = rows[0][0]
+    return [
+        {"id": i + 1, "item": f"Plan {i}", "amount_paise": 10000 * (i + 1), "start": start,
+         "frequency": FREQUENCIES[i % len(FREQUENCIES)], "every": 1 + i % 3, "end": None}
+        for i in range(RULES)
+    ]
+
+
+def recurring_months(rows):
+    # Expanding the rules into every viewed month, as on a cold page
+    store = loaded_store(rows)
+    rules = recurring_rules(rows)
+    viewed = months(rows)
+
+    def expand():
+        store.set_recurring(rules)
+        return [store.month_total(year, month) for year, month in viewed]
+    return expand
+
+
+def budgets(rows):
+    store = loaded_store(rows)
+    store.set_recurring(recurring_rules(rows))
+    limits = {OVERALL: 5000000, "Rent": 400000, "Groceries": 300000, "Coffee": 100000, "uber": 200000}
+    viewed = months(rows)
+
+    def status():
+        store.set_budgets(limits)
+        return [store.budget_status(year, month) for year, month in viewed]
+    return status
+
+
+GROUP_CASES = [balances, fx_balances, fx_balances_per_expense, settlement_listing, expense_page, expense_csv, expense_appends, storage_appends]
+TRACKER_CASES = [
+    tracker_load, top_expenses, top_categories, categorize_import, top_expenses_groupby, calendar, tracker_csv, tracker_appends, recurring_months, budgets,
+]
+
+
+def measure(setup, data, repeat):
+    times = []
+    for _ in range(repeat):
+        run = setup(data)
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+    return times
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(scales, repeat):
+    results = []
+    for scale in scales:
+        params = SCALES[scale]
+        group = synthetic_group(params["members"], params["expenses"])
+        history = personal_history(params["years"])
+        sizes = {"members": params["members"], "expenses": params["expenses"], "personal_rows": len(history)}
+        for cases, data in ((GROUP_CASES, group), (TRACKER_CASES, history)):
+            for case in cases:
+                times = measure(case, data, repeat)
+                results.append({
+                    "case": case.__name__,
+                    "scale": scale,
+                    **sizes,
+                    "repeat": repeat,
+                    "min_s": min(times),
+                    "median_s": statistics.median(times),
+                    "mean_s": statistics.fmean(times),
+                })
+                print(
+                    f"{scale:>7} {case.__name__:>22} median {results[-1]['median_s'] * 1000:10.2f} ms"
+                    f"  min {results[-1]['min_s'] * 1000:10.2f} ms",
+                    file=sys.stderr,
+                )
+        if "db" in group:
+            group["db"].close()
+            group["tmp"].cleanup()
+    return results
+
+
+def regressions(results, previous, threshold):
+    before = {(r["case"], r["scale"]): r["median_s"] for r in previous["results"]}
+    slower = []
+    for result in results:
+        old = before.get((result["case"], result["scale"]))
+        if old and result["median_s"] > old * threshold:
+            slower.append((result["case"], result["scale"], old, result["median_s"]))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="small,medium", help=f"comma-separated, from {', '.join(SCALES)}")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    parser.add_argument("--compare", help="previous JSON results to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.25, help="median slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    scales = args.scales.split(",")
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale: {', '.join(unknown)}")
+
+    report = {
+        "meta": {
+            "started": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "scales": {scale: SCALES[scale] for scale in scales},
+        },
+        "results": run_suite(scales, args.repeat),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            slower = regressions(report["results"], json.load(f), args.threshold)
+        for case, scale, old, new in slower:
+            print(f"REGRESSION {scale} {case}: {old * 1000:.2f} ms -> {new * 1000:.2f} ms", file=sys.stderr)
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Load test for the shared backend: hundreds of concurrent writers per group.
+
+Run from the repository root:  python benchmarks/load_backend.py [writers] [writes]
+Starts backend.py on a free local port with a temporary database and runs
+two phases, each with `writers` threads on a single group:
+
+- appends: every writer adds `writes` expenses (unconditional writes);
+  afterwards the group must hold all of them.
+- read-modify-write: every writer increments one shared expense's amount
+  by one paisa based on the state it read, sending that version as
+  If-Match and retrying on 409 with jittered backoff. A lost update would
+  leave the amount short, so it must equal the number of increments.
+
+In both phases the final group version must equal the number of
+successful writes.
+"""
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from remote_storage import RemoteStorage
+from splits import encode
+from storage import VersionConflict
+
+MEMBERS = [f"member{i}" for i in range(8)]
+EVERYONE = encode(MEMBERS, MEMBERS)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, timeout=10):
+    client = RemoteStorage(url)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return client.list_groups()
+        except Exception:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run_writers(url, writers, work):
+    """Run work(client, index) on `writers` threads; return (seconds, latencies, stats)."""
+    latencies = []
+    stats = {"writes": 0, "conflicts": 0}
+    lock = threading.Lock()
+
+    def run(index):
+        client = RemoteStorage(url)
+        times, conflicts = work(client, index)
+        client.close()
+        with lock:
+            latencies.extend(times)
+            stats["writes"] += len(times)
+            stats["conflicts"] += conflicts
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(writers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies, stats
+
+
+def appends(writes):
+    def work(client, index):
+        times = []
+        for i in range(writes):
+            start = time.perf_counter()
+            client.add_expenses("appends", [{
+                "desc": f"writer {index} expense {i}",
+                "amount_minor": 100 + i,
+                "paid_by": MEMBERS[index % len(MEMBERS)],
+                "split": EVERYONE,
+            }])
+            times.append(time.perf_counter() - start)
+        return times, 0
+    return work
+
+
+def increments(expense_id, writes):
+    def work(client, index):
+        times = []
+        conflicts = 0
+        for i in range(writes):
+            start = time.perf_counter()
+            attempt = 0
+            while True:
+                group = client.load_group("counter")
+                expense = next(e for e in group["expenses"] if e["id"] == expense_id)
+                expense["amount_minor"] += 1
+                try:
+                    client.edit_expense("counter", expense_id, expense, expected_version=group["version"])
+                    break
+                except VersionConflict:
+                    conflicts += 1
+                    attempt += 1
+                    time.sleep(random.uniform(0, min(2.0, 0.01 * 2 ** attempt)))
+            times.append(time.perf_counter() - start)
+        return times, conflicts
+    return work
+
+
+def report(name, writers, elapsed, latencies, stats):
+    print(
+        f"{name:18} {writers} writers, {stats['writes']} writes in {elapsed:.2f} s "
+        f"({stats['writes'] / elapsed:.0f}/s), p50 {percentile(latencies, 0.5) * 1000:.1f} ms, "
+        f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms, 409 retries {stats['conflicts']}"
+    )
+
+
+def main():
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    writes = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as tmp:
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "backend.py"), "--port", str(port), "--db", os.path.join(tmp, "load.db")],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for(url)
+            setup = RemoteStorage(url)
+            versions = {}
+            for name in ("appends", "counter"):
+                setup.create_group(name)
+                for member in MEMBERS:
+                    setup.add_member(name, member)
+            counter = {"desc": "counter", "amount_minor": 0, "paid_by": MEMBERS[0], "split": EVERYONE}
+            setup.add_expenses("counter", [counter])
+            for name in ("appends", "counter"):
+                versions[name] = setup.group_version(name)
+
+            elapsed, latencies, stats = run_writers(url, writers, appends(writes))
+            report("appends", writers, elapsed, latencies, stats)
+            group = setup.load_group("appends")
+            assert len(group["expenses"]) == writers * writes, "lost expense"
+            assert group["version"] == versions["appends"] + stats["writes"], "lost update"
+
+            # Increments are far more contended (every write conflicts with all others)
+            increment_writes = max(1, writes // 4)
+            elapsed, latencies, stats = run_writers(url, writers, increments(counter["id"], increment_writes))
+            report("read-modify-write", writers, elapsed, latencies, stats)
+            group = setup.load_group("counter")
+            assert group["expenses"][0]["amount_minor"] == writers * increment_writes, "lost update"
+            assert group["version"] == versions["counter"] + stats["writes"], "lost update"
+            print("OK: no lost updates")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Local stand-in for the Razorpay orders API.
+
+Run from the repository root:  python benchmarks/stub_razorpay.py [--port 8765]
+and point the app at it with RAZORPAY_BASE_URL=http://127.0.0.1:8765.
+"""
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+def make_server(port=0, latency=0.0, failure_rate=0.0, lost_reply_rate=0.0):
+    """Return a stub server; `server.orders` collects every created order.
+
+    `failure_rate` of creates fail before creating anything; a further
+    `lost_reply_rate` create the order but answer with a server error, like
+    a request that timed out after Razorpay processed it.
+    """
+    counter = itertools.count(1)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path.rstrip("/") != "/v1/orders":
+                return self._reply(404, {"error": {"code": "BAD_REQUEST_ERROR", "description": "unknown path"}})
+            receipt = parse_qs(url.query).get("receipt", [None])[0]
+            with lock:
+                items = [order for order in self.server.orders if receipt is None or order.get("receipt") == receipt]
+            self._reply(200, {"entity": "collection", "count": len(items), "items": items})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            time.sleep(latency)
+            if self.path.rstrip("/") != "/v1/orders":
+                return self._reply(404, {"error": {"code": "BAD_REQUEST_ERROR", "description": "unknown path"}})
+            if random.random() < failure_rate:
+                return self._reply(500, {"error": {"code": "SERVER_ERROR", "description": "stub failure"}})
+            with lock:
+                order = dict(body, id=f"order_stub{next(counter):010d}", status="created")
+                self.server.orders.append(order)
+            if random.random() < lost_reply_rate:
+                return self._reply(500, {"error": {"code": "SERVER_ERROR", "description": "stub lost reply"}})
+            self._reply(200, order)
+
+        def _reply(self, status, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.orders = []
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per request")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = make_server(args.port, args.latency, args.failure_rate)
+    print(f"Stub Razorpay listening on http://127.0.0.1:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
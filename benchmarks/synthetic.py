@@ -0,0 +1,59 @@
+"""Deterministic synthetic data for the benchmarks.
+
+Groups have `members` members and `expenses` expenses in the shape the app
+uses ({"desc", "amount_minor", "paid_by", "split"}), with a mix of split
+sizes: about a third split among everyone, a third among two or three
+members and the rest among a random subset. One in ten splits is by
+shares instead of equal. Personal histories are
+(date, item, amount_paise) rows, a few per day over several years, as
+stored by the tracker.
+"""
+import random
+from datetime import date, timedelta
+
+from splits import SHARES, encode
+
+DESCRIPTIONS = ["Dinner", "Lunch", "Taxi", "Hotel", "Groceries", "Fuel", "Tickets", "Snacks", "Drinks", "Museum"]
+ITEMS = [
+    "Rent", "Groceries", "Uber", "uber ride", "Cab", "Coffee", "Electricity", "Netflix",
+    "Phone bill", "Lunch", "Dinner out", "Fuel", "Medicines", "Gym", "Books", "Movie",
+]
+
+
+def synthetic_group(members, expenses, seed=0):
+    """Return {"members", "expenses"} for a group of the given size."""
+    rng = random.Random(seed)
+    names = [f"member{i}" for i in range(members)]
+    rows = []
+    for i in range(expenses):
+        roll = rng.random()
+        if roll < 0.35:
+            split_among = list(names)
+        elif roll < 0.7:
+            split_among = rng.sample(names, min(members, rng.randint(2, 3)))
+        else:
+            split_among = rng.sample(names, rng.randint(1, members))
+        if rng.random() < 0.1:
+            split = encode(names, split_among, SHARES, [rng.randint(1, 4) for _ in split_among])
+        else:
+            split = encode(names, split_among)
+        rows.append({
+            "desc": f"{rng.choice(DESCRIPTIONS)} {i}",
+            "amount_minor": rng.randint(100, 2000000),
+            "paid_by": rng.choice(names),
+            "split": split,
+        })
+    return {"members": names, "expenses": rows}
+
+
+def personal_history(years, per_day=3, start=date(2022, 1, 1), seed=0):
+    """Return ("YYYY-MM-DD", item, amount_paise) rows covering `years` years from `start`."""
+    rng = random.Random(seed)
+    rows = []
+    day = start
+    end = date(start.year + years, start.month, start.day)
+    while day < end:
+        for _ in range(rng.randint(0, 2 * per_day)):
+            rows.append((day.isoformat(), rng.choice(ITEMS), rng.randint(1000, 500000)))
+        day += timedelta(days=1)
+    return rows
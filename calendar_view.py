@@ -0,0 +1,32 @@
+"""HTML month calendar for the tracker, with expense days highlighted."""
+import calendar
+from html import escape
+
+
+def calendar_html(year, month, expense_dates, over_budget=None):
+    # Generate a monthly calendar with highlighted expense dates; `over_budget`
+    # maps the days on which a budget was overspent to the budgets' names
+    over_budget = over_budget or {}
+    month_calendar = calendar.monthcalendar(year, month)
+    html = "<table style='width:100%; text-align:center; font-size:16px;'>"
+    
+    # Table headers
+    html += "<tr><th>Mon</th><th>Tue</th><th>Wed</th><th>Thu</th><th>Fri</th><th style='color:#e03131;'>Sat</th><th style='color:#e03131;'>Sun</th></tr>"
+    
+    # Populate calendar with highlighted days
+    for week in month_calendar:
+        html += "<tr>"
+        for day in week:
+            if day == 0:
+                html += "<td></td>"  # Empty cell for padding
+            elif day in over_budget:
+                names = escape(", ".join(over_budget[day]), quote=True)
+                html += f"<td title='Over budget: {names}' style='background-color:#ffa8a8; border-radius: 5px; padding:8px;'>{day} ⚠️</td>"  # Red where a budget was overspent
+            elif day in expense_dates:
+                html += f"<td style='background-color:#8ce99a; border-radius: 5px; padding:8px;'>{day}</td>"  # Highlighted in light green
+            else:
+                html += f"<td style='padding:8px;'>{day}</td>"
+        html += "</tr>"
+    
+    html += "</table>"
+    return html
@@ -0,0 +1,141 @@
+"""Offline category tagging for tracker items and expense descriptions.
+
+Free text like "Uber", "uber ride" and "Cab" is mapped to one category
+(Transport) without any network or Gemini call:
+
+1. `normalize` lower-cases the text, strips accents, punctuation and
+   numbers ("Uber ride #2 " -> "uber ride");
+2. the rules table, a CSV of keyword,category rows (CATEGORY_RULES, else
+   the bundled categories.csv), is matched phrase first, then word by
+   word, trying a word's singular ("medicines" -> "medicine") and then
+   a close spelling ("grocries" -> "groceries"); the earliest matching
+   row wins;
+3. text no rule matches goes, in one batch, to an optional local model:
+   set CATEGORY_MODEL to a pickle of your own object with a scikit-learn
+   style `predict(texts) -> categories` method;
+4. anything left is OTHER.
+
+A Classifier remembers the category of every normalized string it has
+seen, so a repeated item costs a dict lookup, and `categorize_many`
+classifies only the distinct new strings of a batch (e.g. an import).
+`get_classifier` keeps one Classifier per version of the rules and model
+files, as fx.load_rates does for rate tables.
+"""
+import csv
+import difflib
+import os
+import pickle
+import re
+import unicodedata
+from functools import lru_cache
+
+from clients import get_config
+
+DEFAULT_RULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "categories.csv")
+OTHER = "Other"
+FUZZY_CUTOFF = 0.85  # difflib ratio for a misspelled keyword to count
+FUZZY_MIN_LENGTH = 4  # shorter words only match exactly
+
+_NOT_WORD = re.compile(r"[^a-z]+")
+
+
+@lru_cache(maxsize=65536)
+def normalize(text):
+    """Lower-case ASCII words of `text` separated by single spaces."""
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii")
+    return " ".join(_NOT_WORD.sub(" ", text.lower()).split())
+
+
+class Classifier:
+    def __init__(self, rules, model=None):
+        """`rules` are (keyword, category) pairs, earlier ones first; `model` is optional."""
+        self._phrases = []  # (" phrase ", rank, category) for multi-word keywords
+        self._words = {}  # word -> (rank, category)
+        order = []
+        for rank, (keyword, category) in enumerate(rules):
+            keyword = normalize(keyword)
+            if not keyword:
+                continue
+            if " " in keyword:
+                self._phrases.append((f" {keyword} ", rank, category))
+            else:
+                self._words.setdefault(keyword, (rank, category))
+            if category not in order:
+                order.append(category)
+        self.categories = order + [OTHER] if OTHER not in order else order
+        self._vocabulary = [word for word in self._words if len(word) >= FUZZY_MIN_LENGTH]
+        self._model = model
+        self._memo = {"": OTHER}  # normalized text -> category
+
+    def _word(self, word):
+        # (rank, category) of the rule matching one word, or None
+        match = self._words.get(word)
+        if match is None and len(word) > 3 and word.endswith("s"):
+            match = self._words.get(word[:-3] + "y" if word.endswith("ies") else word[:-1])
+        if match is None and len(word) >= FUZZY_MIN_LENGTH:
+            close = difflib.get_close_matches(word, self._vocabulary, n=1, cutoff=FUZZY_CUTOFF)
+            match = self._words[close[0]] if close else None
+        return match
+
+    def _rules(self, text):
+        # Category from the rules table, or None
+        padded = f" {text} "
+        for phrase, _, category in self._phrases:
+            if phrase in padded:
+                return category
+        matches = [match for match in map(self._word, text.split()) if match is not None]
+        return min(matches)[1] if matches else None
+
+    def categorize(self, text):
+        return self.categorize_many([text])[0]
+
+    def categorize_many(self, texts):
+        """Category of each of `texts`, classifying each new normalized string once."""
+        keys = [normalize(text) for text in texts]
+        memo = self._memo
+        misses = []
+        for key in dict.fromkeys(keys):
+            if key not in memo:
+                category = self._rules(key)
+                if category is None:
+                    misses.append(key)
+                else:
+                    memo[key] = category
+        if misses:
+            predicted = list(self._model.predict(misses)) if self._model is not None else []
+            for key, category in zip(misses, predicted + [OTHER] * (len(misses) - len(predicted))):
+                memo[key] = str(category or OTHER)
+        return [memo[key] for key in keys]
+
+
+def read_rules(path=DEFAULT_RULES):
+    """(keyword, category) pairs from a rules CSV, in file order."""
+    with open(path, newline="") as f:
+        return [(row["keyword"], row["category"].strip()) for row in csv.DictReader(f) if row["category"].strip()]
+
+
+def _read_model(path):
+    # The user's own model file: only ever loaded from the configured local path
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+@lru_cache(maxsize=4)
+def _load(rules_path, rules_mtime_ns, model_path, model_mtime_ns):
+    return Classifier(read_rules(rules_path), _read_model(model_path) if model_path else None)
+
+
+def get_classifier():
+    """The Classifier for the current rules (and model) files, rebuilt only when they change."""
+    rules_path = get_config("CATEGORY_RULES") or DEFAULT_RULES
+    model_path = get_config("CATEGORY_MODEL")
+    model_mtime = os.stat(model_path).st_mtime_ns if model_path else None
+    return _load(rules_path, os.stat(rules_path).st_mtime_ns, model_path, model_mtime)
+
+
+def categorize(text):
+    return get_classifier().categorize(text)
+
+
+def categorize_many(texts):
+    return get_classifier().categorize_many(texts)
@@ -0,0 +1,72 @@
+"""Lazily created SDK clients shared across reruns and sessions.
+
+Streamlit re-executes the app script on every interaction, but imported
+modules are only loaded once per process. Keeping the clients here means
+`.env` is read once, and the Gemini and Razorpay SDKs are only imported
+and configured the first time a feature actually needs them.
+"""
+import os
+import threading
+
+_lock = threading.Lock()
+_env_loaded = False
+_clients = {}
+
+
+def get_config(name):
+    """Read a setting from the environment, loading `.env` on first use."""
+    global _env_loaded
+    if not _env_loaded:
+        with _lock:
+            if not _env_loaded:
+                from dotenv import load_dotenv
+
+                load_dotenv()
+                _env_loaded = True
+    return os.getenv(name)
+
+
+def _get_or_create(name, factory):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = factory()
+    return client
+
+
+def get_genai():
+    """Return the configured google.generativeai module."""
+    def configure():
+        import google.generativeai as genai
+
+        genai.configure(api_key=get_config("GOOGLE_API_KEY"))
+        return genai
+
+    return _get_or_create("genai", configure)
+
+
+def get_razorpay_client():
+    """Return a Razorpay client backed by a pooled HTTP session."""
+    def create():
+        import razorpay
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        # Enough pooled connections for concurrent order creation
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        options = {}
+        if get_config("RAZORPAY_BASE_URL"):
+            # e.g. a local stub server (benchmarks/stub_razorpay.py)
+            options["base_url"] = get_config("RAZORPAY_BASE_URL")
+        return razorpay.Client(
+            session=session,
+            auth=(get_config("RAZORPAY_KEY"), get_config("RAZORPAY_SECRET")),
+            **options,
+        )
+
+    return _get_or_create("razorpay", create)
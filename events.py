@@ -0,0 +1,168 @@
+"""Append-only event log for groups, with compact snapshots.
+
+Every group write is recorded as one event whose sequence number is the
+group version it produced, so the log doubles as an audit trail. A group
+state can be rebuilt from the latest snapshot at or before a version plus
+the events after it, which gives point-in-time balances and keeps loading
+a group to one snapshot and a short tail. Only the latest few snapshots
+(and the empty group at version 0) are kept, so older versions replay
+a longer tail instead of the snapshot table growing with every batch.
+
+Snapshots are zlib-compressed JSON holding members, expenses as
+[id, desc, amount_minor, paid_by, mode, mask, weights, currency, date]
+rows (the split spec from splits.py, flattened), payments as
+[id, payer, payee, amount_minor, order_id, currency, date] rows and the
+ledger's per-currency balances, so restoring one never replays expenses
+through the ledger. In memory a state keeps its expenses as
+model.Expense objects.
+"""
+import json
+import zlib
+
+from ledger import BalanceLedger
+from model import Expense, ExpenseTable, Members
+from money import HOME_CURRENCY, format_money
+
+MEMBER_ADDED = "member_added"
+EXPENSES_ADDED = "expenses_added"
+EXPENSE_EDITED = "expense_edited"
+EXPENSE_DELETED = "expense_deleted"
+PAYMENT_RECORDED = "payment_recorded"
+
+# Snapshot after this many events, or after a batch adding this many expenses
+SNAPSHOT_EVERY = 200
+# Snapshots kept per group besides the empty one at version 0
+SNAPSHOTS_KEPT = 3
+
+
+def expense_row(expense):
+    return [
+        expense["id"], expense["desc"], expense["amount_minor"], expense["paid_by"], *expense["split"],
+        expense.get("currency", HOME_CURRENCY), expense.get("date"),
+    ]
+
+
+def expense_from_row(row, members):
+    expense_id, desc, amount_minor, paid_by, mode, mask, weights, currency, day = row
+    return Expense(expense_id, desc, amount_minor, members.index(paid_by), mode, mask, weights, currency, day)
+
+
+def row_currency(row):
+    return row[7]
+
+
+def payment_row(payment):
+    return [
+        payment["id"], payment["payer"], payment["payee"], payment["amount_minor"], payment["order_id"],
+        payment.get("currency", HOME_CURRENCY), payment.get("date"),
+    ]
+
+
+def payment_dict(row):
+    payment_id, payer, payee, amount_minor, order_id, currency, day = row
+    return {
+        "id": payment_id, "payer": payer, "payee": payee, "amount_minor": amount_minor, "order_id": order_id,
+        "currency": currency, "date": day,
+    }
+
+
+class GroupState:
+    """A group's members, expenses, payments and balances at some version."""
+
+    def __init__(self, members=(), expenses=(), payments=(), balances=None, version=0):
+        self.members = Members(members)
+        self.expenses = {expense.id: expense for expense in expenses}  # id -> Expense, in id order
+        self.payments = list(payments)
+        if balances is None:
+            self.ledger = BalanceLedger.from_expenses(self.members, ExpenseTable(self.expenses.values()), self.payments)
+        else:
+            self.ledger = BalanceLedger.from_balances(self.members, balances)
+        self.version = version
+
+    def apply(self, seq, kind, payload):
+        """Apply one event; `seq` is the version it produced."""
+        if kind == MEMBER_ADDED:
+            if payload["member"] not in self.members:
+                self.members.append(payload["member"])
+                self.ledger.add_member(payload["member"])
+        elif kind == EXPENSES_ADDED:
+            expenses = [expense_from_row(row, self.members) for row in payload["expenses"]]
+            for expense in expenses:
+                self.expenses[expense.id] = expense
+            self.ledger.add_expenses(expenses)
+        elif kind == EXPENSE_EDITED:
+            expense = expense_from_row(payload["expense"], self.members)
+            self.ledger.edit_expense(self.expenses[expense.id], expense)
+            self.expenses[expense.id] = expense
+        elif kind == EXPENSE_DELETED:
+            self.ledger.remove_expense(self.expenses.pop(payload["expense"][0]))
+        elif kind == PAYMENT_RECORDED:
+            payment = payment_dict(payload["payment"])
+            self.payments.append(payment)
+            self.ledger.add_payment(payment)
+        else:
+            raise ValueError(f"Unknown event kind: {kind}")
+        self.version = seq
+
+    def to_group(self):
+        """The group in the storage dict shape, with the ledger's balances."""
+        return {
+            "members": list(self.members),
+            "expenses": [expense.to_dict(self.members) for expense in self.expenses.values()],
+            "payments": list(self.payments),
+            "version": self.version,
+            "balances": {currency: dict(book) for currency, book in self.ledger.balances.items()},
+        }
+
+    def snapshot(self):
+        return zlib.compress(json.dumps({
+            "members": self.members,
+            "expenses": [expense_row(expense.to_dict(self.members)) for expense in self.expenses.values()],
+            "payments": [payment_row(payment) for payment in self.payments],
+            "balances": self.ledger.balances,
+        }, separators=(",", ":")).encode("utf-8"), 1)
+
+    @classmethod
+    def from_snapshot(cls, data, version):
+        state = json.loads(zlib.decompress(data))
+        members = Members(state["members"])
+        expenses = [expense_from_row(row, members) for row in state["expenses"]]
+        return cls(members, expenses, map(payment_dict, state.get("payments", [])), state["balances"], version)
+
+
+def _amount(row):
+    return format_money(row[2], row_currency(row))
+
+
+def describe(kind, payload):
+    """One-line, human-readable description of an event for the audit view."""
+    if kind == MEMBER_ADDED:
+        return f"Added member {payload['member']}"
+    if kind == EXPENSES_ADDED:
+        rows = payload["expenses"]
+        if len(rows) == 1:
+            return f"Added expense #{rows[0][0]} {rows[0][1]} ({_amount(rows[0])}, paid by {rows[0][3]})"
+        currencies = {row_currency(row) for row in rows}
+        if len(currencies) > 1:
+            return f"Added {len(rows)} expenses"
+        return f"Added {len(rows)} expenses ({format_money(sum(row[2] for row in rows), currencies.pop())})"
+    if kind == EXPENSE_EDITED:
+        old, new = payload["previous"], payload["expense"]
+        return f"Edited expense #{new[0]}: {old[1]} ({_amount(old)}) → {new[1]} ({_amount(new)})"
+    if kind == EXPENSE_DELETED:
+        row = payload["expense"]
+        return f"Deleted expense #{row[0]} {row[1]} ({_amount(row)})"
+    if kind == PAYMENT_RECORDED:
+        payment = payment_dict(payload["payment"])
+        via = f" (order {payment['order_id']})" if payment["order_id"] else ""
+        amount = format_money(payment["amount_minor"], payment["currency"])
+        return f"{payment['payer']} paid {payment['payee']} {amount}{via}"
+    return kind
+
+
+def encode_event(payload):
+    return json.dumps(payload, separators=(",", ":"))
+
+
+def decode_event(text):
+    return json.loads(text)
@@ -0,0 +1,184 @@
+"""Sortable, filterable index over a group's expense list.
+
+The expense table's columns (see model.py) are loaded once into NumPy:
+amounts, currencies, payer ids, split masks, lower-cased descriptions and
+the descriptions' categories (tagged in one batch, see categories.py), so
+"involving" filters test one bit per expense. Sorting
+and filtering by payer, member, category or description text then work on index
+arrays only, and `page()` builds a DataFrame for just the visible rows,
+so a 50k-expense group never sends (or styles) more than one page.
+Sort orders and filter masks are cached for the life of the index; build
+a new index when the expenses change, e.g. keyed on the group's version
+as the apps do (see balances_key in test.py).
+Amounts in several currencies sort by `sort_amounts`, e.g. the amounts
+converted to one currency with fx.RateTable.convert_table.
+"""
+import numpy as np
+import pandas as pd
+
+from categories import categorize_many
+from money import minor_units
+from splits import describe_split
+
+SORT_KEYS = {
+    "Added": "position",
+    "Description": "desc",
+    "Category": "category",
+    "Amount": "amount",
+    "Paid By": "paid_by",
+}
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+class ExpenseIndex:
+    def __init__(self, expenses, members, sort_amounts=None):
+        self._expenses = expenses  # an ExpenseTable
+        self._members = list(members)
+        self._amounts = expenses.amount_array()
+        self._sort_amounts = self._amounts if sort_amounts is None else sort_amounts
+        self._currencies = expenses.currency_array()
+        # Minor units per unit of each currency code
+        self._scales = np.array([10 ** minor_units(c) for c in expenses.currency_names] or [100], dtype=np.int64)
+        self._descs = np.array([desc.lower() for desc in expenses.descs], dtype=object)
+        categories = np.array(categorize_many(expenses.descs), dtype=object)
+        names, self._categories = np.unique(categories, return_inverse=True)
+        self.category_names = names.tolist()
+        self._payers = expenses.payer_array()
+        self._split_masks = expenses.mask_array()
+
+        self._orders = {}  # sort key -> positions in ascending order
+        self._masks = {}  # (kind, value) -> boolean mask over positions
+
+    def __len__(self):
+        return len(self._expenses)
+
+    def _order(self, key):
+        order = self._orders.get(key)
+        if order is None:
+            if key == "position":
+                order = np.arange(len(self._expenses))
+            elif key == "amount":
+                order = np.argsort(self._sort_amounts, kind="stable")
+            elif key == "desc":
+                order = np.argsort(self._descs, kind="stable")
+            elif key == "category":  # codes are in name order
+                order = np.argsort(self._categories, kind="stable")
+            elif key == "paid_by":
+                # Rank of each member id among the sorted member names
+                ranks = np.empty(len(self._members), dtype=np.int64)
+                ranks[np.argsort(np.array(self._members, dtype=object), kind="stable")] = np.arange(len(self._members))
+                order = np.argsort(ranks[self._payers], kind="stable")
+            else:
+                raise ValueError(f"Unknown sort key: {key}")
+            self._orders[key] = order
+        return order
+
+    def _mask(self, kind, value):
+        mask = self._masks.get((kind, value))
+        if mask is None:
+            if kind == "payer":
+                member_id = self._members.index(value) if value in self._members else -1
+                mask = self._payers == member_id
+            elif kind == "member":
+                # Involved as payer or as part of the split
+                mask = self._mask("payer", value)
+                if value in self._members:
+                    member_id = self._members.index(value)
+                    if self._split_masks is None:  # masks wider than 64 bits
+                        bit = 1 << member_id
+                        in_split = np.fromiter((m & bit != 0 for m in self._expenses.masks), dtype=bool, count=len(self))
+                    elif member_id < 64:
+                        in_split = (self._split_masks >> np.uint64(member_id)) & np.uint64(1) == 1
+                    else:
+                        in_split = np.zeros(len(self), dtype=bool)
+                    mask = mask | in_split
+            elif kind == "category":
+                code = self.category_names.index(value) if value in self.category_names else -1
+                mask = self._categories == code
+            else:  # case-insensitive description substring
+                mask = np.fromiter((value in desc for desc in self._descs), dtype=bool, count=len(self._descs))
+            self._masks[(kind, value)] = mask
+        return mask
+
+    def query(self, payer=None, member=None, text="", sort="position", descending=False, category=None):
+        """Return expense positions matching all filters, in sorted order."""
+        order = self._order(sort)
+        if descending:
+            order = order[::-1]
+        mask = None
+        filters = (("payer", payer), ("member", member), ("category", category), ("text", text.strip().lower()))
+        for kind, value in filters:
+            if value:
+                mask = self._mask(kind, value) if mask is None else mask & self._mask(kind, value)
+        return order if mask is None else order[mask[order]]
+
+    def page(self, positions, page, page_size):
+        """DataFrame of one page of `positions`, indexed by 1-based expense number."""
+        rows = positions[page * page_size:(page + 1) * page_size]
+        expenses = self._expenses
+        members = self._members
+        shown = [expenses[i] for i in rows]
+        return pd.DataFrame(
+            {
+                "desc": [e.desc for e in shown],
+                "category": [self.category_names[code] for code in self._categories[rows]],
+                "amount": self._amounts[rows] / self._scales[self._currencies[rows]],
+                "currency": [e.currency for e in shown],
+                "date": [e.date for e in shown],
+                "paid_by": [members[i] for i in self._payers[rows]],
+                "split": [describe_split(e.split, members, e.currency) for e in shown],
+            },
+            index=pd.Index(rows + 1, name="#"),
+        )
+
+
+def paginated_expense_table(key, index, members, style=None):
+    """Streamlit filter/sort/page controls plus a table of the visible page.
+
+    `style` optionally turns the page DataFrame into a Styler. Returns the
+    positions shown on the page, e.g. for a remove-expense picker.
+    """
+    import streamlit as st
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        payer = st.selectbox("Paid By", ["Anyone"] + list(members), key=f"{key}_payer")
+    with col2:
+        member = st.selectbox("Involving", ["Anyone"] + list(members), key=f"{key}_member")
+    with col3:
+        category = st.selectbox("Category", ["Any"] + index.category_names, key=f"{key}_category")
+    with col4:
+        text = st.text_input("Description contains", key=f"{key}_text")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        sort = st.selectbox("Sort By", list(SORT_KEYS), key=f"{key}_sort")
+    with col2:
+        descending = st.toggle("Descending", key=f"{key}_descending")
+    with col3:
+        page_size = st.selectbox("Rows per Page", PAGE_SIZES, key=f"{key}_page_size")
+
+    positions = index.query(
+        payer=None if payer == "Anyone" else payer,
+        member=None if member == "Anyone" else member,
+        category=None if category == "Any" else category,
+        text=text,
+        sort=SORT_KEYS[sort],
+        descending=descending,
+    )
+    pages = max(1, -(-len(positions) // page_size))
+    # Back to the first page whenever the filters, sort or page size change
+    view = (payer, member, category, text, sort, descending, page_size, len(index))
+    if st.session_state.get(f"{key}_view") != view:
+        st.session_state[f"{key}_view"] = view
+        st.session_state[f"{key}_page"] = 1
+    with col4:
+        page = st.number_input("Page", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    page = min(page, pages) - 1
+
+    frame = index.page(positions, page, page_size)
+    if len(positions):
+        st.caption(f"Showing {page * page_size + 1}–{page * page_size + len(frame)} of {len(positions)} expenses")
+        st.dataframe(frame if style is None else style(frame), use_container_width=True)
+    else:
+        st.info("No expenses match these filters.")
+    return positions[page * page_size:(page + 1) * page_size]
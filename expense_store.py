@@ -0,0 +1,245 @@
+"""Append-friendly store for the monthly tracker's Date/Item/Amount rows.
+
+Rows are partitioned by (year, month) into small column buffers, so
+adding an expense never copies the existing table and a month view only
+touches that month's rows. Dates are kept as day ordinals and each month
+keeps the set of days that have expenses for calendar highlighting,
+plus running per-item, per-category and month totals for the summary
+panel. Each row is tagged with a category (see categories.py) as it is
+added; `extend` tags a whole batch at once, so a large import classifies
+each distinct item once.
+DataFrames are only built when a view asks for one and are cached until
+the next append to that month.
+
+Recurring expenses (see recurring.py) are expanded into a month's
+partition the first time that month is viewed, marked as recurring, and
+dropped again when the rules change, so no month is materialized before
+it is needed. Budget-vs-actual for a month comes from its running
+per-(item, category) totals and is cached like the other views; a
+budget named after a category covers every item tagged with it.
+"""
+import heapq
+from datetime import date
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+from categories import categorize, categorize_many
+from money import to_paise
+from recurring import OVERALL, budget_key, occurrences
+
+COLUMNS = ["Date", "Item", "Category", "Amount", "Recurring"]
+
+# Ordinal of 1970-01-01, to turn day ordinals into datetime64 days
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class _Month:
+    __slots__ = (
+        "ordinals", "items", "categories", "amounts", "recurring", "days",
+        "item_totals", "category_totals", "pair_totals", "total", "frame", "top", "top_categories", "budget",
+    )
+
+    def __init__(self):
+        self.ordinals = []
+        self.items = []
+        self.categories = []
+        self.amounts = []  # paise
+        self.recurring = []  # True for occurrences of recurring expenses
+        self.days = set()
+        self.item_totals = {}  # item -> paise
+        self.category_totals = {}  # category -> paise
+        self.pair_totals = {}  # (item, category) -> paise, for budgets
+        self.total = 0  # paise
+        self.frame = None
+        self.top = None  # cached (n, top-n items)
+        self.top_categories = None  # cached (n, top-n categories)
+        self.budget = None  # cached budget_status()
+
+
+class ExpenseStore:
+    def __init__(self):
+        self._months = {}  # (year, month) -> _Month
+        self._size = 0
+        self._frame = None
+        self._rules = []  # recurring expense rules
+        self._expanded = set()  # months holding their recurring occurrences
+        self._budgets = {}  # budget_key(name) -> (name, paise)
+        self.version = 0  # bumped on every mutation
+
+    def __len__(self):
+        return self._size
+
+    def append(self, expense_date, item, amount):
+        """Add one expense; `expense_date` is a date or "YYYY-MM-DD", `amount` is in rupees."""
+        self._append(expense_date, item, categorize(item), to_paise(amount))
+        self.version += 1
+
+    def extend(self, rows):
+        """Add (date, item, amount_paise) rows, e.g. loaded from storage or imported."""
+        rows = list(rows)
+        categories = categorize_many([item for _, item, _ in rows])
+        for (expense_date, item, amount_paise), category in zip(rows, categories):
+            self._append(expense_date, item, category, amount_paise)
+        self.version += 1
+
+    def _append(self, expense_date, item, category, amount_paise, recurring=False):
+        if isinstance(expense_date, str):
+            expense_date = date.fromisoformat(expense_date)
+        key = (expense_date.year, expense_date.month)
+        month = self._months.get(key)
+        if month is None:
+            month = self._months[key] = _Month()
+        month.ordinals.append(expense_date.toordinal())
+        month.items.append(item)
+        month.categories.append(category)
+        month.amounts.append(amount_paise)
+        month.recurring.append(recurring)
+        month.days.add(expense_date.day)
+        month.item_totals[item] = month.item_totals.get(item, 0) + amount_paise
+        month.category_totals[category] = month.category_totals.get(category, 0) + amount_paise
+        pair = (item, category)
+        month.pair_totals[pair] = month.pair_totals.get(pair, 0) + amount_paise
+        month.total += amount_paise
+        month.frame = None
+        month.top = None
+        month.top_categories = None
+        month.budget = None
+        self._frame = None
+        self._size += 1
+
+    def set_recurring(self, rules):
+        """Replace the recurring expense rules; months are re-expanded when next viewed."""
+        self._rules = list(rules)
+        for key in self._expanded:
+            old = self._months.pop(key, None)
+            if old is None:
+                continue
+            self._size -= len(old.ordinals)
+            rows = zip(old.ordinals, old.items, old.categories, old.amounts, old.recurring)
+            for ordinal, item, category, amount_paise, recurring in rows:
+                if not recurring:
+                    self._append(date.fromordinal(ordinal), item, category, amount_paise)
+        self._expanded.clear()
+        self._frame = None
+        self.version += 1
+
+    def set_budgets(self, budgets):
+        """Replace the monthly budgets, a {name: paise} dict (see recurring.budget_key)."""
+        self._budgets = {budget_key(name): (name, amount_paise) for name, amount_paise in budgets.items()}
+        for partition in self._months.values():
+            partition.budget = None
+        self.version += 1
+
+    @property
+    def recurring(self):
+        return list(self._rules)
+
+    @property
+    def budgets(self):
+        return dict(self._budgets.values())
+
+    def _partition(self, year, month):
+        # The month's partition (or None), with its recurring expenses expanded on first use
+        key = (year, month)
+        if key not in self._expanded:
+            self._expanded.add(key)
+            for rule in self._rules:
+                for day in occurrences(rule, year, month):
+                    self._append(day, rule["item"], categorize(rule["item"]), rule["amount_paise"], recurring=True)
+        return self._months.get(key)
+
+    def expense_days(self, year, month):
+        """Days of the month that have at least one expense."""
+        partition = self._partition(year, month)
+        return partition.days if partition is not None else set()
+
+    def month_total(self, year, month):
+        """Total spent in the month, in paise."""
+        partition = self._partition(year, month)
+        return partition.total if partition is not None else 0
+
+    def budget_status(self, year, month):
+        """Budget vs actual for the month: (name, budget, spent, over_day) per budget, in paise.
+
+        A budget counts the items with its name and the items tagged with it
+        as their category, from the month's running totals per (item,
+        category), so only distinct pairs are visited, not every row;
+        over_day is the day the spending went over the budget, or None.
+        """
+        partition = self._partition(year, month)
+        if partition is None:
+            return [(name, budget, 0, None) for name, budget in self._budgets.values()]
+        if partition.budget is None:
+            spent = {OVERALL: partition.total}
+            for (item, category), total in partition.pair_totals.items():
+                for key in {budget_key(item), budget_key(category)}:
+                    if key in self._budgets:
+                        spent[key] = spent.get(key, 0) + total
+            partition.budget = [
+                (name, budget, spent.get(key, 0), _over_day(partition, key, budget) if spent.get(key, 0) > budget else None)
+                for key, (name, budget) in self._budgets.items()
+            ]
+        return partition.budget
+
+    def top_items(self, year, month, n=5):
+        """Return the month's `n` largest (item, total paise) pairs, largest first."""
+        partition = self._partition(year, month)
+        if partition is None:
+            return []
+        if partition.top is None or partition.top[0] != n:
+            partition.top = (n, heapq.nlargest(n, partition.item_totals.items(), key=itemgetter(1)))
+        return partition.top[1]
+
+    def top_categories(self, year, month, n=5):
+        """Return the month's `n` largest (category, total paise) pairs, largest first."""
+        partition = self._partition(year, month)
+        if partition is None:
+            return []
+        if partition.top_categories is None or partition.top_categories[0] != n:
+            partition.top_categories = (n, heapq.nlargest(n, partition.category_totals.items(), key=itemgetter(1)))
+        return partition.top_categories[1]
+
+    def month(self, year, month):
+        """Return the month's rows as a DataFrame, cached until it changes."""
+        partition = self._partition(year, month)
+        if partition is None:
+            return _frame([], [], [], [], [])
+        if partition.frame is None:
+            partition.frame = _frame(
+                partition.ordinals, partition.items, partition.categories, partition.amounts, partition.recurring
+            )
+        return partition.frame
+
+    def to_frame(self):
+        """Return all rows of the months loaded so far (grouped by month) as a DataFrame."""
+        if self._frame is None:
+            frames = [self.month(*key) for key in sorted(self._months)]
+            self._frame = pd.concat(frames, ignore_index=True) if frames else _frame([], [], [], [], [])
+        return self._frame
+
+
+def _over_day(partition, key, budget):
+    # Day of the month on which the budget's running total first went over
+    if key == OVERALL:
+        rows = range(len(partition.items))
+    else:
+        pairs = zip(partition.items, partition.categories)
+        rows = [i for i, (item, category) in enumerate(pairs) if key in (budget_key(item), budget_key(category))]
+    ordinals = np.array([partition.ordinals[i] for i in rows], dtype=np.int64)
+    amounts = np.array([partition.amounts[i] for i in rows], dtype=np.int64)
+    order = np.argsort(ordinals, kind="stable")
+    crossed = int(np.argmax(np.cumsum(amounts[order]) > budget))
+    return date.fromordinal(int(ordinals[order][crossed])).day
+
+
+def _frame(ordinals, items, categories, amounts, recurring):
+    days = np.array(ordinals, dtype=np.int64) - EPOCH_ORDINAL
+    return pd.DataFrame({
+        "Date": days.astype("datetime64[D]"),
+        "Item": np.array(items, dtype=object),
+        "Category": np.array(categories, dtype=object),
+        "Amount": np.array(amounts, dtype=np.int64) / 100,
+        "Recurring": np.array(recurring, dtype=bool),
+    }, columns=COLUMNS)
@@ -0,0 +1,146 @@
+"""Lazy, chunked CSV / Parquet / JSONL export.
+
+Exports are generated only when a download is requested, written out in
+row chunks straight from the row source (no intermediate DataFrame), and
+cached by a hash of the data's version so repeated downloads of an
+unchanged group are free.
+"""
+import csv
+import hashlib
+import io
+import json
+from collections import OrderedDict
+from itertools import islice
+
+from instrumentation import timed
+
+CHUNK_ROWS = 10000
+
+# format -> (file extension, mime type)
+FORMATS = {
+    "csv": ("csv", "text/csv"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "jsonl": ("jsonl", "application/x-ndjson"),
+}
+
+
+def _chunks(rows, chunk_rows):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _csv_value(value):
+    # Lists (e.g. split_among) become a "; "-separated cell
+    return "; ".join(map(str, value)) if isinstance(value, (list, tuple)) else value
+
+
+def iter_csv(columns, rows, chunk_rows=CHUNK_ROWS):
+    """Yield UTF-8 CSV bytes, one chunk of rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    for chunk in _chunks(rows, chunk_rows):
+        writer.writerows([_csv_value(v) for v in row] for row in chunk)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_jsonl(columns, rows, chunk_rows=CHUNK_ROWS):
+    """Yield JSON Lines bytes, one chunk of rows at a time."""
+    for chunk in _chunks(rows, chunk_rows):
+        lines = (json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str) for row in chunk)
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def iter_parquet(columns, rows, chunk_rows=CHUNK_ROWS):
+    """Yield a Parquet file with one row group per chunk."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = io.BytesIO()
+    writer = None
+    for chunk in _chunks(rows, chunk_rows):
+        table = pa.Table.from_pylist([dict(zip(columns, row)) for row in chunk])
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema)
+        writer.write_table(table.cast(writer.schema))
+        yield _drain(sink)
+    if writer is None:
+        writer = pq.ParquetWriter(sink, pa.schema([(column, pa.string()) for column in columns]))
+    writer.close()
+    yield _drain(sink)
+
+
+def _drain(sink):
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+
+EXPORTERS = {"csv": iter_csv, "parquet": iter_parquet, "jsonl": iter_jsonl}
+
+
+def export_bytes(fmt, columns, rows, chunk_rows=CHUNK_ROWS):
+    return b"".join(EXPORTERS[fmt](columns, rows, chunk_rows))
+
+
+def content_key(*parts):
+    """Hash identifying one version of some exported data."""
+    return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+
+
+class ExportCache:
+    """Small LRU of generated exports keyed by (content key, format)."""
+
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key, fmt):
+        data = self._entries.get((key, fmt))
+        if data is not None:
+            self._entries.move_to_end((key, fmt))
+        return data
+
+    def get_or_create(self, key, fmt, columns, make_rows):
+        """Return cached bytes, generating them from `make_rows()` on a miss."""
+        data = self.get(key, fmt)
+        if data is None:
+            with timed(f"Export {fmt}"):
+                data = export_bytes(fmt, columns, make_rows())
+            self._entries[(key, fmt)] = data
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return data
+
+
+def lazy_download_button(label, key, file_stem, columns, make_rows, content, cache):
+    """Streamlit download widget that only generates the file when asked.
+
+    `content` identifies the data version (e.g. group name and ledger
+    version); `make_rows()` is only called on a cache miss.
+    """
+    import streamlit as st
+
+    fmt = st.radio(f"{label} format", list(FORMATS), horizontal=True, key=f"{key}_format")
+    cache_key = content_key(key, *content)
+    data = cache.get(cache_key, fmt)
+    if data is None and st.button(f"Prepare {label}", key=f"{key}_prepare"):
+        data = cache.get_or_create(cache_key, fmt, columns, make_rows)
+    if data is not None:
+        extension, mime = FORMATS[fmt]
+        st.download_button(
+            label=f"Download {label}",
+            data=data,
+            file_name=f"{file_stem}.{extension}",
+            mime=mime,
+            key=f"{key}_download"
+        )
@@ -0,0 +1,137 @@
+"""FX rate tables for converting expenses between currencies.
+
+Rates come from a local snapshot file, never from a network call on a
+rerun. Either format works:
+
+- CSV with date, currency and rate columns;
+- JSON like {"quote": "INR", "rates": {"2024-01-01": {"USD": 83.2}}}.
+
+A rate is the value of one unit of the currency in the table's quote
+currency (INR unless the JSON says otherwise) on that date. The rate for
+a date is the latest one on or before it, so a weekly or monthly
+snapshot covers every day in between; dateless amounts use the latest
+rate. Tables are parsed once per file version and kept in memory
+(`load_rates`), one sorted date array per currency, so a lookup is a
+binary search and `convert` handles a whole column of amounts with one
+search per currency instead of one call per expense.
+"""
+import csv
+import json
+import os
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+
+from clients import get_config
+from money import HOME_CURRENCY, minor_units
+
+DEFAULT_RATES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fx_rates.csv")
+NO_DATE = 0  # day number of amounts without a date: use the latest rate
+
+
+def day_number(value):
+    """Day number (proleptic ordinal) of an ISO date string or date; NO_DATE for None."""
+    if value is None:
+        return NO_DATE
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value.toordinal()
+
+
+class RateTable:
+    def __init__(self, rows, quote=HOME_CURRENCY):
+        """`rows` are (ISO date, currency, rate) triples."""
+        self.quote = quote
+        self.source = None  # (path, mtime_ns) of the file it was read from, see load_rates
+        by_currency = {}
+        for day, currency, rate in rows:
+            by_currency.setdefault(currency, {})[day_number(day)] = float(rate)
+        self._days = {}
+        self._rates = {}
+        for currency, rates in by_currency.items():
+            days = sorted(rates)
+            self._days[currency] = np.array(days, dtype=np.int64)
+            self._rates[currency] = np.array([rates[day] for day in days], dtype=np.float64)
+
+    @property
+    def currencies(self):
+        return sorted({self.quote, *self._days})
+
+    @property
+    def latest(self):
+        """Date of the newest rate in the table, or None."""
+        days = [int(d[-1]) for d in self._days.values() if len(d)]
+        return date.fromordinal(max(days)) if days else None
+
+    def rates(self, currency, days):
+        """Quote-currency value of one unit of `currency` on each of `days`."""
+        days = np.asarray(days, dtype=np.int64)
+        if currency == self.quote:
+            return np.ones(len(days))
+        if currency not in self._days:
+            raise ValueError(f"No {currency} rates in the FX table")
+        known = self._days[currency]
+        days = np.where(days == NO_DATE, known[-1], days)
+        idx = np.searchsorted(known, days, side="right") - 1
+        if len(idx) and idx.min() < 0:
+            first = date.fromordinal(int(known[0]))
+            raise ValueError(f"No {currency} rate on or before {date.fromordinal(int(days[idx < 0][0]))} (rates start {first})")
+        return self._rates[currency][idx]
+
+    def convert_codes(self, amounts, codes, names, days, to):
+        """Convert minor-unit `amounts`, whose currencies are names[codes], into minor units of `to`.
+
+        Each amount uses the rates of its own day; results round half away
+        from zero.
+        """
+        amounts = np.asarray(amounts, dtype=np.int64)
+        codes = np.asarray(codes)
+        days = np.asarray(days, dtype=np.int64)
+        value = np.zeros(len(amounts))
+        for code in np.unique(codes).tolist():
+            currency = names[code]
+            rows = codes == code
+            if currency == to:
+                value[rows] = amounts[rows]
+                continue
+            major = amounts[rows] / 10 ** minor_units(currency)
+            value[rows] = major * self.rates(currency, days[rows]) / self.rates(to, days[rows]) * 10 ** minor_units(to)
+        return (np.sign(value) * np.floor(np.abs(value) + 0.5)).astype(np.int64)
+
+    def convert(self, amounts, currencies, days, to):
+        """Like convert_codes, with one currency code string per amount."""
+        names, codes = np.unique(np.asarray(currencies, dtype=object), return_inverse=True)
+        return self.convert_codes(amounts, codes, list(names), days, to)
+
+    def convert_one(self, amount, currency, day, to):
+        if currency == to:
+            return amount
+        return int(self.convert([amount], [currency], [day_number(day)], to)[0])
+
+    def convert_table(self, table, to):
+        """Amounts of a model.ExpenseTable in minor units of `to`."""
+        return self.convert_codes(table.amount_array(), table.currency_array(), table.currency_names, table.day_array(), to)
+
+
+def _read(path):
+    if path.endswith(".json"):
+        with open(path) as f:
+            data = json.load(f)
+        rows = [(day, currency, rate) for day, rates in data["rates"].items() for currency, rate in rates.items()]
+        return RateTable(rows, data.get("quote", HOME_CURRENCY))
+    with open(path, newline="") as f:
+        return RateTable((row["date"], row["currency"].strip().upper(), row["rate"]) for row in csv.DictReader(f))
+
+
+@lru_cache(maxsize=8)
+def _load(path, mtime_ns):
+    table = _read(path)
+    table.source = (path, mtime_ns)
+    return table
+
+
+def load_rates(path=None):
+    """The rate table in `path` (FX_RATES, else the bundled snapshot), re-read only when the file changes."""
+    path = path or get_config("FX_RATES") or DEFAULT_RATES
+    return _load(path, os.stat(path).st_mtime_ns)
@@ -0,0 +1,224 @@
+"""Bulk import of expenses from CSV or Parquet files.
+
+Files are read in chunks with pyarrow and each chunk is validated with
+vectorized pyarrow.compute expressions. Valid rows come back ready for
+one batched insert; invalid rows are reported with their row number
+(1-based, header excluded) instead of aborting the whole import.
+
+Group files need desc, amount, paid_by and split_among columns, where
+split_among is a ";"-separated member list (empty means everyone); rows
+become equal splits. Optional currency (ISO code, INR when empty) and
+date (YYYY-MM-DD) columns set each expense's currency and FX date;
+amounts are in the row's currency.
+Tracker files need Date (YYYY-MM-DD), Item and Amount columns.
+"""
+import csv
+import os
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from money import HOME_CURRENCY, MINOR_UNITS
+from splits import encode
+
+GROUP_COLUMNS = ["desc", "amount", "paid_by", "split_among"]
+GROUP_OPTIONAL_COLUMNS = ["currency", "date"]
+TRACKER_COLUMNS = ["Date", "Item", "Amount"]
+
+BLOCK_SIZE = 4 << 20  # bytes per CSV chunk
+BATCH_ROWS = 65536  # rows per Parquet chunk
+
+NUMBER_PATTERN = r"^\s*-?\d+(\.\d+)?\s*$"
+CURRENCY_PATTERN = r"^[A-Z]{3}$"
+
+
+def iter_batches(source, fmt, columns, optional=()):
+    """Yield record batches holding `columns`, read from a CSV or Parquet file.
+
+    A file without one of `columns` raises ValueError; `optional` columns
+    are read too when the file has them (see _column()).
+    """
+    try:
+        if fmt == "parquet":
+            parquet = pq.ParquetFile(source)
+            names = parquet.schema_arrow.names
+        else:
+            names = _csv_header(source)
+        missing = [column for column in columns if column not in names]
+        if missing:
+            raise ValueError(f"Missing required columns: {', '.join(missing)}")
+        wanted = columns + [column for column in optional if column in names]
+        if fmt == "parquet":
+            yield from parquet.iter_batches(batch_size=BATCH_ROWS, columns=wanted)
+        else:
+            reader = pa_csv.open_csv(
+                source,
+                read_options=pa_csv.ReadOptions(block_size=BLOCK_SIZE),
+                convert_options=pa_csv.ConvertOptions(
+                    include_columns=wanted,
+                    column_types={column: pa.string() for column in wanted},
+                    strings_can_be_null=True,
+                ),
+            )
+            yield from reader
+    except (pa.ArrowInvalid, KeyError) as e:
+        raise ValueError(f"Could not read file (expected columns: {', '.join(columns)}): {e}") from e
+
+
+def _csv_header(source):
+    """Column names in the CSV file's header row; a file object is rewound for the real read."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            line = f.readline()
+    else:
+        line = source.readline()
+        source.seek(0)
+    text = line.decode("utf-8-sig") if isinstance(line, bytes) else line.lstrip("\ufeff")
+    return next(csv.reader([text]), [])
+
+
+def _strings(column):
+    return column if pa.types.is_string(column.type) else pc.cast(column, pa.string())
+
+
+def _column(batch, name):
+    """The batch's `name` column, or nulls if the file has none."""
+    index = batch.schema.get_field_index(name)
+    return batch.column(index) if index >= 0 else pa.nulls(len(batch), pa.string())
+
+
+def _amount_minor(column, scale=100):
+    """Parse amounts to integer minor units (paise by default); unparsable values become null.
+
+    `scale` is the number of minor units per unit: an int or an array with
+    one per row.
+    """
+    if not (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)):
+        column = _strings(column)
+        column = pc.if_else(pc.match_substring_regex(column, NUMBER_PATTERN), column, pa.scalar(None, pa.string()))
+        column = pc.cast(pc.utf8_trim_whitespace(column), pa.float64())
+    # Amounts with at most three decimals are within float error of a whole number of minor units
+    return pc.cast(pc.round(pc.multiply(pc.cast(column, pa.float64()), pc.cast(scale, pa.float64()))), pa.int64())
+
+
+def _minor_scale(currencies):
+    """Minor units per unit of each row's currency (see money.MINOR_UNITS)."""
+    scale = pa.array([100] * len(currencies), pa.int64())
+    for places in sorted(set(MINOR_UNITS.values())):
+        codes = pa.array([code for code, p in MINOR_UNITS.items() if p == places], pa.string())
+        scale = pc.if_else(pc.is_in(currencies, value_set=codes), pa.scalar(10 ** places, pa.int64()), scale)
+    return scale
+
+
+def _collect_errors(errors, offset, checks):
+    # checks: (valid mask, message) pairs; the first failing check is reported
+    reported = set()
+    for valid, message in checks:
+        bad = pc.indices_nonzero(pc.invert(pc.fill_null(valid, False))).to_pylist()
+        for i in bad:
+            if i not in reported:
+                reported.add(i)
+                errors.append((offset + i + 1, message))
+    return reported
+
+
+def import_group_expenses(source, fmt, members):
+    """Return (expenses, errors) for a group file.
+
+    Expenses are dicts in the app's shape with amount_minor; errors are
+    (row number, message) pairs.
+    """
+    member_set = pa.array(list(members), pa.string())
+    everyone = encode(members, members)
+    expenses = []
+    errors = []
+    offset = 0
+    for batch in iter_batches(source, fmt, GROUP_COLUMNS, GROUP_OPTIONAL_COLUMNS):
+        desc = pc.fill_null(_strings(batch.column("desc")), "")
+        currency = pc.utf8_upper(pc.utf8_trim_whitespace(_strings(_column(batch, "currency"))))
+        currency = pc.if_else(pc.equal(pc.fill_null(currency, ""), ""), HOME_CURRENCY, currency)
+        amount = _amount_minor(batch.column("amount"), _minor_scale(currency))
+        raw_dates = _column(batch, "date")
+        if pa.types.is_timestamp(raw_dates.type) or pa.types.is_date(raw_dates.type):
+            dates = pc.cast(raw_dates, pa.date32())
+            date_given = pc.is_valid(dates)
+        else:
+            raw_dates = pc.utf8_trim_whitespace(_strings(raw_dates))
+            dates = pc.cast(pc.strptime(raw_dates, format="%Y-%m-%d", unit="s", error_is_null=True), pa.date32())
+            date_given = pc.not_equal(pc.fill_null(raw_dates, ""), "")
+        paid_by = pc.utf8_trim_whitespace(_strings(batch.column("paid_by")))
+
+        split_column = batch.column("split_among")
+        if pa.types.is_list(split_column.type) or pa.types.is_large_list(split_column.type):
+            splits = split_column
+        else:
+            splits = pc.split_pattern(pc.fill_null(_strings(split_column), ""), ";")
+        flat = pc.utf8_trim_whitespace(pc.list_flatten(splits))
+        parents = pc.list_parent_indices(splits)
+        # Empty entries (e.g. an empty cell) are dropped; an empty split means everyone
+        keep = pc.not_equal(flat, "")
+        flat = pc.filter(flat, keep)
+        parents = pc.filter(parents, keep)
+        unknown_rows = pc.unique(pc.filter(parents, pc.invert(pc.is_in(flat, value_set=member_set))))
+        split_ok = pc.invert(pc.is_in(pa.array(range(len(batch)), pa.int64()), value_set=pc.cast(unknown_rows, pa.int64())))
+
+        bad = _collect_errors(errors, offset, [
+            (pc.is_valid(amount), "amount is missing or not a number"),
+            (pc.greater(amount, 0), "amount must be positive"),
+            (pc.is_in(paid_by, value_set=member_set), "paid_by is not a group member"),
+            (split_ok, "split_among names someone who is not a group member"),
+            (pc.match_substring_regex(currency, CURRENCY_PATTERN), "currency is not a currency code"),
+            (pc.or_kleene(pc.invert(date_given), pc.is_valid(dates)), "date is not YYYY-MM-DD"),
+        ])
+
+        grouped = {}
+        for member, parent in zip(flat.to_pylist(), parents.to_pylist()):
+            grouped.setdefault(parent, []).append(member)
+        rows = zip(desc.to_pylist(), amount.to_pylist(), paid_by.to_pylist(), currency.to_pylist(), dates.to_pylist())
+        for i, (d, a, p, c, day) in enumerate(rows):
+            if i not in bad:
+                expenses.append({
+                    "desc": d,
+                    "amount_minor": a,
+                    "paid_by": p,
+                    "split": encode(members, list(dict.fromkeys(grouped[i]))) if i in grouped else list(everyone),
+                    "currency": c,
+                    "date": day.isoformat() if day else None,
+                })
+        offset += len(batch)
+    errors.sort()
+    return expenses, errors
+
+
+def import_personal_expenses(source, fmt):
+    """Return (rows, errors) for a tracker file; rows are (date, item, amount_paise)."""
+    rows = []
+    errors = []
+    offset = 0
+    for batch in iter_batches(source, fmt, TRACKER_COLUMNS):
+        dates = batch.column("Date")
+        if pa.types.is_timestamp(dates.type) or pa.types.is_date(dates.type):
+            dates = pc.cast(dates, pa.date32())
+        else:
+            dates = pc.cast(
+                pc.strptime(pc.utf8_trim_whitespace(_strings(dates)), format="%Y-%m-%d", unit="s", error_is_null=True),
+                pa.date32(),
+            )
+        items = pc.utf8_trim_whitespace(_strings(batch.column("Item")))
+        amount = _amount_minor(batch.column("Amount"))
+
+        bad = _collect_errors(errors, offset, [
+            (pc.is_valid(dates), "Date is missing or not YYYY-MM-DD"),
+            (pc.and_(pc.is_valid(items), pc.not_equal(items, "")), "Item is missing"),
+            (pc.is_valid(amount), "Amount is missing or not a number"),
+            (pc.greater(amount, 0), "Amount must be positive"),
+        ])
+
+        for i, (d, item, a) in enumerate(zip(dates.to_pylist(), items.to_pylist(), amount.to_pylist())):
+            if i not in bad:
+                rows.append((d.isoformat(), item, a))
+        offset += len(batch)
+    errors.sort()
+    return rows, errors
@@ -0,0 +1,131 @@
+"""AI insights for a group, computed off the Streamlit script thread.
+
+Instead of sending every raw expense, the prompt carries a compact
+statistical summary (per-member totals, spending by category, settlement
+plan). Descriptions are tagged with categories offline (categories.py),
+never by the model.
+Responses are cached by a hash of that summary with TTL/LRU eviction, so
+an unchanged group is never billed twice, and identical requests that
+are still running share one model call.
+
+The model only needs a `generate_content(prompt)` method returning an
+object with `.text`, so a local fake can stand in for Gemini.
+"""
+import hashlib
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+from cachetools import TTLCache
+
+from categories import categorize_many
+from instrumentation import timed
+from ledger import payment_amounts
+from money import HOME_CURRENCY, to_major
+from settlement import settle
+
+TOP_N = 5
+MAX_TRANSFERS = 20
+
+PROMPT = (
+    "Analyze this summary of a group's shared expenses and write a well-explained "
+    "summary, with suggestions for settling up and spending less. "
+    "All amounts are in {currency}.\n{summary}"
+)
+
+
+def summarize_group(group, balances, currency=HOME_CURRENCY, rates=None):
+    """Compact, JSON-serializable summary of a group's expenses (an ExpenseTable).
+
+    `balances` are in `currency`; expenses and payments in other currencies
+    are converted with `rates` (an fx.RateTable).
+    """
+    members = group["members"]
+    expenses = group["expenses"]
+    payments = group.get("payments", ())
+    if rates is None:
+        amounts = expenses.amount_array()
+        payment_total = sum(payment["amount_minor"] for payment in payments)
+    else:
+        amounts = rates.convert_table(expenses, currency)
+        payment_total = sum(payment_amounts(payments, currency, rates))
+    totals = np.bincount(expenses.payer_array(), weights=amounts, minlength=len(members))
+    paid = {member: int(total) for member, total in zip(members, totals)}  # exact below 2**53 minor units
+    categories, codes = np.unique(np.array(categorize_many(expenses.descs), dtype=object), return_inverse=True)
+    by_category = np.bincount(codes, weights=amounts, minlength=len(categories))
+    top = sorted(zip(categories.tolist(), by_category.tolist()), key=lambda x: x[1], reverse=True)[:TOP_N]
+    transfers = settle(balances)
+    return {
+        "currency": currency,
+        "members": len(group["members"]),
+        "expenses": len(group["expenses"]),
+        "total_spent": to_major(sum(paid.values()), currency),
+        "paid_by_member": {member: to_major(amount, currency) for member, amount in paid.items()},
+        "settled_so_far": to_major(payment_total, currency),
+        "balances": {member: to_major(balance, currency) for member, balance in balances.items()},
+        "top_categories": {category: to_major(int(amount), currency) for category, amount in top},
+        "settlement_plan": [
+            {"from": payer, "to": payee, "amount": to_major(amount, currency)}
+            for payer, payee, amount in transfers[:MAX_TRANSFERS]
+        ],
+        "settlement_transfers": len(transfers),
+    }
+
+
+def summary_key(summary):
+    return hashlib.sha256(json.dumps(summary, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class InsightsService:
+    def __init__(self, model_factory, max_workers=2, cache_size=128, ttl=3600):
+        self._model_factory = model_factory
+        self._model = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="insights")
+        self._cache = TTLCache(maxsize=cache_size, ttl=ttl)
+        self._pending = {}  # summary key -> Future
+        self._lock = threading.Lock()
+
+    def cached(self, summary):
+        """Return the cached response for `summary`, or None."""
+        with self._lock:
+            return self._cache.get(summary_key(summary))
+
+    def request(self, summary):
+        """Start (or join) the model call for `summary` and return its Future."""
+        key = summary_key(summary)
+        with self._lock:
+            text = self._cache.get(key)
+            if text is not None:
+                future = Future()
+                future.set_result(text)
+                return future
+            future = self._pending.get(key)
+            if future is None:
+                future = self._executor.submit(self._generate, key, summary)
+                self._pending[key] = future
+            return future
+
+    def get(self, summary, timeout):
+        """Return the response text, waiting at most `timeout` seconds.
+
+        Raises concurrent.futures.TimeoutError if the model is still running;
+        the call keeps going in the background and a later get() picks it up.
+        """
+        return self.request(summary).result(timeout=timeout)
+
+    def _generate(self, key, summary):
+        try:
+            if self._model is None:
+                self._model = self._model_factory()
+            prompt = PROMPT.format(
+                currency=summary.get("currency", HOME_CURRENCY), summary=json.dumps(summary, ensure_ascii=False, indent=1)
+            )
+            with timed("Gemini generate_content"):
+                text = self._model.generate_content(prompt).text
+            with self._lock:
+                self._cache[key] = text
+            return text
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
@@ -0,0 +1,170 @@
+"""Latency spans for the app's hot paths.
+
+Code paths are wrapped in `timed(name)`: each splitter tab and tracker
+panel, the two feature pages as a whole, group loading, exports, and
+the external Gemini and Razorpay calls. Every span keeps a count, the
+last and total time and a latency histogram, so the debug panel (open
+the app with ?debug=1) shows which spans an interaction re-ran and what
+they cost. Streamlit fragments rerun a single panel when one of its
+widgets changes, so a fragment rerun shows up as one panel's span only.
+
+The same numbers are available in the Prometheus text format from
+`prometheus_text()`, served by `start_metrics_server()` (the app starts
+it when METRICS_PORT is set) and by the backend's /metrics. `profiled()`
+runs one block, e.g. a single rerun, under cProfile.
+"""
+import bisect
+import cProfile
+import io
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram bucket upper bounds in ms; the last bucket is everything slower
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+PROFILE_LINES = 40
+
+_lock = threading.Lock()
+_spans = {}  # span name -> {"count", "last_ms", "total_ms", "max_ms", "buckets"}
+_profile = None  # (label, pstats text) of the last profiled() block
+
+
+def record(name, elapsed_ms):
+    """Add one measurement of `elapsed_ms` to the span `name`."""
+    with _lock:
+        entry = _spans.get(name)
+        if entry is None:
+            entry = _spans[name] = {
+                "count": 0, "last_ms": 0.0, "total_ms": 0.0, "max_ms": 0.0, "buckets": [0] * (len(BUCKETS_MS) + 1)
+            }
+        entry["count"] += 1
+        entry["last_ms"] = elapsed_ms
+        entry["total_ms"] += elapsed_ms
+        entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+        entry["buckets"][bisect.bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+
+
+@contextmanager
+def timed(name):
+    """Record the wall time of the block under `name`; also usable as a decorator."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, (time.perf_counter() - start) * 1000)
+
+
+def _quantile(entry, q):
+    # Upper bound of the bucket holding the q-quantile (the max for the last bucket)
+    rank = q * entry["count"]
+    seen = 0
+    for bound, count in zip(BUCKETS_MS, entry["buckets"]):
+        seen += count
+        if seen >= rank:
+            return min(bound, entry["max_ms"])
+    return entry["max_ms"]
+
+
+def timings():
+    """Return one row per span: count, last, mean, p50, p95 and max time in ms."""
+    with _lock:
+        return [
+            {
+                "span": name,
+                "count": entry["count"],
+                "last_ms": round(entry["last_ms"], 2),
+                "mean_ms": round(entry["total_ms"] / entry["count"], 2),
+                "p50_ms": round(_quantile(entry, 0.5), 2),
+                "p95_ms": round(_quantile(entry, 0.95), 2),
+                "max_ms": round(entry["max_ms"], 2),
+            }
+            for name, entry in _spans.items()
+        ]
+
+
+def histogram(name):
+    """Return (bucket label, count) pairs for one span."""
+    with _lock:
+        buckets = list(_spans[name]["buckets"]) if name in _spans else [0] * (len(BUCKETS_MS) + 1)
+    labels = [f"≤{bound:g} ms" for bound in BUCKETS_MS] + [f">{BUCKETS_MS[-1]:g} ms"]
+    return list(zip(labels, buckets))
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+
+
+@contextmanager
+def profiled(label, enabled=True):
+    """Run the block under cProfile and keep its stats as the last profile."""
+    global _profile
+    if not enabled:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+        with _lock:
+            _profile = (label, out.getvalue())
+
+
+def last_profile():
+    """(label, stats text) of the last profiled block, or None."""
+    with _lock:
+        return _profile
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(prefix="expense_splitter"):
+    """All spans as a Prometheus histogram, in the text exposition format."""
+    metric = f"{prefix}_span_duration_seconds"
+    lines = [
+        f"# HELP {metric} Wall time of instrumented code paths.",
+        f"# TYPE {metric} histogram",
+    ]
+    with _lock:
+        spans = [(name, dict(entry, buckets=list(entry["buckets"]))) for name, entry in _spans.items()]
+    for name, entry in spans:
+        span = _label(name)
+        cumulative = 0
+        for bound, count in zip(BUCKETS_MS, entry["buckets"]):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{span="{span}",le="{bound / 1000:g}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{span="{span}",le="+Inf"}} {entry["count"]}')
+        lines.append(f'{metric}_sum{{span="{span}"}} {entry["total_ms"] / 1000:.6f}')
+        lines.append(f'{metric}_count{{span="{span}"}} {entry["count"]}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serve GET /metrics from a daemon thread; returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
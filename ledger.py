@@ -0,0 +1,211 @@
+"""Per-group balance ledger.
+
+Keeps each member's net balance up to date as expenses and payments
+change, so the Streamlit reruns only read balances instead of replaying
+every expense. Balances are kept per currency, in integer minor units
+(see money.py), and each currency's balances always sum to zero, so they
+stay exact whatever the exchange rates do. `converted_balances` turns
+them into one currency with an FX table. A payment of X from payer to
+payee (e.g. settling up, fully or partly) raises the payer's balance by
+X and lowers the payee's by X.
+Expenses are model.Expense objects, applied straight from their payer
+id and split spec (see splits.py): member ids index the ledger's member
+list. The helpers at the bottom take expenses in the storage dict shape
+and keep a group's ExpenseTable and ledger in sync.
+"""
+from fx import day_number
+from instrumentation import timed
+from model import Expense, ExpenseTable, Members
+from money import HOME_CURRENCY
+from splits import EQUAL, member_ids, shares
+from vectorized import SCALAR_LIMIT, balances_by_currency, vectorized_balances
+
+
+class BalanceLedger:
+    """Net balance per currency and member, updated in O(split size) per expense or payment change."""
+
+    def __init__(self, members=()):
+        self.members = Members(members)  # member id -> name
+        self.balances = {}  # currency -> {member: minor units}
+        self.version = 0  # bumped on every mutation
+
+    def _book(self, currency):
+        book = self.balances.get(currency)
+        if book is None:
+            book = self.balances[currency] = dict.fromkeys(self.members, 0)
+        return book
+
+    def in_currency(self, currency):
+        """Balances from the expenses and payments made in `currency`."""
+        return dict(self.balances.get(currency) or dict.fromkeys(self.members, 0))
+
+    @classmethod
+    def from_expenses(cls, members, expenses, payments=()):
+        """Build balances from an ExpenseTable (or any list of expenses)."""
+        ledger = cls(members)
+        if len(expenses) >= SCALAR_LIMIT:
+            # Large (e.g. bulk-imported) groups are built in one vectorized pass
+            table = expenses if isinstance(expenses, ExpenseTable) else ExpenseTable(expenses)
+            for currency, balances in balances_by_currency(ledger.members, table).items():
+                ledger._book(currency).update(balances)
+        else:
+            for expense in expenses:
+                ledger._apply(expense, 1)
+        for payment in payments:
+            ledger._apply_payment(payment, 1)
+        return ledger
+
+    @classmethod
+    def from_balances(cls, members, balances):
+        """Restore a ledger from saved {currency: {member: balance}} (e.g. a snapshot)."""
+        ledger = cls(members)
+        ledger.balances = {currency: dict(book) for currency, book in balances.items()}
+        return ledger
+
+    def add_member(self, member):
+        if member not in self.members:
+            self.members.append(member)
+            for book in self.balances.values():
+                book.setdefault(member, 0)
+            self.version += 1
+
+    def add_expense(self, expense):
+        self._apply(expense, 1)
+        self.version += 1
+
+    def add_expenses(self, expenses):
+        """Apply a batch of new expenses, e.g. from a bulk import."""
+        if len(expenses) >= SCALAR_LIMIT:
+            for currency, balances in balances_by_currency(self.members, ExpenseTable(expenses)).items():
+                book = self._book(currency)
+                for member, balance in balances.items():
+                    book[member] = book.get(member, 0) + balance
+        else:
+            for expense in expenses:
+                self._apply(expense, 1)
+        self.version += 1
+
+    def remove_expense(self, expense):
+        self._apply(expense, -1)
+        self.version += 1
+
+    def edit_expense(self, old_expense, new_expense):
+        self._apply(old_expense, -1)
+        self._apply(new_expense, 1)
+        self.version += 1
+
+    def add_payment(self, payment):
+        self._apply_payment(payment, 1)
+        self.version += 1
+
+    def remove_payment(self, payment):
+        self._apply_payment(payment, -1)
+        self.version += 1
+
+    def _apply_payment(self, payment, sign):
+        balances = self._book(payment.get("currency") or HOME_CURRENCY)
+        amount = sign * payment["amount_minor"]
+        balances[payment["payer"]] = balances.get(payment["payer"], 0) + amount
+        balances[payment["payee"]] = balances.get(payment["payee"], 0) - amount
+
+    def _apply(self, expense, sign):
+        names = self.members
+        payer = names[expense.payer]
+        balances = self._book(expense.currency)
+        moved = 0
+        if expense.mode == EQUAL:
+            # Same as splits.shares(): leftover paise to the lowest ids
+            ids = member_ids(expense.mask)
+            base, remainder = divmod(expense.amount_minor, len(ids))
+            for position, member_id in enumerate(ids):
+                member = names[member_id]
+                if member != payer:
+                    share = base + 1 if position < remainder else base
+                    balances[member] = balances.get(member, 0) - sign * share
+                    moved += share
+        else:
+            for member_id, share in shares(expense.split, expense.amount_minor):
+                member = names[member_id]
+                if member != payer:
+                    balances[member] = balances.get(member, 0) - sign * share
+                    moved += share
+        balances[payer] = balances.get(payer, 0) + sign * moved
+
+
+def get_ledger(group):
+    """Return the group's ledger, building it once from its expenses.
+
+    Groups loaded from storage may carry their "balances" already.
+    """
+    if "ledger" not in group:
+        if "balances" in group:
+            group["ledger"] = BalanceLedger.from_balances(group["members"], group.pop("balances"))
+        else:
+            with timed("Ledger Build"):
+                group["ledger"] = BalanceLedger.from_expenses(group["members"], group["expenses"], group.get("payments", ()))
+    return group["ledger"]
+
+
+def payment_amounts(payments, currency, rates):
+    """Amounts of the payments in minor units of `currency`, each at its date's rate."""
+    return rates.convert(
+        [payment["amount_minor"] for payment in payments],
+        [payment.get("currency") or HOME_CURRENCY for payment in payments],
+        [day_number(payment.get("date")) for payment in payments],
+        currency,
+    ).tolist()
+
+
+def converted_balances(group, currency, rates):
+    """The group's balances in `currency`, converting each expense and payment at its date's rate.
+
+    Groups whose expenses and payments are all in `currency` read the
+    ledger as is; others are recomputed with one vectorized conversion
+    (`rates` is an fx.RateTable) over the whole expense table.
+    """
+    ledger = get_ledger(group)
+    if set(ledger.balances) <= {currency}:
+        return ledger.in_currency(currency)
+    table = group["expenses"]
+    balances = vectorized_balances(ledger.members, table, amounts=rates.convert_table(table, currency))
+    payments = group.get("payments", ())
+    for payment, amount in zip(payments, payment_amounts(payments, currency, rates)):
+        balances[payment["payer"]] += amount
+        balances[payment["payee"]] -= amount
+    return balances
+
+
+# Helpers that keep the expense table and the ledger in sync, for groups
+# converted with model.compact_group. The ledger is fetched first so a
+# lazily built ledger never counts the change twice.
+def add_member(group, member):
+    get_ledger(group).add_member(member)
+    group["members"].append(member)
+
+
+def add_expense(group, expense):
+    expense = Expense.from_dict(expense, group["members"])
+    get_ledger(group).add_expense(expense)
+    group["expenses"].append(expense)
+
+
+def add_expenses(group, expenses):
+    expenses = [Expense.from_dict(expense, group["members"]) for expense in expenses]
+    get_ledger(group).add_expenses(expenses)
+    group["expenses"].extend(expenses)
+
+
+def edit_expense(group, index, new_expense):
+    new_expense = Expense.from_dict(new_expense, group["members"])
+    get_ledger(group).edit_expense(group["expenses"][index], new_expense)
+    group["expenses"][index] = new_expense
+
+
+def delete_expense(group, index):
+    get_ledger(group).remove_expense(group["expenses"][index])
+    group["expenses"].pop(index)
+
+
+def add_payment(group, payment):
+    get_ledger(group).add_payment(payment)
+    group.setdefault("payments", []).append(payment)
@@ -0,0 +1,241 @@
+"""Compact in-memory model of a group's members and expenses.
+
+Storage, the backend and the event log exchange groups as plain dicts:
+{"members": [names], "expenses": [{"id", "desc", "amount_minor",
+"paid_by", "split", "currency", "date"}], "payments": [...], "version"}.
+That shape repeats the payer's name in every expense and costs a dict
+(plus a list per split) per expense, so the app converts a group once
+when it loads it (`compact_group`):
+
+- `Members` is the member list and the table that interns names to ids:
+  a member's id is their position, as in split masks (see splits.py);
+- `Expense` is one expense with `__slots__`, the payer as a member id and
+  the split spec as its mode, mask and weights;
+- `ExpenseTable` keeps a group's expenses as parallel columns (typed
+  arrays for ids, amounts, payers, modes, currencies, dates and, while
+  they fit in 64 bits, split masks), so aggregations read a column
+  straight into NumPy instead of walking a dict per expense.
+
+Amounts are minor units of the expense's currency (see money.py); the
+date, if any, picks the FX rate when converting to another currency.
+"""
+from array import array
+from datetime import date
+
+import numpy as np
+
+from fx import NO_DATE, day_number
+from money import HOME_CURRENCY
+from splits import MODES
+
+MODE_CODES = {mode: code for code, mode in enumerate(MODES)}
+MAX_MASK = (1 << 64) - 1  # largest mask the "Q" column holds (64 members)
+
+
+class Members(list):
+    """A group's member names; a member's id is their index.
+
+    Members are only ever appended, so ids are stable. Lookups by name
+    (`index`, `in`) go through a dict instead of scanning the list.
+    """
+
+    __slots__ = ("_ids",)
+
+    def __init__(self, names=()):
+        super().__init__()
+        self._ids = {}
+        self.extend(names)
+
+    def __reduce__(self):
+        return type(self), (list(self),)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def append(self, name):
+        if name not in self._ids:
+            self._ids[name] = len(self)
+            super().append(name)
+
+    def extend(self, names):
+        for name in names:
+            self.append(name)
+
+    def index(self, name, *args):
+        try:
+            return self._ids[name]
+        except KeyError:
+            raise ValueError(f"{name} is not a group member") from None
+
+
+class Expense:
+    """One expense; `payer` is a member id and mode/mask/weights its split spec."""
+
+    __slots__ = ("id", "desc", "amount_minor", "payer", "mode", "mask", "weights", "currency", "date")
+
+    def __init__(self, id, desc, amount_minor, payer, mode, mask, weights=None, currency=HOME_CURRENCY, date=None):
+        self.id = id  # 0 until storage assigns one
+        self.desc = desc
+        self.amount_minor = amount_minor  # minor units of `currency`
+        self.payer = payer
+        self.mode = mode
+        self.mask = mask
+        self.weights = None if weights is None else tuple(weights)
+        self.currency = currency
+        self.date = date  # ISO date string or None
+
+    def __repr__(self):
+        return (
+            f"Expense({self.id}, {self.desc!r}, {self.amount_minor} {self.currency}, "
+            f"payer={self.payer}, split={self.split}, date={self.date})"
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, Expense):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    @property
+    def split(self):
+        return [self.mode, self.mask, None if self.weights is None else list(self.weights)]
+
+    @classmethod
+    def from_dict(cls, expense, members):
+        """Convert the dict shape."""
+        return cls(
+            expense.get("id", 0), expense["desc"], expense["amount_minor"], members.index(expense["paid_by"]),
+            *expense["split"], expense.get("currency") or HOME_CURRENCY, expense.get("date"),
+        )
+
+    def to_dict(self, members):
+        return {
+            "id": self.id,
+            "desc": self.desc,
+            "amount_minor": self.amount_minor,
+            "paid_by": members[self.payer],
+            "split": self.split,
+            "currency": self.currency,
+            "date": self.date,
+        }
+
+
+class ExpenseTable:
+    """A group's expenses as columns, in list order; indexing yields `Expense` objects."""
+
+    __slots__ = ("ids", "descs", "amounts", "payers", "modes", "masks", "weights", "currencies", "currency_names", "days")
+
+    def __init__(self, expenses=()):
+        self.ids = array("q")
+        self.descs = []
+        self.amounts = array("q")
+        self.payers = array("i")
+        self.modes = bytearray()  # index into splits.MODES
+        self.masks = array("Q")  # a list once a mask needs more than 64 bits
+        self.weights = []  # None for equal splits
+        self.currencies = bytearray()  # index into currency_names
+        self.currency_names = []
+        self.days = array("i")  # fx.day_number of the date, NO_DATE for none
+        self.extend(expenses)
+
+    @classmethod
+    def from_dicts(cls, expenses, members):
+        table = cls()
+        table.extend(Expense.from_dict(expense, members) for expense in expenses)
+        return table
+
+    def to_dicts(self, members):
+        return [expense.to_dict(members) for expense in self]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        day = self.days[i]
+        return Expense(
+            self.ids[i], self.descs[i], self.amounts[i], self.payers[i],
+            MODES[self.modes[i]], self.masks[i], self.weights[i],
+            self.currency_names[self.currencies[i]], None if day == NO_DATE else date.fromordinal(day).isoformat(),
+        )
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self)))
+
+    def _fit(self, mask):
+        if mask > MAX_MASK and isinstance(self.masks, array):
+            self.masks = self.masks.tolist()
+
+    def _currency_code(self, currency):
+        if currency not in self.currency_names:
+            self.currency_names.append(currency)
+        return self.currency_names.index(currency)
+
+    def append(self, expense):
+        self._fit(expense.mask)
+        self.ids.append(expense.id)
+        self.descs.append(expense.desc)
+        self.amounts.append(expense.amount_minor)
+        self.payers.append(expense.payer)
+        self.modes.append(MODE_CODES[expense.mode])
+        self.masks.append(expense.mask)
+        self.weights.append(expense.weights)
+        self.currencies.append(self._currency_code(expense.currency))
+        self.days.append(day_number(expense.date))
+
+    def extend(self, expenses):
+        for expense in expenses:
+            self.append(expense)
+
+    def __setitem__(self, i, expense):
+        self._fit(expense.mask)
+        self.ids[i] = expense.id
+        self.descs[i] = expense.desc
+        self.amounts[i] = expense.amount_minor
+        self.payers[i] = expense.payer
+        self.modes[i] = MODE_CODES[expense.mode]
+        self.masks[i] = expense.mask
+        self.weights[i] = expense.weights
+        self.currencies[i] = self._currency_code(expense.currency)
+        self.days[i] = day_number(expense.date)
+
+    def pop(self, i=-1):
+        expense = self[i]
+        columns = (
+            self.ids, self.descs, self.amounts, self.payers, self.modes, self.masks, self.weights, self.currencies, self.days
+        )
+        for column in columns:
+            del column[i]
+        return expense
+
+    def position(self, expense_id):
+        """List position of the expense with this id (ValueError if absent)."""
+        return self.ids.index(expense_id)
+
+    # NumPy copies of the columns (a view would stop the arrays from growing)
+    def amount_array(self):
+        return np.array(self.amounts, dtype=np.int64)
+
+    def payer_array(self):
+        return np.array(self.payers, dtype=np.int64)
+
+    def mode_array(self):
+        return np.frombuffer(bytes(self.modes), dtype=np.uint8)
+
+    def currency_array(self):
+        """Currency of each expense, as an index into `currency_names`."""
+        return np.frombuffer(bytes(self.currencies), dtype=np.uint8)
+
+    def day_array(self):
+        return np.array(self.days, dtype=np.int64)
+
+    def mask_array(self):
+        """Split masks as uint64, or None once some mask needs more than 64 bits."""
+        return np.array(self.masks, dtype=np.uint64) if isinstance(self.masks, array) else None
+
+
+def compact_group(group):
+    """Convert a group from the storage dict shape to this model, in place."""
+    members = group["members"] = Members(group["members"])
+    if not isinstance(group["expenses"], ExpenseTable):
+        group["expenses"] = ExpenseTable.from_dicts(group["expenses"], members)
+    group.setdefault("payments", [])
+    return group
@@ -0,0 +1,78 @@
+"""Money helpers.
+
+Amounts are stored as integer paise so splits and balances are exact and
+always net to zero. Convert to rupees only for display.
+
+Group expenses and payments may be in other currencies and are stored
+the same way, as integers in the currency's minor unit (cents, yen,
+fils...; see MINOR_UNITS) in their "amount_minor" field.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+HOME_CURRENCY = "INR"
+# Decimal places of currencies whose minor unit is not 1/100 (ISO 4217)
+MINOR_UNITS = {
+    "BHD": 3, "CLP": 0, "IQD": 3, "ISK": 0, "JOD": 3, "JPY": 0, "KRW": 0, "KWD": 3,
+    "LYD": 3, "OMR": 3, "PYG": 0, "TND": 3, "UGX": 0, "VND": 0, "XAF": 0, "XOF": 0,
+}
+SYMBOLS = {"INR": "₹", "USD": "$", "EUR": "€", "GBP": "£", "JPY": "¥"}
+
+
+def to_paise(amount):
+    """Convert a rupee amount (float, str or Decimal) to integer paise."""
+    rupees = Decimal(str(amount)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    return int(rupees * 100)
+
+
+def to_rupees(paise):
+    return paise / 100
+
+
+def format_inr(paise):
+    sign = "-" if paise < 0 else ""
+    rupees, rest = divmod(abs(paise), 100)
+    return f"{sign}₹{rupees}.{rest:02d}"
+
+
+def split_paise(total, parts):
+    """Split `total` paise into `parts` shares that add up exactly.
+
+    The leftover paise go one each to the first shares, so the same split
+    always allocates remainders to the same members.
+    """
+    base, remainder = divmod(total, parts)
+    return [base + 1 if i < remainder else base for i in range(parts)]
+
+
+def check_currency(currency):
+    """Return `currency`; raise ValueError unless it looks like an ISO 4217 code."""
+    if not (isinstance(currency, str) and len(currency) == 3 and currency.isalpha() and currency.isupper()):
+        raise ValueError(f"Not a currency code: {currency!r}")
+    return currency
+
+
+def minor_units(currency):
+    return MINOR_UNITS.get(currency, 2)
+
+
+def to_minor(amount, currency):
+    """Convert an amount in `currency` (float, str or Decimal) to integer minor units."""
+    exponent = Decimal(1).scaleb(-minor_units(currency))
+    major = Decimal(str(amount)).quantize(exponent, rounding=ROUND_HALF_UP)
+    return int(major.scaleb(minor_units(currency)))
+
+
+def to_major(minor, currency):
+    return minor / 10 ** minor_units(currency)
+
+
+def format_money(minor, currency):
+    if currency == HOME_CURRENCY:
+        return format_inr(minor)
+    sign = "-" if minor < 0 else ""
+    symbol = SYMBOLS.get(currency, f"{currency} ")
+    places = minor_units(currency)
+    if not places:
+        return f"{sign}{symbol}{abs(minor)}"
+    major, rest = divmod(abs(minor), 10 ** places)
+    return f"{sign}{symbol}{major}.{rest:0{places}d}"
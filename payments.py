@@ -0,0 +1,189 @@
+"""Batched, idempotent Razorpay order creation.
+
+Each transfer gets a deterministic receipt id derived from the group, the
+group version it was planned against, payer, payee, amount and currency. The
+order state per receipt lives in the storage layer (see
+storage.Storage.claim_order), so double clicks, reruns, restarts and other
+app processes return the existing order instead of creating a duplicate.
+Orders for a whole settlement are created concurrently on a bounded
+thread pool, with retries and exponential backoff for transient errors.
+Razorpay does not enforce unique receipts and a timed-out request may
+still have created its order, so before creating an order again after
+such a failure the orchestrator looks it up by receipt.
+Amounts are in the minor units of the order's currency (see money.py).
+"""
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import timed
+from money import HOME_CURRENCY, minor_units
+
+PENDING = "pending"
+CREATED = "created"
+FAILED = "failed"
+
+
+def receipt_id(group_name, version, payer, payee, amount_minor, currency=HOME_CURRENCY):
+    """Deterministic receipt id (Razorpay allows at most 40 characters)."""
+    key = (group_name, version, payer, payee, amount_minor, currency)
+    digest = hashlib.sha256(repr(key).encode("utf-8"))
+    return "rcpt_" + digest.hexdigest()[:32]
+
+
+def order_amount(amount, currency):
+    """Razorpay order amount for `amount` minor units of `currency`.
+
+    Razorpay takes three-decimal currencies (KWD, OMR, ...) in their minor
+    unit but only to two decimals, so the last digit must be zero; the
+    amount is rounded half up to it.
+    """
+    if minor_units(currency) == 3:
+        return (amount + 5) // 10 * 10
+    return amount
+
+
+def _retryable(error):
+    # Network failures and Razorpay server/gateway errors are worth retrying;
+    # bad requests (e.g. invalid amount) are not.
+    from razorpay.errors import GatewayError, ServerError
+
+    return isinstance(error, (OSError, ServerError, GatewayError))
+
+
+def _find_order(client, receipt):
+    # Id of an order Razorpay already has for `receipt`, or None
+    for order in client.order.all({"receipt": receipt}).get("items", []):
+        if order.get("receipt") == receipt:
+            return order["id"]
+    return None
+
+
+class MemoryOrderStore:
+    """Order records kept in this process only, with storage.Storage's order methods."""
+
+    def __init__(self):
+        self._orders = {}  # group name -> {receipt: order record}
+        self._updated = {}  # receipt -> time.monotonic() of the last claim or update
+        self._lock = threading.Lock()
+
+    def claim_order(self, group_name, order, stale_after):
+        with self._lock:
+            group_orders = self._orders.setdefault(group_name, {})
+            stored = group_orders.get(order["receipt"])
+            now = time.monotonic()
+            stale = stored is not None and stored["state"] == PENDING and now - self._updated[order["receipt"]] > stale_after
+            claimed = stored is None or stored["state"] == FAILED or stale
+            if claimed:
+                attempts = 0 if stored is None else stored["attempts"]
+                stored = group_orders[order["receipt"]] = dict(
+                    order, state=PENDING, order_id=None, error=None, attempts=attempts
+                )
+                self._updated[order["receipt"]] = now
+            return dict(stored), claimed
+
+    def update_order(self, group_name, order):
+        with self._lock:
+            self._orders[group_name][order["receipt"]].update(
+                {key: order[key] for key in ("state", "order_id", "error", "attempts")}
+            )
+            self._updated[order["receipt"]] = time.monotonic()
+
+    def orders(self, group_name):
+        with self._lock:
+            return [dict(order) for order in self._orders.get(group_name, {}).values()]
+
+
+class PaymentOrchestrator:
+    def __init__(self, client_factory, store=None, max_workers=8, retries=3, backoff=0.5, retryable=_retryable,
+                 stale_after=300):
+        """`store` keeps the order records: a storage.Storage, or by default this process's memory.
+
+        A pending order not updated for `stale_after` seconds (its process
+        died mid-request) may be claimed again.
+        """
+        self._client_factory = client_factory
+        self._store = MemoryOrderStore() if store is None else store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="payments")
+        self.retries = retries
+        self.backoff = backoff
+        self._retryable = retryable
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+
+    def orders(self, group_name):
+        """Order records for a group, in creation order."""
+        return self._store.orders(group_name)
+
+    def create_order(self, group_name, version, payer, payee, amount_minor, currency=HOME_CURRENCY):
+        """Create (or return the existing) order for one transfer."""
+        return self.settle(group_name, version, [(payer, payee, amount_minor)], currency)[0]
+
+    def settle(self, group_name, version, transfers, currency=HOME_CURRENCY):
+        """Create orders for (payer, payee, amount_minor) transfers in `currency` concurrently.
+
+        Returns one order record per transfer. Transfers that already have
+        a pending or created order (in any process) are not sent again;
+        failed ones are retried.
+        """
+        records = []
+        to_send = []
+        for payer, payee, amount_minor in transfers:
+            order = {
+                "receipt": receipt_id(group_name, version, payer, payee, amount_minor, currency),
+                "payer": payer,
+                "payee": payee,
+                "amount_minor": amount_minor,
+                "currency": currency,
+            }
+            record, claimed = self._store.claim_order(group_name, order, self.stale_after)
+            if claimed:
+                to_send.append(record)
+            records.append(record)
+
+        futures = [self._executor.submit(self._create, group_name, record) for record in to_send]
+        for future in futures:
+            future.result()
+        with self._lock:
+            return [dict(record) for record in records]
+
+    def _create(self, group_name, record):
+        # Any failure, including creating the client or a malformed reply,
+        # marks the order FAILED so a later settle() retries it
+        attempt = record["attempts"]
+        try:
+            client = self._client_factory()
+            payload = {
+                "amount": order_amount(record["amount_minor"], record["currency"]),
+                "currency": record["currency"],
+                "receipt": record["receipt"],
+                "payment_capture": "1",
+                "notes": {"payer": record["payer"], "payee": record["payee"]},
+            }
+            for retry in range(self.retries):
+                attempt += 1
+                # Saved before the call, so whoever reclaims this order if the
+                # process dies mid-request looks it up before creating it
+                self._save(group_name, record, attempts=attempt)
+                try:
+                    # An earlier attempt (here or in a settle() that failed) may
+                    # have created the order even though its reply never came
+                    order_id = _find_order(client, record["receipt"]) if attempt > 1 else None
+                    if order_id is None:
+                        with timed("Razorpay order.create"):
+                            order_id = client.order.create(payload)["id"]
+                except Exception as e:
+                    if retry + 1 < self.retries and self._retryable(e):
+                        time.sleep(self.backoff * 2 ** retry)
+                        continue
+                    raise
+                self._save(group_name, record, state=CREATED, order_id=order_id, error=None, attempts=attempt)
+                return
+        except Exception as e:
+            self._save(group_name, record, state=FAILED, error=str(e) or type(e).__name__, attempts=attempt)
+
+    def _save(self, group_name, record, **fields):
+        with self._lock:
+            record.update(fields)
+        self._store.update_order(group_name, dict(record))
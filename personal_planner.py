@@ -1,11 +1,12 @@
 import streamlit as st
-import pandas as pd
 import calendar
 from datetime import datetime
+from expense_store import ExpenseStore
+from money import format_inr
 
 # Initialize session state for storing expenses
 if "expenses" not in st.session_state:
-    st.session_state.expenses = pd.DataFrame(columns=["Date", "Item", "Amount"])
+    st.session_state.expenses = ExpenseStore()
 
 # Streamlit UI
 st.title("💰 Monthly Expense Tracker")
@@ -27,8 +28,7 @@ selected_date = st.date_input("Select Date to Add/View Expenses",
 st.write(f"### Calendar for {selected_month} {current_year}")
 
 # Get all recorded expense dates
-expense_dates = st.session_state.expenses["Date"].tolist()
-expense_dates = [datetime.strptime(date, "%Y-%m-%d").day for date in expense_dates if date.startswith(f"{current_year}-{month_number:02d}")]
+expense_dates = st.session_state.expenses.expense_days(current_year, month_number)
 
 # Generate a monthly calendar with highlighted expense dates
 month_calendar = calendar.monthcalendar(current_year, month_number)
@@ -59,21 +59,18 @@ expense_amount = st.number_input("Enter Amount", min_value=0.0, format="%.2f")
 
 if st.button("Add Expense"):
     if expense_item and expense_amount:
-        new_expense = pd.DataFrame({"Date": [selected_date.strftime('%Y-%m-%d')], 
-                                    "Item": [expense_item], 
-                                    "Amount": [expense_amount]})
-        st.session_state.expenses = pd.concat([st.session_state.expenses, new_expense], ignore_index=True)
+        st.session_state.expenses.append(selected_date, expense_item, expense_amount)
         st.success("Expense added successfully!")
         st.rerun()  # Refresh to update calendar highlights
 
 # Display Expenses for Selected Month
 st.write(f"### Expenses for {selected_month} {current_year}")
-filtered_expenses = st.session_state.expenses[st.session_state.expenses["Date"].str.startswith(f"{current_year}-{month_number:02d}")]
+filtered_expenses = st.session_state.expenses.month(current_year, month_number)
 
 if not filtered_expenses.empty:
-    st.dataframe(filtered_expenses)
-    total_expenses = filtered_expenses["Amount"].sum()
-    st.write(f"## 💵 Total Expenses for {selected_month} {current_year}: ₹{total_expenses:.2f}")
+    st.dataframe(filtered_expenses, column_config={"Date": st.column_config.DateColumn(format="YYYY-MM-DD")})
+    total_expenses = st.session_state.expenses.month_total(current_year, month_number)
+    st.write(f"## 💵 Total Expenses for {selected_month} {current_year}: {format_inr(total_expenses)}")
 else:
     st.write("No expenses recorded for this month.")
 
@@ -0,0 +1,94 @@
+"""Recurring expenses (rent, subscriptions, EMIs) and monthly budgets for the tracker.
+
+A recurring expense is stored once as a rule, a JSON-friendly dict:
+{"id", "item", "amount_paise", "start", "frequency", "every", "end"},
+where start and end are ISO dates (end is optional and inclusive) and
+the rule repeats every `every` weeks, months or years from its start.
+Monthly rules fall on the start's day of the month, or the month's last
+day in shorter months; yearly rules started on 29 February fall on
+28 February in other years.
+
+Occurrences are never written as rows. `occurrences()` works out a
+rule's dates in one month directly from the start date, without
+walking the months in between, so the tracker only expands the month
+it shows (see expense_store.ExpenseStore).
+
+A budget is a monthly limit in paise for an item or a category (see
+categories.py), matched after `budget_key` normalization, or for all
+spending (OVERALL).
+"""
+import calendar
+from datetime import date, timedelta
+
+WEEKLY = "weekly"
+MONTHLY = "monthly"
+YEARLY = "yearly"
+FREQUENCIES = (MONTHLY, WEEKLY, YEARLY)
+
+OVERALL = "*"  # budget name for the month's total spending
+
+
+def budget_key(name):
+    """Budgets match items regardless of case and surrounding spaces."""
+    return name if name == OVERALL else name.strip().casefold()
+
+
+def check_rule(rule):
+    """Fill in defaults and raise ValueError unless `rule` is a valid recurring expense."""
+    if not str(rule.get("item") or "").strip():
+        raise ValueError("A recurring expense needs an item")
+    if not isinstance(rule.get("amount_paise"), int) or rule["amount_paise"] <= 0:
+        raise ValueError("A recurring expense needs a positive amount")
+    if rule.get("frequency") not in FREQUENCIES:
+        raise ValueError(f"Frequency must be one of: {', '.join(FREQUENCIES)}")
+    rule.setdefault("every", 1)
+    if not isinstance(rule["every"], int) or rule["every"] < 1:
+        raise ValueError("A recurring expense repeats every 1 or more periods")
+    rule.setdefault("end", None)
+    try:
+        start = date.fromisoformat(rule["start"])
+        end = None if rule["end"] is None else date.fromisoformat(rule["end"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Start and end dates must be YYYY-MM-DD") from None
+    if end is not None and end < start:
+        raise ValueError("A recurring expense can't end before it starts")
+    return rule
+
+
+def _on_day(year, month, day):
+    # The day in this month, or its last day if the month is shorter
+    return date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+def occurrences(rule, year, month):
+    """Dates in (year, month) on which `rule` falls, ascending."""
+    start = date.fromisoformat(rule["start"])
+    end = rule["end"] and date.fromisoformat(rule["end"])
+    first = date(year, month, 1)
+    last = _on_day(year, month, 31)
+    if last < start or (end and end < first):
+        return []
+    every = rule["every"]
+    if rule["frequency"] == WEEKLY:
+        period = 7 * every
+        skipped = max(0, -(-(first - start).days // period))  # periods before the month
+        day = start + timedelta(days=skipped * period)
+        dates = []
+        while day <= last:
+            dates.append(day)
+            day += timedelta(days=period)
+    elif rule["frequency"] == MONTHLY:
+        months = (year - start.year) * 12 + month - start.month
+        dates = [_on_day(year, month, start.day)] if months % every == 0 else []
+    else:
+        years = year - start.year
+        dates = [_on_day(year, month, start.day)] if month == start.month and years % every == 0 else []
+    return [day for day in dates if not end or day <= end]
+
+
+def describe_rule(rule):
+    """Short label, e.g. "Rent, every month from 2025-01-05"."""
+    unit = {WEEKLY: "week", MONTHLY: "month", YEARLY: "year"}[rule["frequency"]]
+    period = unit if rule["every"] == 1 else f"{rule['every']} {unit}s"
+    until = f" until {rule['end']}" if rule["end"] else ""
+    return f"{rule['item']}, every {period} from {rule['start']}{until}"
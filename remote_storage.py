@@ -0,0 +1,158 @@
+"""Storage implementation that talks to the shared backend (backend.py).
+
+The Streamlit app uses this instead of SQLiteStorage when BACKEND_URL is
+set. Conditional writes send the expected group version as `If-Match`;
+a 409 answer is raised as storage.VersionConflict, a 404 as KeyError.
+"""
+from urllib.parse import quote
+
+from money import HOME_CURRENCY
+from recurring import check_rule
+from storage import Storage, VersionConflict
+
+
+def expense_json(expense):
+    return {key: expense[key] for key in ("desc", "amount_minor", "paid_by", "split", "currency", "date") if key in expense}
+
+
+class RemoteStorage(Storage):
+    def __init__(self, base_url, timeout=10):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=16)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def close(self):
+        self._session.close()
+
+    def _request(self, method, path, group_name=None, expected_version=None, **kwargs):
+        headers = {}
+        if expected_version is not None:
+            headers["If-Match"] = f'"{expected_version}"'
+        response = self._session.request(
+            method, self.base_url + path, headers=headers, timeout=self.timeout, **kwargs
+        )
+        if response.status_code == 404:
+            raise KeyError(group_name)
+        if response.status_code == 400:
+            raise ValueError(response.reason)
+        if response.status_code == 409:
+            raise VersionConflict(group_name, response.json()["version"])
+        response.raise_for_status()
+        return response.json()
+
+    def _group_path(self, name, *parts):
+        return "/".join(["/groups", quote(name, safe="")] + [quote(str(part), safe="") for part in parts])
+
+    def list_groups(self):
+        return self._request("GET", "/groups")["groups"]
+
+    def create_group(self, name):
+        self._request("POST", "/groups", json={"name": name})
+
+    def load_group(self, name):
+        return self._request("GET", self._group_path(name), name)
+
+    def group_version(self, name):
+        return self._request("GET", self._group_path(name, "version"), name)["version"]
+
+    def group_history(self, name, since=0, limit=None):
+        params = {"since": since}
+        if limit is not None:
+            params["limit"] = limit
+        return self._request("GET", self._group_path(name, "events"), name, params=params)["events"]
+
+    def group_at(self, name, version=None, timestamp=None):
+        params = {}
+        if version is not None:
+            params["version"] = version
+        if timestamp is not None:
+            params["timestamp"] = timestamp
+        return self._request("GET", self._group_path(name, "at"), name, params=params)
+
+    def add_member(self, group_name, member, expected_version=None):
+        return self._request(
+            "POST", self._group_path(group_name, "members"), group_name, expected_version, json={"member": member}
+        )["version"]
+
+    def add_payment(self, group_name, payment, expected_version=None):
+        result = self._request(
+            "POST",
+            self._group_path(group_name, "payments"),
+            group_name,
+            expected_version,
+            json={key: payment.get(key) for key in ("payer", "payee", "amount_minor", "order_id", "currency", "date")},
+        )
+        payment["id"] = result["id"]
+        payment.setdefault("order_id", None)
+        payment["currency"] = payment.get("currency") or HOME_CURRENCY
+        payment.setdefault("date", None)
+        return result["version"]
+
+    def add_expenses(self, group_name, expenses, expected_version=None):
+        result = self._request(
+            "POST",
+            self._group_path(group_name, "expenses"),
+            group_name,
+            expected_version,
+            json={"expenses": [expense_json(e) for e in expenses]},
+        )
+        for expense, expense_id in zip(expenses, result["ids"]):
+            expense["id"] = expense_id
+        return result["version"]
+
+    def edit_expense(self, group_name, expense_id, expense, expected_version=None):
+        result = self._request(
+            "PUT",
+            self._group_path(group_name, "expenses", expense_id),
+            group_name,
+            expected_version,
+            json=expense_json(expense),
+        )
+        expense["id"] = expense_id
+        return result["version"]
+
+    def delete_expense(self, group_name, expense_id, expected_version=None):
+        return self._request(
+            "DELETE", self._group_path(group_name, "expenses", expense_id), group_name, expected_version
+        )["version"]
+
+    def add_personal_expenses(self, rows):
+        self._request("POST", "/personal", json={"rows": [list(row) for row in rows]})
+
+    def personal_expenses(self, year, month):
+        return [tuple(row) for row in self._request("GET", f"/personal/{int(year)}/{int(month)}")["rows"]]
+
+    def add_recurring_expense(self, rule):
+        check_rule(rule)
+        rule["id"] = self._request("POST", "/recurring", json=rule)["id"]
+
+    def recurring_expenses(self):
+        return self._request("GET", "/recurring")["rules"]
+
+    def delete_recurring_expense(self, rule_id):
+        self._request("DELETE", f"/recurring/{int(rule_id)}")
+
+    def set_budget(self, name, amount_paise):
+        self._request("PUT", "/budgets", json={"name": name, "amount_paise": amount_paise})
+
+    def budgets(self):
+        return self._request("GET", "/budgets")["budgets"]
+
+    def claim_order(self, group_name, order, stale_after):
+        reply = self._request(
+            "POST", self._group_path(group_name, "orders"), group_name,
+            json={"order": order, "stale_after": stale_after},
+        )
+        return reply["order"], reply["claimed"]
+
+    def update_order(self, group_name, order):
+        self._request("PUT", self._group_path(group_name, "orders", order["receipt"]), group_name, json=order)
+
+    def orders(self, group_name):
+        return self._request("GET", self._group_path(group_name, "orders"), group_name)["orders"]
@@ -0,0 +1,85 @@
+"""Settlement engine.
+
+Nets a group's balances into a short list of payer -> payee transfers.
+Small groups are solved exactly (fewest possible transfers); larger groups
+use a heap-based greedy that needs at most n - 1 transfers.
+"""
+import heapq
+
+# Above this many non-zero balances the exact solver gets too slow for a rerun
+EXACT_LIMIT = 12
+
+
+def settle(balances, exact_limit=EXACT_LIMIT):
+    """Return a list of (payer, payee, amount) transfers that clear `balances`.
+
+    `balances` maps member -> net balance in paise (positive means the
+    member is owed money); transfer amounts are paise as well.
+    """
+    paise = {m: p for m, p in balances.items() if p != 0}
+    if len(paise) <= exact_limit:
+        return _settle_exact(paise)
+    return _settle_greedy(paise)
+
+
+def _settle_greedy(paise):
+    # Max-heaps (negated) of what creditors are owed and debtors owe
+    creditors = [(-p, m) for m, p in paise.items() if p > 0]
+    debtors = [(p, m) for m, p in paise.items() if p < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        owed, payee = heapq.heappop(creditors)
+        owes, payer = heapq.heappop(debtors)
+        amount = min(-owed, -owes)
+        transfers.append((payer, payee, amount))
+        if -owed > amount:
+            heapq.heappush(creditors, (owed + amount, payee))
+        if -owes > amount:
+            heapq.heappush(debtors, (owes + amount, payer))
+    return transfers
+
+
+def _settle_exact(paise):
+    # Fewest transfers = n - (max number of disjoint zero-sum subgroups).
+    # dp[mask] is that maximum for the members in `mask`.
+    members = list(paise)
+    values = [paise[m] for m in members]
+    n = len(members)
+    full = (1 << n) - 1
+
+    sums = [0] * (full + 1)
+    dp = [0] * (full + 1)
+    for mask in range(1, full + 1):
+        low = mask & -mask
+        i = low.bit_length() - 1
+        sums[mask] = sums[mask ^ low] + values[i]
+        best = 0
+        rest = mask
+        while rest:
+            bit = rest & -rest
+            rest ^= bit
+            if dp[mask ^ bit] > best:
+                best = dp[mask ^ bit]
+        dp[mask] = best + (1 if sums[mask] == 0 else 0)
+
+    # Peel members off to recover the zero-sum subgroups, then settle each
+    # subgroup greedily (k members always need at most k - 1 transfers).
+    transfers = []
+    mask = full
+    group = []
+    while mask:
+        rest = mask
+        while rest:
+            bit = rest & -rest
+            rest ^= bit
+            if dp[mask ^ bit] + (1 if sums[mask] == 0 else 0) == dp[mask]:
+                break
+        group.append(bit.bit_length() - 1)
+        mask ^= bit
+        if sums[mask] == 0:
+            transfers.extend(_settle_greedy({members[i]: values[i] for i in group}))
+            group = []
+    return transfers
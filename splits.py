@@ -0,0 +1,143 @@
+"""Split specs: how an expense's amount is divided among group members.
+
+Members are interned as their position in the group's member list
+(members are only ever appended, so a position never changes). An
+expense's "split" is a compact, JSON-friendly [mode, mask, weights] list:
+
+- mode is "equal", "weighted" (percentages, kept as basis points that
+  add up to 10000), "shares" (positive whole shares) or "exact" (minor
+  units per member, adding up to the expense amount);
+- mask is an int bitmask of the member ids in the split, so "everyone"
+  in a group of n members is (1 << n) - 1 and any subset is one int, no
+  matter how many members it names;
+- weights is None for equal splits, else one int per member of the mask,
+  in id order.
+
+`shares()` turns a spec and an amount into exact (member id, amount)
+pairs; for an amount converted to another currency, exact splits keep
+their proportions. Leftover paise from rounding go to the largest remainders, ties
+to the lower id, so an equal split matches money.split_paise over the
+members in id order and balances stay exact.
+"""
+from functools import lru_cache
+
+from money import HOME_CURRENCY, format_money, split_paise
+
+EQUAL = "equal"
+WEIGHTED = "weighted"
+SHARES = "shares"
+EXACT = "exact"
+MODES = (EQUAL, WEIGHTED, SHARES, EXACT)
+
+BASIS_POINTS = 10000  # weighted splits are percentages with two decimals
+
+
+# Member ids set in each byte value, for decoding masks a byte at a time
+_BYTE_IDS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+@lru_cache(maxsize=65536)
+def member_ids(mask):
+    """Member ids set in `mask`, ascending."""
+    if mask < 256:
+        return _BYTE_IDS[mask]
+    ids = []
+    offset = 0
+    while mask:
+        ids.extend([offset + bit for bit in _BYTE_IDS[mask & 255]])
+        mask >>= 8
+        offset += 8
+    return tuple(ids)
+
+
+def everyone(member_count):
+    return (1 << member_count) - 1
+
+
+def encode(members, split_among, mode=EQUAL, weights=None):
+    """Spec for `split_among` (member names), with `weights` aligned to it for non-equal modes."""
+    index = {member: i for i, member in enumerate(members)}
+    try:
+        ids = [index[member] for member in split_among]
+    except KeyError as e:
+        raise ValueError(f"{e.args[0]} is not a group member") from None
+    if len(set(ids)) != len(ids):
+        raise ValueError("A member appears twice in the split")
+    mask = 0
+    for member_id in ids:
+        mask |= 1 << member_id
+    if mode == EQUAL:
+        return [EQUAL, mask, None]
+    if weights is None or len(weights) != len(ids):
+        raise ValueError(f"A {mode} split needs one weight per member")
+    by_id = dict(zip(ids, weights))
+    return [mode, mask, [int(by_id[member_id]) for member_id in sorted(ids)]]
+
+
+def validate(split, amount_minor, member_count, currency=HOME_CURRENCY):
+    """Raise ValueError unless `split` is a well-formed spec for this amount and group size."""
+    try:
+        mode, mask, weights = split
+    except (TypeError, ValueError):
+        raise ValueError("A split is [mode, member mask, weights]") from None
+    if mode not in MODES:
+        raise ValueError(f"Unknown split mode: {mode}")
+    if not isinstance(mask, int) or mask <= 0 or mask > everyone(member_count):
+        raise ValueError("A split needs at least one member, all of them in the group")
+    if mode == EQUAL:
+        if weights is not None:
+            raise ValueError("An equal split has no weights")
+        return
+    if not isinstance(weights, list) or len(weights) != len(member_ids(mask)):
+        raise ValueError(f"A {mode} split needs one weight per member")
+    if not all(isinstance(w, int) for w in weights):
+        raise ValueError("Split weights must be whole numbers")
+    if mode == EXACT:
+        if min(weights) < 0 or sum(weights) != amount_minor:
+            raise ValueError(f"Exact amounts must add up to {format_money(amount_minor, currency)}")
+    elif min(weights) <= 0:
+        raise ValueError("Split weights must be positive")
+    elif mode == WEIGHTED and sum(weights) != BASIS_POINTS:
+        raise ValueError("Percentages must add up to 100")
+
+
+def _apportion(total, weights):
+    # Floor of each proportional part, then the leftover paise to the largest remainders
+    weight_sum = sum(weights)
+    parts = [total * w // weight_sum for w in weights]
+    leftover = total - sum(parts)
+    if leftover:
+        order = sorted(range(len(weights)), key=lambda i: (-(total * weights[i] % weight_sum), i))
+        for i in order[:leftover]:
+            parts[i] += 1
+    return parts
+
+
+def shares(split, amount_minor):
+    """(member id, share) pairs for the split, in minor units adding up to `amount_minor`."""
+    mode, mask, weights = split
+    ids = member_ids(mask)
+    if mode == EQUAL:
+        return list(zip(ids, split_paise(amount_minor, len(ids))))
+    if mode == EXACT and sum(weights) == amount_minor:
+        return list(zip(ids, weights))
+    # Exact amounts scale like weights once converted to another currency
+    return list(zip(ids, _apportion(amount_minor, weights)))
+
+
+def split_members(split, members):
+    """Names of the members in the split, in member order."""
+    return [members[member_id] for member_id in member_ids(split[1])]
+
+
+def describe_split(split, members, currency=HOME_CURRENCY):
+    """Short label for the split, e.g. "Everyone" or "A 60%, B 40%"."""
+    mode, mask, weights = split
+    names = split_members(split, members)
+    if mode == EQUAL:
+        return "Everyone" if mask == everyone(len(members)) else ", ".join(names)
+    if mode == WEIGHTED:
+        return ", ".join(f"{name} {w / 100:g}%" for name, w in zip(names, weights))
+    if mode == SHARES:
+        return ", ".join(f"{name} ×{w}" for name, w in zip(names, weights))
+    return ", ".join(f"{name} {format_money(w, currency)}" for name, w in zip(names, weights))
@@ -0,0 +1,632 @@
+"""Persistent storage for groups and personal expenses.
+
+`Storage` is the interface the app talks to; `SQLiteStorage` implements it
+on a single SQLite file in WAL mode so several Streamlit workers can read
+while one writes, and remote_storage.RemoteStorage implements it against
+the shared backend service (backend.py). Money is stored as integer minor
+units of each expense's or payment's currency (paise for rupees), with
+the date it was spent for FX conversion (see fx.py).
+
+Every group has a version number that each write bumps and returns.
+Writes may pass `expected_version` for optimistic concurrency: if the group
+changed since that version the write is rejected with VersionConflict.
+Each write is also logged as an event numbered by the version it produced
+(see events.py); groups are loaded from their latest snapshot plus the
+events after it, and can be rebuilt as of any logged version.
+
+Expense splits are stored as their compact spec (see splits.py) in one
+JSON column.
+"""
+import json
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from events import (
+    EXPENSE_DELETED,
+    EXPENSE_EDITED,
+    EXPENSES_ADDED,
+    MEMBER_ADDED,
+    PAYMENT_RECORDED,
+    SNAPSHOT_EVERY,
+    SNAPSHOTS_KEPT,
+    GroupState,
+    decode_event,
+    encode_event,
+    expense_row,
+    payment_row,
+)
+from model import Expense, Members
+from money import HOME_CURRENCY, check_currency
+from payments import FAILED, PENDING
+from recurring import check_rule
+from splits import validate
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS groups (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS members (
+    group_id INTEGER NOT NULL REFERENCES groups(id),
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (group_id, name)
+);
+CREATE TABLE IF NOT EXISTS expenses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    group_id INTEGER NOT NULL REFERENCES groups(id),
+    description TEXT NOT NULL,
+    amount_minor INTEGER NOT NULL,
+    paid_by TEXT NOT NULL,
+    split TEXT NOT NULL,
+    currency TEXT NOT NULL DEFAULT 'INR',
+    date TEXT
+);
+CREATE INDEX IF NOT EXISTS expenses_by_group ON expenses(group_id, id);
+CREATE TABLE IF NOT EXISTS payments (
+    id INTEGER PRIMARY KEY,
+    group_id INTEGER NOT NULL REFERENCES groups(id),
+    payer TEXT NOT NULL,
+    payee TEXT NOT NULL,
+    amount_minor INTEGER NOT NULL,
+    order_id TEXT,
+    currency TEXT NOT NULL DEFAULT 'INR',
+    date TEXT
+);
+CREATE INDEX IF NOT EXISTS payments_by_group ON payments(group_id, id);
+CREATE TABLE IF NOT EXISTS personal_expenses (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    item TEXT NOT NULL,
+    amount_paise INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS personal_expenses_by_month ON personal_expenses(year, month);
+CREATE TABLE IF NOT EXISTS recurring_expenses (
+    id INTEGER PRIMARY KEY,
+    item TEXT NOT NULL,
+    amount_paise INTEGER NOT NULL,
+    start_date TEXT NOT NULL,
+    frequency TEXT NOT NULL,
+    every INTEGER NOT NULL DEFAULT 1,
+    end_date TEXT
+);
+CREATE TABLE IF NOT EXISTS budgets (
+    name TEXT PRIMARY KEY,
+    amount_paise INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS group_events (
+    group_id INTEGER NOT NULL REFERENCES groups(id),
+    seq INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (group_id, seq)
+);
+CREATE TABLE IF NOT EXISTS group_snapshots (
+    group_id INTEGER NOT NULL REFERENCES groups(id),
+    seq INTEGER NOT NULL,
+    state BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (group_id, seq)
+);
+CREATE TABLE IF NOT EXISTS payment_orders (
+    receipt TEXT PRIMARY KEY,
+    group_id INTEGER NOT NULL REFERENCES groups(id),
+    payer TEXT NOT NULL,
+    payee TEXT NOT NULL,
+    amount_minor INTEGER NOT NULL,
+    currency TEXT NOT NULL,
+    state TEXT NOT NULL,
+    order_id TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS payment_orders_by_group ON payment_orders(group_id);
+"""
+ORDER_FIELDS = ("receipt", "payer", "payee", "amount_minor", "currency", "state", "order_id", "error", "attempts")
+
+
+def _check_currency_and_date(record):
+    # Fill in the defaults and reject unknown currencies or malformed dates
+    record["currency"] = check_currency(record.get("currency") or HOME_CURRENCY)
+    record.setdefault("date", None)
+    if record["date"] is not None:
+        try:
+            record["date"] = date.fromisoformat(record["date"]).isoformat()
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid date: {record['date']!r} (expected YYYY-MM-DD)") from None
+
+
+class VersionConflict(Exception):
+    """A conditional write found the group at a different version."""
+
+    def __init__(self, group_name, version):
+        super().__init__(f"Group {group_name!r} is at version {version}")
+        self.group_name = group_name
+        self.version = version
+
+
+class Storage:
+    """Interface for group and personal-expense persistence."""
+
+    def list_groups(self):
+        raise NotImplementedError
+
+    def create_group(self, name):
+        raise NotImplementedError
+
+    def load_group(self, name):
+        """Return the group as {"members", "expenses", "payments", "version", "balances"}."""
+        raise NotImplementedError
+
+    def group_version(self, name):
+        raise NotImplementedError
+
+    def group_history(self, name, since=0, limit=None):
+        """Return logged events after version `since` as {"seq", "kind", "payload", "created_at"} dicts."""
+        raise NotImplementedError
+
+    def group_at(self, name, version=None, timestamp=None):
+        """Return the group as it was at `version` (or at unix `timestamp`)."""
+        raise NotImplementedError
+
+    # The group writes below return the group's new version
+
+    def add_member(self, group_name, member, expected_version=None):
+        """Append a member; an existing member is left alone and the current version returned."""
+        raise NotImplementedError
+
+    def add_payment(self, group_name, payment, expected_version=None):
+        """Record a (possibly partial) {"payer", "payee", "amount_minor", "order_id", "currency", "date"} payment.
+
+        Sets the payment's "id"; currency defaults to INR and date to None.
+        A payer or payee who is not a member, a payment to oneself, an
+        amount that is not a positive int, or an invalid currency or date
+        raises ValueError.
+        """
+        raise NotImplementedError
+
+    def add_expenses(self, group_name, expenses, expected_version=None):
+        """Insert expenses in one batch and set each expense's "id".
+
+        Expenses carry a "split" spec (see splits.py); "currency" defaults
+        to INR and "date" (ISO, optional) to None. A payer who is not a
+        member, an amount that is not a positive int, or an invalid split,
+        currency or date raises ValueError. An empty batch writes nothing
+        and returns the current version. Ids are never reused, even after
+        the last expense is deleted.
+        """
+        raise NotImplementedError
+
+    def edit_expense(self, group_name, expense_id, expense, expected_version=None):
+        """Replace an expense; it is checked as in add_expenses()."""
+        raise NotImplementedError
+
+    def delete_expense(self, group_name, expense_id, expected_version=None):
+        """Delete an expense; an unknown id raises KeyError and writes nothing."""
+        raise NotImplementedError
+
+    def add_personal_expenses(self, rows):
+        """Insert (date "YYYY-MM-DD", item, amount_paise) rows in one batch."""
+        raise NotImplementedError
+
+    def personal_expenses(self, year, month):
+        """Return the month's (date, item, amount_paise) rows."""
+        raise NotImplementedError
+
+    def add_recurring_expense(self, rule):
+        """Save a recurring expense rule (see recurring.py) and set its "id"; an invalid rule raises ValueError."""
+        raise NotImplementedError
+
+    def recurring_expenses(self):
+        """Return every recurring expense rule."""
+        raise NotImplementedError
+
+    def delete_recurring_expense(self, rule_id):
+        raise NotImplementedError
+
+    def set_budget(self, name, amount_paise):
+        """Set the monthly budget for an item (or recurring.OVERALL); None removes it."""
+        raise NotImplementedError
+
+    def budgets(self):
+        """Return the monthly budgets as {name: amount_paise}."""
+        raise NotImplementedError
+
+    # Razorpay order records (see payments.py), shared by every app process
+
+    def claim_order(self, group_name, order, stale_after):
+        """Save `order` as pending unless its receipt is already taken.
+
+        A receipt is taken by a created order, or by a pending one updated
+        in the last `stale_after` seconds (another process is creating it).
+        A failed or stale order is claimed again, keeping its attempts.
+        Returns (the stored order, whether this call claimed it).
+        """
+        raise NotImplementedError
+
+    def update_order(self, group_name, order):
+        """Save an order's state, order_id, error and attempts."""
+        raise NotImplementedError
+
+    def orders(self, group_name):
+        """Return the group's order records, oldest first."""
+        raise NotImplementedError
+
+
+class SQLiteStorage(Storage):
+    def __init__(self, path):
+        # One connection shared by all sessions; the lock serializes access
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def _group_id(self, name):
+        row = self._conn.execute("SELECT id FROM groups WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return row[0]
+
+    def _bump_version(self, group_name, group_id, expected_version):
+        # Runs inside the write transaction, so the check and the bump are atomic
+        if expected_version is None:
+            self._conn.execute("UPDATE groups SET version = version + 1 WHERE id = ?", (group_id,))
+        elif not self._conn.execute(
+            "UPDATE groups SET version = version + 1 WHERE id = ? AND version = ?", (group_id, expected_version)
+        ).rowcount:
+            (version,) = self._conn.execute("SELECT version FROM groups WHERE id = ?", (group_id,)).fetchone()
+            raise VersionConflict(group_name, version)
+        return self._version(group_id)
+
+    def _version(self, group_id):
+        return self._conn.execute("SELECT version FROM groups WHERE id = ?", (group_id,)).fetchone()[0]
+
+    def _record(self, group_id, version, kind, payload, weight=1):
+        """Log the event for a write; snapshot when the tail has grown long enough."""
+        self._conn.execute(
+            "INSERT INTO group_events (group_id, seq, kind, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+            (group_id, version, kind, encode_event(payload), time.time()),
+        )
+        (last,) = self._conn.execute("SELECT MAX(seq) FROM group_snapshots WHERE group_id = ?", (group_id,)).fetchone()
+        if version - last >= SNAPSHOT_EVERY or weight >= SNAPSHOT_EVERY:
+            self._save_snapshot(group_id, self._table_state(group_id))
+
+    def _save_snapshot(self, group_id, state):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO group_snapshots (group_id, seq, state, created_at) VALUES (?, ?, ?, ?)",
+            (group_id, state.version, state.snapshot(), time.time()),
+        )
+        # Older snapshots only speed up point-in-time reads; the version 0 one is the replay base
+        self._conn.execute(
+            "DELETE FROM group_snapshots WHERE group_id = ? AND seq > 0 AND seq NOT IN "
+            "(SELECT seq FROM group_snapshots WHERE group_id = ? ORDER BY seq DESC LIMIT ?)",
+            (group_id, group_id, SNAPSHOTS_KEPT),
+        )
+
+    def _members(self, group_id):
+        return Members(member for (member,) in self._conn.execute(
+            "SELECT name FROM members WHERE group_id = ? ORDER BY position", (group_id,)
+        ))
+
+    def _table_state(self, group_id):
+        # Current state from the members/expenses tables
+        (version,) = self._conn.execute("SELECT version FROM groups WHERE id = ?", (group_id,)).fetchone()
+        members = self._members(group_id)
+        expense_rows = self._conn.execute(
+            "SELECT id, description, amount_minor, paid_by, split, currency, date FROM expenses "
+            "WHERE group_id = ? ORDER BY id",
+            (group_id,),
+        ).fetchall()
+        payment_rows = self._conn.execute(
+            "SELECT id, payer, payee, amount_minor, order_id, currency, date FROM payments WHERE group_id = ? ORDER BY id",
+            (group_id,),
+        ).fetchall()
+        return GroupState(
+            members,
+            [
+                Expense(expense_id, desc, amount_minor, members.index(paid_by), *json.loads(split), currency, day)
+                for expense_id, desc, amount_minor, paid_by, split, currency, day in expense_rows
+            ],
+            [
+                {
+                    "id": payment_id, "payer": payer, "payee": payee, "amount_minor": amount_minor,
+                    "order_id": order_id, "currency": currency, "date": day,
+                }
+                for payment_id, payer, payee, amount_minor, order_id, currency, day in payment_rows
+            ],
+            version=version,
+        )
+
+    def _state_at(self, group_id, version):
+        # Latest snapshot at or before `version`, plus the events up to it
+        row = self._conn.execute(
+            "SELECT seq, state FROM group_snapshots WHERE group_id = ? AND seq <= ? ORDER BY seq DESC LIMIT 1",
+            (group_id, version),
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"No history before version {version + 1}")
+        state = GroupState.from_snapshot(row[1], row[0])
+        for seq, kind, payload in self._conn.execute(
+            "SELECT seq, kind, payload FROM group_events WHERE group_id = ? AND seq > ? AND seq <= ? ORDER BY seq",
+            (group_id, row[0], version),
+        ):
+            state.apply(seq, kind, decode_event(payload))
+        return state
+
+    def _expense_row(self, group_id, expense_id):
+        # The expense as an event row (see events.expense_row)
+        row = self._conn.execute(
+            "SELECT id, description, amount_minor, paid_by, split, currency, date FROM expenses "
+            "WHERE id = ? AND group_id = ?",
+            (expense_id, group_id),
+        ).fetchone()
+        if row is None:
+            return None
+        return list(row[:4]) + json.loads(row[4]) + list(row[5:])
+
+    def _check_expenses(self, group_id, expenses):
+        # Payers must be members, amounts positive, and every split spec, currency and date valid
+        members = self._members(group_id)
+        for expense in expenses:
+            amount = expense["amount_minor"]
+            if not isinstance(amount, int) or isinstance(amount, bool) or amount <= 0:
+                raise ValueError("An expense needs a positive amount")
+            if expense["paid_by"] not in members:
+                raise ValueError(f"{expense['paid_by']} is not a group member")
+            _check_currency_and_date(expense)
+            validate(expense["split"], expense["amount_minor"], len(members), expense["currency"])
+
+    def _check_payment(self, group_id, payment):
+        # Both sides must be members, the amount a positive whole number of minor units
+        members = self._members(group_id)
+        for side in ("payer", "payee"):
+            if payment.get(side) not in members:
+                raise ValueError(f"{payment.get(side)} is not a group member")
+        if payment["payer"] == payment["payee"]:
+            raise ValueError("A payment needs two different members")
+        amount = payment.get("amount_minor")
+        if not isinstance(amount, int) or isinstance(amount, bool) or amount <= 0:
+            raise ValueError("A payment needs a positive amount")
+        _check_currency_and_date(payment)
+
+    def list_groups(self):
+        with self._lock:
+            return [name for (name,) in self._conn.execute("SELECT name FROM groups ORDER BY id")]
+
+    def create_group(self, name):
+        with self._lock, self._conn:
+            created = self._conn.execute("INSERT OR IGNORE INTO groups (name) VALUES (?)", (name,))
+            if created.rowcount:
+                # The empty group at version 0 is the base every replay starts from
+                self._save_snapshot(created.lastrowid, GroupState())
+
+    def load_group(self, name):
+        with self._lock:
+            group_id = self._group_id(name)
+            (version,) = self._conn.execute("SELECT version FROM groups WHERE id = ?", (group_id,)).fetchone()
+            return self._state_at(group_id, version).to_group()
+
+    def group_version(self, name):
+        with self._lock:
+            row = self._conn.execute("SELECT version FROM groups WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return row[0]
+
+    def group_history(self, name, since=0, limit=None):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, kind, payload, created_at FROM group_events WHERE group_id = ? AND seq > ? "
+                "ORDER BY seq LIMIT ?",
+                (self._group_id(name), since, -1 if limit is None else limit),
+            ).fetchall()
+        return [
+            {"seq": seq, "kind": kind, "payload": decode_event(payload), "created_at": created_at}
+            for seq, kind, payload, created_at in rows
+        ]
+
+    def group_at(self, name, version=None, timestamp=None):
+        with self._lock:
+            group_id = self._group_id(name)
+            if version is None:
+                (version,) = self._conn.execute(
+                    "SELECT COALESCE(MAX(seq), 0) FROM group_events WHERE group_id = ? AND created_at <= ?",
+                    (group_id, time.time() if timestamp is None else timestamp),
+                ).fetchone()
+            return self._state_at(group_id, version).to_group()
+
+    def add_member(self, group_name, member, expected_version=None):
+        with self._lock, self._conn:
+            group_id = self._group_id(group_name)
+            if member in self._members(group_id):
+                return self._version(group_id)  # nothing changed: no version bump, no event
+            version = self._bump_version(group_name, group_id, expected_version)
+            self._conn.execute(
+                "INSERT INTO members (group_id, position, name) "
+                "VALUES (?, (SELECT COUNT(*) FROM members WHERE group_id = ?), ?)",
+                (group_id, group_id, member),
+            )
+            self._record(group_id, version, MEMBER_ADDED, {"member": member})
+        return version
+
+    def add_payment(self, group_name, payment, expected_version=None):
+        with self._lock, self._conn:
+            group_id = self._group_id(group_name)
+            self._check_payment(group_id, payment)
+            version = self._bump_version(group_name, group_id, expected_version)
+            payment["id"] = self._conn.execute(
+                "INSERT INTO payments (group_id, payer, payee, amount_minor, order_id, currency, date) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    group_id, payment["payer"], payment["payee"], payment["amount_minor"], payment.get("order_id"),
+                    payment["currency"], payment["date"],
+                ),
+            ).lastrowid
+            payment.setdefault("order_id", None)
+            self._record(group_id, version, PAYMENT_RECORDED, {"payment": payment_row(payment)})
+        return version
+
+    def add_expenses(self, group_name, expenses, expected_version=None):
+        with self._lock, self._conn:
+            # Reserve ids up front (under a write lock) so the whole batch is two executemany calls
+            self._conn.execute("BEGIN IMMEDIATE")
+            group_id = self._group_id(group_name)
+            if not expenses:
+                return self._version(group_id)
+            version = self._bump_version(group_name, group_id, expected_version)
+            # Past the highest id ever used, so a deleted expense's id is never handed out again
+            (next_id,) = self._conn.execute(
+                "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'expenses'), 0) + 1"
+            ).fetchone()
+            self._check_expenses(group_id, expenses)
+            expense_rows = []
+            for expense_id, expense in enumerate(expenses, next_id):
+                expense["id"] = expense_id
+                expense_rows.append((
+                    expense_id, group_id, expense["desc"], expense["amount_minor"], expense["paid_by"],
+                    json.dumps(expense["split"], separators=(",", ":")), expense["currency"], expense["date"],
+                ))
+            self._conn.executemany(
+                "INSERT INTO expenses (id, group_id, description, amount_minor, paid_by, split, currency, date) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                expense_rows,
+            )
+            self._record(
+                group_id, version, EXPENSES_ADDED, {"expenses": [expense_row(e) for e in expenses]}, len(expenses)
+            )
+        return version
+
+    def edit_expense(self, group_name, expense_id, expense, expected_version=None):
+        with self._lock, self._conn:
+            group_id = self._group_id(group_name)
+            previous = self._expense_row(group_id, expense_id)
+            if previous is None:
+                raise KeyError(expense_id)
+            self._check_expenses(group_id, [expense])
+            version = self._bump_version(group_name, group_id, expected_version)
+            self._conn.execute(
+                "UPDATE expenses SET description = ?, amount_minor = ?, paid_by = ?, split = ?, currency = ?, date = ? "
+                "WHERE id = ?",
+                (
+                    expense["desc"], expense["amount_minor"], expense["paid_by"],
+                    json.dumps(expense["split"], separators=(",", ":")), expense["currency"], expense["date"], expense_id,
+                ),
+            )
+            expense["id"] = expense_id
+            self._record(group_id, version, EXPENSE_EDITED, {"expense": expense_row(expense), "previous": previous})
+        return version
+
+    def delete_expense(self, group_name, expense_id, expected_version=None):
+        with self._lock, self._conn:
+            group_id = self._group_id(group_name)
+            previous = self._expense_row(group_id, expense_id)
+            if previous is None:
+                raise KeyError(expense_id)
+            version = self._bump_version(group_name, group_id, expected_version)
+            self._conn.execute("DELETE FROM expenses WHERE id = ? AND group_id = ?", (expense_id, group_id))
+            # The deleted expense is kept in the event for the audit trail
+            self._record(group_id, version, EXPENSE_DELETED, {"expense": previous})
+        return version
+
+    def add_personal_expenses(self, rows):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO personal_expenses (date, year, month, item, amount_paise) VALUES (?, ?, ?, ?, ?)",
+                [(day, int(day[:4]), int(day[5:7]), item, amount_paise) for day, item, amount_paise in rows],
+            )
+
+    def personal_expenses(self, year, month):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT date, item, amount_paise FROM personal_expenses WHERE year = ? AND month = ? ORDER BY id",
+                (year, month),
+            ).fetchall()
+
+    def add_recurring_expense(self, rule):
+        check_rule(rule)
+        with self._lock, self._conn:
+            rule["id"] = self._conn.execute(
+                "INSERT INTO recurring_expenses (item, amount_paise, start_date, frequency, every, end_date) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (rule["item"], rule["amount_paise"], rule["start"], rule["frequency"], rule["every"], rule["end"]),
+            ).lastrowid
+
+    def recurring_expenses(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, item, amount_paise, start_date, frequency, every, end_date FROM recurring_expenses ORDER BY id"
+            ).fetchall()
+        return [
+            {"id": rule_id, "item": item, "amount_paise": amount_paise, "start": start, "frequency": frequency,
+             "every": every, "end": end}
+            for rule_id, item, amount_paise, start, frequency, every, end in rows
+        ]
+
+    def delete_recurring_expense(self, rule_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM recurring_expenses WHERE id = ?", (rule_id,))
+
+    def set_budget(self, name, amount_paise):
+        with self._lock, self._conn:
+            if amount_paise is None:
+                self._conn.execute("DELETE FROM budgets WHERE name = ?", (name,))
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO budgets (name, amount_paise) VALUES (?, ?)", (name, amount_paise)
+                )
+
+    def budgets(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT name, amount_paise FROM budgets ORDER BY name"))
+
+    def claim_order(self, group_name, order, stale_after):
+        with self._lock, self._conn:
+            group_id = self._group_id(group_name)
+            now = time.time()
+            claimed = self._conn.execute(
+                "INSERT INTO payment_orders (receipt, group_id, payer, payee, amount_minor, currency, state, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (receipt) DO UPDATE SET state = excluded.state, error = NULL, updated_at = excluded.updated_at "
+                "WHERE state = ? OR (state = ? AND updated_at < ?)",
+                (
+                    order["receipt"], group_id, order["payer"], order["payee"], order["amount_minor"], order["currency"],
+                    PENDING, now, FAILED, PENDING, now - stale_after,
+                ),
+            ).rowcount > 0
+            row = self._conn.execute(
+                f"SELECT {', '.join(ORDER_FIELDS)} FROM payment_orders WHERE receipt = ?", (order["receipt"],)
+            ).fetchone()
+        return dict(zip(ORDER_FIELDS, row)), claimed
+
+    def update_order(self, group_name, order):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE payment_orders SET state = ?, order_id = ?, error = ?, attempts = ?, updated_at = ? "
+                "WHERE receipt = ? AND group_id = ?",
+                (
+                    order["state"], order["order_id"], order["error"], order["attempts"], time.time(),
+                    order["receipt"], self._group_id(group_name),
+                ),
+            )
+
+    def orders(self, group_name):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(ORDER_FIELDS)} FROM payment_orders WHERE group_id = ? ORDER BY rowid",
+                (self._group_id(group_name),),
+            ).fetchall()
+        return [dict(zip(ORDER_FIELDS, row)) for row in rows]
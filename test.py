@@ -1,11 +1,29 @@
 import streamlit as st
 import pandas as pd
 import calendar
-from datetime import datetime
-import google.generativeai as genai
-import razorpay
-from dotenv import load_dotenv
-import os
+from datetime import date, datetime
+import time
+from ledger import add_member, add_expense, add_expenses, delete_expense, add_payment, converted_balances
+from settlement import settle
+from money import HOME_CURRENCY, to_paise, to_rupees, format_inr, split_paise, to_minor, to_major, format_money, minor_units
+from fx import load_rates
+from storage import SQLiteStorage, VersionConflict
+from events import describe
+from remote_storage import RemoteStorage
+from expense_store import ExpenseStore
+from calendar_view import calendar_html
+from categories import get_classifier
+from recurring import FREQUENCIES, OVERALL, budget_key, check_rule, describe_rule
+from export import ExportCache, lazy_download_button
+from expense_index import ExpenseIndex, paginated_expense_table
+from model import compact_group
+from splits import EQUAL, WEIGHTED, SHARES, EXACT, BASIS_POINTS, encode, validate, split_members, describe_split
+from importer import import_group_expenses, import_personal_expenses
+from insights import InsightsService, summarize_group
+from clients import get_config, get_genai, get_razorpay_client
+from payments import PaymentOrchestrator
+from instrumentation import timed, timings, histogram, profiled, last_profile, start_metrics_server
+from instrumentation import reset as reset_timings
 
 # Page configuration
 st.set_page_config(
@@ -14,23 +32,34 @@ st.set_page_config(
     layout="wide"
 )
 
-# Load API Keys (silently)
-load_dotenv()
-GENAI_API_KEY = os.getenv("GOOGLE_API_KEY")
-RAZORPAY_KEY = os.getenv("RAZORPAY_KEY")
-RAZORPAY_SECRET = os.getenv("RAZORPAY_SECRET")
+# Load API Keys (silently); .env is read once per process and the Gemini
+# and Razorpay SDKs are only imported when first used (see clients.py)
+GENAI_API_KEY = get_config("GOOGLE_API_KEY")
+RAZORPAY_KEY = get_config("RAZORPAY_KEY")
+RAZORPAY_SECRET = get_config("RAZORPAY_SECRET")
 
-# Configure APIs if keys are available
-if GENAI_API_KEY:
-    genai.configure(api_key=GENAI_API_KEY)
-if RAZORPAY_KEY and RAZORPAY_SECRET:
-    razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY, RAZORPAY_SECRET))
+# Persistent storage, shared by every session and rerun. With BACKEND_URL
+# set, groups live in the shared backend service (see backend.py).
+@st.cache_resource
+def get_storage():
+    if get_config("BACKEND_URL"):
+        return RemoteStorage(get_config("BACKEND_URL"))
+    return SQLiteStorage(get_config("EXPENSE_DB") or "expenses.db")
+
+storage = get_storage()
 
 # Initialize session states
 if "groups" not in st.session_state:
-    st.session_state.groups = {}
+    # Group names only; each group is loaded from storage when first selected
+    st.session_state.groups = dict.fromkeys(storage.list_groups())
 if "expenses" not in st.session_state:
-    st.session_state.expenses = pd.DataFrame(columns=["Date", "Item", "Amount"])
+    st.session_state.expenses = ExpenseStore()
+    st.session_state.loaded_months = set()
+    # Recurring expenses are expanded into each month as it is viewed
+    st.session_state.expenses.set_recurring(storage.recurring_expenses())
+    st.session_state.expenses.set_budgets(storage.budgets())
+if "exports" not in st.session_state:
+    st.session_state.exports = ExportCache()
 if "active_tab" not in st.session_state:
     st.session_state.active_tab = "Expense Splitter"
 
@@ -110,6 +139,36 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Latency per span; fragment reruns show up as a single panel's span
+@st.fragment(run_every=2)
+def show_debug_panel():
+    st.markdown("### Timings")
+    spans = timings()
+    if spans:
+        st.dataframe(pd.DataFrame(spans), hide_index=True, use_container_width=True)
+        span = st.selectbox("Histogram", [row["span"] for row in spans], key="debug_span")
+        st.bar_chart(pd.DataFrame(histogram(span), columns=["Latency", "Count"]).set_index("Latency"), height=200)
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Profile One Rerun"):
+            st.session_state.profile_next_run = True
+            st.rerun()
+    with col2:
+        if st.button("Reset Timings"):
+            reset_timings()
+    profile = last_profile()
+    if profile:
+        with st.expander(f"cProfile: {profile[0]}"):
+            st.code(profile[1])
+
+# Prometheus-style /metrics on METRICS_PORT, one server per process
+@st.cache_resource
+def get_metrics_server():
+    port = get_config("METRICS_PORT")
+    return start_metrics_server(int(port)) if port else None
+
+get_metrics_server()
+
 # Sidebar for navigation
 with st.sidebar:
     st.title("Expense Manager")
@@ -130,8 +189,534 @@ with st.sidebar:
     - Split expenses among friends
     - Track your monthly spending
     """)
+    
+    # Hidden debug panel: open the app with ?debug=1
+    if st.query_params.get("debug"):
+        st.markdown("---")
+        show_debug_panel()
+
+# AI insights run in a shared background service with a response cache
+AI_TIMEOUT = 60  # seconds
+
+@st.cache_resource
+def get_insights_service():
+    return InsightsService(lambda: get_genai().GenerativeModel("gemini-1.5-flash"))
+
+@st.fragment(run_every=1)
+def poll_insights():
+    # Rerun the page once the pending AI request finishes or times out
+    request = st.session_state.insights_request
+    if request["future"].done() or time.monotonic() - request["started"] > AI_TIMEOUT:
+        st.rerun()
+    st.info("Generating AI insights...")
+
+# Razorpay orders are created through one shared orchestrator; their
+# state is kept in storage, so other workers and restarts see it too
+@st.cache_resource
+def get_payments():
+    return PaymentOrchestrator(get_razorpay_client, get_storage())
 
 # EXPENSE SPLITTER FEATURE
+# Each tab is a fragment: a widget change inside a tab only reruns that tab.
+# Changes to the group's data rerun the whole page so every tab sees them.
+
+def cached_view(group, name, key, build):
+    # Views derived from a group are rebuilt only when `key` changes
+    views = group.setdefault("views", {})
+    entry = views.get(name)
+    if entry is None or entry[0] != key:
+        with timed(f"View {name}"):
+            entry = views[name] = (key, build())
+    return entry[1]
+
+# Events shown in the Balances tab's history
+HISTORY_EVENTS = 50
+
+# Balances are shown and settled in one currency per group, picked on the
+# page; expenses in other currencies are converted at their dates' rates
+def settlement_currency(selected_group):
+    return st.session_state.get(f"settlement_currency_{selected_group}", HOME_CURRENCY)
+
+# Views of the balances change with the group's stored version (which,
+# unlike the in-memory ledger's, survives reloads), the currency and the FX table
+def balances_key(group, currency):
+    return (group["version"], currency, load_rates().source)
+
+# Outstanding balances; recorded payments are applied in the ledger itself
+def current_balances(group, currency=HOME_CURRENCY):
+    rates = load_rates()
+    return cached_view(
+        group, "balances", balances_key(group, currency), lambda: converted_balances(group, currency, rates)
+    )
+
+def settlement_balances(selected_group, group):
+    # None (with the reason shown) if the FX table can't convert some expense
+    try:
+        return current_balances(group, settlement_currency(selected_group))
+    except ValueError as e:
+        st.error(f"Can't convert balances to {settlement_currency(selected_group)}: {e}")
+        return None
+
+def amount_format(currency):
+    return f"%.{minor_units(currency)}f"
+
+def rerun_with_message(key, message, kind="success"):
+    # The message is shown once, after the page has rerun
+    st.session_state[f"flash_{key}"] = (kind, message)
+    st.rerun()
+
+def show_message(key):
+    flash = st.session_state.pop(f"flash_{key}", None)
+    if flash:
+        st.markdown(f"<div class='{flash[0]}-msg'>{flash[1]}</div>", unsafe_allow_html=True)
+
+# Groups are shared: storage writes return the group's new version
+# and loaded groups are kept in the compact model (see model.py)
+def reload_group(selected_group):
+    st.session_state.groups[selected_group] = compact_group(storage.load_group(selected_group))
+
+def apply_write(selected_group, group, version, apply):
+    # Apply our change locally if nobody else wrote in between; otherwise
+    # reload the group, which already includes our change
+    if version == group["version"] + 1:
+        apply()
+        group["version"] = version
+    else:
+        reload_group(selected_group)
+
+def conflict_message(key, selected_group):
+    reload_group(selected_group)
+    rerun_with_message(key, "Someone else changed this group; it has been reloaded. Please try again.", "warning")
+
+@st.fragment
+@timed("Members")
+def members_tab(selected_group, group):
+    members = group["members"]
+    st.markdown("<h3 class='sub-header'>Add Members</h3>", unsafe_allow_html=True)
+    new_member = st.text_input("Add Member Name:", key="new_member_input")
+    if st.button("Add Member"):
+        if new_member and new_member not in members:
+            version = storage.add_member(selected_group, new_member)
+            apply_write(selected_group, group, version, lambda: add_member(group, new_member))
+            rerun_with_message("members", f"{new_member} added to {selected_group}!")
+    show_message("members")
+    
+    if members:
+        st.markdown("#### Current Members")
+        for i, member in enumerate(members):
+            st.write(f"{i+1}. {member}")
+
+# Split modes offered when adding an expense (see splits.py)
+SPLIT_MODES = {"Equally": EQUAL, "By Percentage": WEIGHTED, "By Shares": SHARES, "Exact Amounts": EXACT}
+
+def split_weights(selected_group, split_mode, split_among, currency):
+    # One input per member of the split, converted to the spec's units
+    if split_mode == EQUAL or not split_among:
+        return None
+    columns = st.columns(min(len(split_among), 4))
+    default_percents = split_paise(BASIS_POINTS, len(split_among))  # adds up to exactly 100%
+    weights = []
+    for i, member in enumerate(split_among):
+        key = f"split_{split_mode}_{selected_group}_{member}"
+        with columns[i % len(columns)]:
+            if split_mode == WEIGHTED:
+                percent = st.number_input(f"{member} (%)", min_value=0.0, max_value=100.0,
+                                          value=default_percents[i] / 100, format="%.2f", key=key)
+                weights.append(round(percent * 100))  # basis points
+            elif split_mode == SHARES:
+                weights.append(st.number_input(f"{member} (shares)", min_value=1, value=1, step=1, key=key))
+            else:
+                amount = st.number_input(f"{member} ({currency})", min_value=0.0, format=amount_format(currency), key=key)
+                weights.append(to_minor(amount, currency))
+    return weights
+
+@st.fragment
+@timed("Add Expense")
+def add_expense_tab(selected_group, group):
+    members = group["members"]
+    expenses = group["expenses"]
+    st.markdown("<h3 class='sub-header'>Add New Expense</h3>", unsafe_allow_html=True)
+    description = st.text_input("Expense Description:")
+    col1, col2, col3 = st.columns([2, 1, 1])
+    currencies = load_rates().currencies
+    with col2:
+        base = settlement_currency(selected_group)
+        currency = st.selectbox(
+            "Currency", currencies, index=currencies.index(base) if base in currencies else 0,
+            key=f"expense_currency_{selected_group}"
+        )
+    with col3:
+        spent_on = st.date_input("Date", value=date.today(), key=f"expense_date_{selected_group}")
+    with col1:
+        amount = st.number_input(f"Amount ({currency})", min_value=0.0, format=amount_format(currency))
+    paid_by = st.selectbox("Paid By:", members if members else ["No Members Yet"])
+    split_among = st.multiselect("Split Among:", members, default=members)
+    split_mode = SPLIT_MODES[st.radio("Split:", list(SPLIT_MODES), horizontal=True, key=f"split_mode_{selected_group}")]
+    weights = split_weights(selected_group, split_mode, split_among, currency)
+    
+    if st.button("Add Expense"):
+        if members and paid_by in members and split_among:
+            amount_minor = to_minor(amount, currency)
+            try:
+                if amount_minor <= 0:
+                    raise ValueError("Enter an amount greater than zero.")
+                split = encode(members, split_among, split_mode, weights)
+                validate(split, amount_minor, len(members), currency)
+            except ValueError as e:
+                st.warning(str(e))
+            else:
+                expense = {
+                    "desc": description, "amount_minor": amount_minor, "paid_by": paid_by, "split": split,
+                    "currency": currency, "date": spent_on.isoformat(),
+                }
+                version = storage.add_expenses(selected_group, [expense])
+                apply_write(selected_group, group, version, lambda: add_expense(group, expense))
+                rerun_with_message("expenses", "Expense Added!")
+    show_message("expenses")
+    
+    # Bulk import (validated in chunks, inserted in one batch)
+    with st.expander("Bulk Import Expenses"):
+        st.caption("CSV or Parquet with desc, amount, paid_by and split_among columns "
+                   "(split members separated by ';', empty for everyone), and optionally "
+                   "currency (INR if empty) and date (YYYY-MM-DD) columns.")
+        upload = st.file_uploader("Expense File", type=["csv", "parquet"], key=f"import_{selected_group}")
+        if upload is not None and st.button("Import Expenses"):
+            fmt = "parquet" if upload.name.endswith(".parquet") else "csv"
+            try:
+                new_expenses, errors = import_group_expenses(upload, fmt, members)
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                if new_expenses:
+                    version = storage.add_expenses(selected_group, new_expenses)
+                    apply_write(selected_group, group, version, lambda: add_expenses(group, new_expenses))
+                st.session_state.import_result = (selected_group, len(new_expenses), errors)
+                st.rerun()
+        result = st.session_state.get("import_result")
+        if result and result[0] == selected_group:
+            st.success(f"Imported {result[1]} expenses.")
+            if result[2]:
+                st.warning(f"Skipped {len(result[2])} invalid rows.")
+                st.dataframe(pd.DataFrame(result[2][:1000], columns=["Row", "Problem"]), use_container_width=True)
+    
+    # Show Expenses
+    if expenses:
+        st.markdown("#### Expense List")
+        # Only the visible page is built and sent to the browser; mixed
+        # currencies sort by their amount in the settlement currency
+        def build_index():
+            sort_amounts = None
+            if len(expenses.currency_names) > 1:
+                try:
+                    sort_amounts = load_rates().convert_table(expenses, settlement_currency(selected_group))
+                except ValueError:
+                    pass  # no rate for some expense: sort by the amounts as entered
+            return ExpenseIndex(expenses, members, sort_amounts)
+        index = cached_view(
+            group, "expense_index", balances_key(group, settlement_currency(selected_group)), build_index
+        )
+        page_positions = paginated_expense_table(f"expense_list_{selected_group}", index, members)
+        
+        # Download option (generated only on request)
+        lazy_download_button(
+            "Expense Sheet",
+            key=f"expenses_{selected_group}",
+            file_stem=f"{selected_group}_expenses",
+            columns=["desc", "amount", "currency", "date", "paid_by", "split_among", "split"],
+            make_rows=lambda: (
+                (
+                    e.desc, to_major(e.amount_minor, e.currency), e.currency, e.date, members[e.payer],
+                    split_members(e.split, members), describe_split(e.split, members, e.currency)
+                )
+                for e in expenses
+            ),
+            content=(selected_group, group["version"]),
+            cache=st.session_state.exports
+        )
+        
+        # Remove an expense shown on the current page (ledger is updated incrementally)
+        remove_idx = st.selectbox(
+            "Remove Expense:",
+            page_positions.tolist(),
+            format_func=lambda i: (
+                f"{i+1}. {expenses.descs[i]} "
+                f"({format_money(expenses.amounts[i], expenses.currency_names[expenses.currencies[i]])})"
+            )
+        )
+        if st.button("Remove Expense") and remove_idx is not None:
+            # Only remove what this user saw: rejected if the group changed meanwhile
+            # (KeyError: someone else already removed it)
+            try:
+                version = storage.delete_expense(
+                    selected_group, expenses.ids[remove_idx], expected_version=group["version"]
+                )
+            except (KeyError, VersionConflict):
+                conflict_message("expenses", selected_group)
+            apply_write(selected_group, group, version, lambda: delete_expense(group, remove_idx))
+            st.rerun()
+
+@st.fragment
+@timed("Balances")
+def balances_tab(selected_group, group):
+    members = group["members"]
+    st.markdown("<h3 class='sub-header'>Balance Sheet</h3>", unsafe_allow_html=True)
+    
+    if not members or not group["expenses"]:
+        st.warning("Add members and expenses to see the balance sheet.")
+        return
+    
+    # Outstanding balances, net of recorded payments, in the settlement currency
+    balances = settlement_balances(selected_group, group)
+    if balances is None:
+        return
+    currency = settlement_currency(selected_group)
+    view_key = balances_key(group, currency)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("#### Who needs to pay")
+        for person, balance in balances.items():
+            if balance < 0:
+                st.warning(f"{person} needs to pay {format_money(-balance, currency)}")
+            elif balance == 0:
+                st.info(f"{person} is settled up.")
+    
+    with col2:
+        st.markdown("#### Who will receive")
+        for person, balance in balances.items():
+            if balance > 0:
+                st.success(f"{person} will receive {format_money(balance, currency)}")
+    
+    # Balance table
+    def build_frame():
+        df_balances = pd.DataFrame(list(balances.items()), columns=["Member", f"Balance ({currency})"])
+        df_balances[f"Balance ({currency})"] = df_balances[f"Balance ({currency})"] / 10 ** minor_units(currency)
+        df_balances.index = df_balances.index + 1
+        return df_balances
+    st.dataframe(cached_view(group, "balance_frame", view_key, build_frame), use_container_width=True)
+    
+    # Download option (generated only on request)
+    lazy_download_button(
+        "Balance Sheet",
+        key=f"balances_{selected_group}",
+        file_stem=f"{selected_group}_balances",
+        columns=["Member", "Balance", "Currency"],
+        make_rows=lambda: ((member, to_major(balance, currency), currency) for member, balance in balances.items()),
+        content=(selected_group, *view_key),
+        cache=st.session_state.exports
+    )
+    
+    # Visualize balances with controlled width
+    st.markdown("#### Balance Visualization")
+    chart_data = cached_view(group, "balance_chart", view_key, lambda: pd.DataFrame({
+        "Members": list(balances.keys()),
+        "Balances": [to_major(b, currency) for b in balances.values()]
+    }).set_index("Members"))
+    container = st.container()
+    with container:
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            st.bar_chart(chart_data, width=400)
+        
+        # Leaderboard in the right column
+        with col2:
+            st.markdown("#### Leaderboard")
+            sorted_balances = sorted(balances.items(), key=lambda x: x[1], reverse=True)
+            for idx, (member, balance) in enumerate(sorted_balances):
+                if idx == 0:
+                    st.markdown(f"🥇 **Top Contributor**: {member} ({format_money(balance, currency)})")
+                else:
+                    st.write(f"#{idx+1}: {member} ({format_money(balance, currency)})")
+    
+    # Payments recorded against the balances (see the Payments tab)
+    if group["payments"]:
+        st.markdown("#### Recorded Payments")
+        df_payments = pd.DataFrame(group["payments"])
+        df_payments["amount"] = [to_major(a, c) for a, c in zip(df_payments["amount_minor"], df_payments["currency"])]
+        st.dataframe(
+            df_payments[["payer", "payee", "amount", "currency", "date", "order_id"]].iloc[::-1],
+            hide_index=True,
+            use_container_width=True
+        )
+    
+    # Audit trail and point-in-time balances from the group's event log
+    if st.toggle("Show History", key=f"history_{selected_group}"):
+        events = storage.group_history(selected_group, since=max(0, group["version"] - HISTORY_EVENTS))
+        st.markdown("#### Recent Changes")
+        st.dataframe(
+            pd.DataFrame(
+                [(e["seq"], datetime.fromtimestamp(e["created_at"]), describe(e["kind"], e["payload"])) for e in reversed(events)],
+                columns=["Version", "Time", "Change"]
+            ),
+            hide_index=True,
+            use_container_width=True
+        )
+        at_version = st.number_input(
+            "Balances as of version",
+            min_value=0,
+            max_value=group["version"],
+            value=group["version"],
+            key=f"history_version_{selected_group}"
+        )
+        try:
+            past = cached_view(group, "past_group", at_version, lambda: storage.group_at(selected_group, version=at_version))
+        except ValueError as e:
+            st.info(str(e))
+        else:
+            # Past balances per currency, as the ledger kept them
+            df_past = pd.DataFrame(
+                {
+                    f"Balance ({c})": {m: to_major(b, c) for m, b in book.items()}
+                    for c, book in past["balances"].items()
+                },
+                index=past["members"]
+            )
+            st.dataframe(df_past.rename_axis("Member"), use_container_width=True)
+
+@st.fragment
+@timed("Payments")
+def payments_tab(selected_group, group):
+    st.markdown("<h3 class='sub-header'>Process Payments</h3>", unsafe_allow_html=True)
+    
+    # Minimal list of transfers that settles the group, in the settlement currency
+    balances = settlement_balances(selected_group, group)
+    if balances is None:
+        return
+    currency = settlement_currency(selected_group)
+    transfers = cached_view(group, "transfers", balances_key(group, currency), lambda: settle(balances))
+    if transfers:
+        st.markdown("#### Suggested Settlements")
+        for payer, payee, transfer_amount in transfers:
+            st.write(f"{payer} pays {payee} {format_money(transfer_amount, currency)}")
+    
+    # Razorpay Integration (if API keys are available)
+    if RAZORPAY_KEY and RAZORPAY_SECRET:
+        # Prefill payee and amount from the settlement plan
+        transfer_idx = st.selectbox(
+            "Settlement:",
+            range(len(transfers)) if transfers else [None],
+            format_func=lambda i: "No one to pay" if i is None else f"{transfers[i][0]} → {transfers[i][1]}"
+        )
+        pay_to = "No one to pay" if transfer_idx is None else transfers[transfer_idx][1]
+        pay_amount = st.number_input(
+            f"Amount to Pay ({currency})",
+            min_value=0.0,
+            value=0.0 if transfer_idx is None else to_major(transfers[transfer_idx][2], currency),
+            format=amount_format(currency),
+            key=f"pay_amount_{currency}_{transfer_idx}"
+        )
+        
+        # Orders carry a receipt id derived from the transfer, so repeated
+        # clicks return the existing order instead of creating a new one
+        if st.button("Pay Now"):
+            if pay_to != "No one to pay" and pay_amount > 0:
+                order = get_payments().create_order(
+                    selected_group, group["version"], transfers[transfer_idx][0], pay_to,
+                    to_minor(pay_amount, currency), currency
+                )
+                if order["order_id"]:
+                    st.success(f"Payment Link (Order ID): {order['order_id']}")
+                elif order["error"]:
+                    st.error(f"Payment error: {order['error']}")
+                else:
+                    st.info("Payment order is being created...")
+            else:
+                st.warning("Please select a valid payee and amount.")
+        
+        if transfers and st.button("Create Orders for All Settlements"):
+            get_payments().settle(selected_group, group["version"], transfers, currency)
+        
+        orders = get_payments().orders(selected_group)
+        if orders:
+            st.markdown("#### Payment Orders")
+            df_orders = pd.DataFrame(orders)
+            df_orders["amount"] = [to_major(a, c) for a, c in zip(df_orders["amount_minor"], df_orders["currency"])]
+            st.dataframe(
+                df_orders[["payer", "payee", "amount", "currency", "state", "order_id", "receipt", "error"]],
+                use_container_width=True
+            )
+    else:
+        st.info("Razorpay payment integration requires API keys.")
+    
+    # Record money that changed hands; a partial payment leaves the rest outstanding
+    members = group["members"]
+    if len(members) >= 2:
+        st.markdown("#### Record a Payment")
+        show_message("payments")
+        payer_idx, payee_idx = (members.index(transfers[0][0]), members.index(transfers[0][1])) if transfers else (0, 1)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            payer = st.selectbox("From", members, index=payer_idx, key=f"record_payer_{selected_group}")
+        with col2:
+            payee = st.selectbox("To", members, index=payee_idx, key=f"record_payee_{selected_group}")
+        with col3:
+            amount = st.number_input(
+                f"Amount Paid ({currency})", min_value=0.0, format=amount_format(currency),
+                key=f"record_amount_{selected_group}"
+            )
+        order_ids = []
+        if RAZORPAY_KEY and RAZORPAY_SECRET:
+            order_ids = [
+                order["order_id"] for order in get_payments().orders(selected_group)
+                if order["order_id"] and order["payer"] == payer and order["payee"] == payee
+                and order["currency"] == currency
+            ]
+        order_id = st.selectbox(
+            "Razorpay Order",
+            [None] + order_ids,
+            format_func=lambda o: "None (paid outside the app)" if o is None else o,
+            key=f"record_order_{selected_group}"
+        )
+        if st.button("Record Payment"):
+            if payer != payee and amount > 0:
+                # Recorded in the settlement currency, at today's rate
+                payment = {
+                    "payer": payer, "payee": payee, "amount_minor": to_minor(amount, currency), "order_id": order_id,
+                    "currency": currency, "date": date.today().isoformat(),
+                }
+                version = storage.add_payment(selected_group, payment)
+                apply_write(selected_group, group, version, lambda: add_payment(group, payment))
+                rerun_with_message(
+                    "payments", f"Recorded {payer} → {payee} {format_money(payment['amount_minor'], currency)}."
+                )
+            else:
+                st.warning("Choose two different members and an amount greater than zero.")
+
+@st.fragment
+@timed("AI Insights")
+def insights_tab(selected_group, group):
+    st.markdown("<h3 class='sub-header'>AI Insights</h3>", unsafe_allow_html=True)
+    
+    if GENAI_API_KEY and group["expenses"]:
+        if st.button("Get AI Suggestions"):
+            # Send a compact summary, not the raw expenses; runs off the script thread
+            balances = settlement_balances(selected_group, group)
+            if balances is None:
+                return
+            currency = settlement_currency(selected_group)
+            summary = summarize_group(group, balances, currency, load_rates())
+            st.session_state.insights_request = {
+                "group": selected_group,
+                "future": get_insights_service().request(summary),
+                "started": time.monotonic()
+            }
+        
+        request = st.session_state.get("insights_request")
+        if request and request["group"] == selected_group:
+            future = request["future"]
+            if future.done():
+                try:
+                    st.write(future.result())
+                except Exception as e:
+                    st.error(f"AI error: {str(e)}")
+            elif time.monotonic() - request["started"] > AI_TIMEOUT:
+                st.error("AI request timed out. Please try again.")
+            else:
+                poll_insights()
+    else:
+        st.info("AI insights require Google API key to be configured.")
+
+@timed("Expense Splitter")
 def show_expense_splitter():
     st.markdown("<h1 class='main-header'>💰 Smart Expense Splitter</h1>", unsafe_allow_html=True)
     
@@ -141,212 +726,275 @@ def show_expense_splitter():
         st.markdown("<div class='card'>", unsafe_allow_html=True)
         group_name = st.text_input("Enter Group Name:")
         if st.button("Create Group"):
-            if group_name:
-                st.session_state.groups[group_name] = {
-                    "members": [],
-                    "expenses": [],
-                    "paid_status": {}
-                }
+            if group_name and group_name not in st.session_state.groups:
+                storage.create_group(group_name)
+                st.session_state.groups[group_name] = None  # Loaded when selected
                 st.markdown("<div class='success-msg'>Group created successfully!</div>", unsafe_allow_html=True)
         st.markdown("</div>", unsafe_allow_html=True)
     
+    # Pick up groups created by other users
+    with timed("Group List"):
+        for name in storage.list_groups():
+            st.session_state.groups.setdefault(name, None)
+    
     if not st.session_state.groups:
         st.warning("No groups created yet. Create a group to get started!")
         return
     
     selected_group = st.selectbox("Select Group:", list(st.session_state.groups.keys()))
-    members = st.session_state.groups[selected_group]["members"]
-    expenses = st.session_state.groups[selected_group]["expenses"]
-    paid_status = st.session_state.groups[selected_group]["paid_status"]
+    group = st.session_state.groups[selected_group]
+    with timed("Group Sync"):
+        if group is None or storage.group_version(selected_group) != group["version"]:
+            # First view, or someone else changed the group since it was loaded
+            with timed("Group Load"):
+                group = st.session_state.groups[selected_group] = compact_group(storage.load_group(selected_group))
+    
+    # Balances, settlements and payments use one currency; expenses in
+    # other currencies are converted with the FX table (see fx.py)
+    currencies = load_rates().currencies
+    st.selectbox(
+        "Settlement Currency:",
+        currencies,
+        index=currencies.index(HOME_CURRENCY) if HOME_CURRENCY in currencies else 0,
+        key=f"settlement_currency_{selected_group}"
+    )
     
     # Group Management Section - Using tabs without extra spacing
     tab1, tab2, tab3, tab4, tab5 = st.tabs(["👥 Members", "➕ Add Expense", "📊 Balances", "💳 Payments", "🔍 AI Insights"])
     
     with tab1:
-        st.markdown("<h3 class='sub-header'>Add Members</h3>", unsafe_allow_html=True)
-        new_member = st.text_input("Add Member Name:", key="new_member_input")
-        if st.button("Add Member"):
-            if new_member and new_member not in members:
-                members.append(new_member)
-                paid_status[new_member] = False  # Default unpaid
-                st.markdown(f"<div class='success-msg'>{new_member} added to {selected_group}!</div>", unsafe_allow_html=True)
-        
-        if members:
-            st.markdown("#### Current Members")
-            for i, member in enumerate(members):
-                st.write(f"{i+1}. {member}")
-    
+        members_tab(selected_group, group)
     with tab2:
-        st.markdown("<h3 class='sub-header'>Add New Expense</h3>", unsafe_allow_html=True)
-        description = st.text_input("Expense Description:")
-        amount = st.number_input("Amount (₹)", min_value=0.0, format="%.2f")
-        paid_by = st.selectbox("Paid By:", members if members else ["No Members Yet"])
-        split_among = st.multiselect("Split Among:", members, default=members)
-        
-        if st.button("Add Expense"):
-            if members and paid_by in members and split_among:
-                expenses.append({
-                    "desc": description,
-                    "amount": round(amount, 2),
-                    "paid_by": paid_by,
-                    "split_among": split_among
-                })
-                st.markdown("<div class='success-msg'>Expense Added!</div>", unsafe_allow_html=True)
-        
-        # Show Expenses
-        if expenses:
-            st.markdown("#### Expense List")
-            df_expenses = pd.DataFrame(expenses)
-            df_expenses.index = df_expenses.index + 1
-            st.dataframe(df_expenses, use_container_width=True)
-            
-            # Download option
-            expense_csv = df_expenses.to_csv(index=True).encode('utf-8')
-            st.download_button(
-                label="Download Expense CSV",
-                data=expense_csv,
-                file_name=f"{selected_group}_expenses.csv",
-                mime="text/csv"
-            )
-    
+        add_expense_tab(selected_group, group)
     with tab3:
-        st.markdown("<h3 class='sub-header'>Balance Sheet</h3>", unsafe_allow_html=True)
-        
-        if not members or not expenses:
-            st.warning("Add members and expenses to see the balance sheet.")
+        balances_tab(selected_group, group)
+    with tab4:
+        payments_tab(selected_group, group)
+    # Separate tab for AI Insights
+    with tab5:
+        insights_tab(selected_group, group)
+
+# MONTHLY EXPENSE TRACKER FEATURE
+@st.fragment
+@timed("Tracker Entry")
+def tracker_entry_panel(current_year, month_number):
+    st.markdown("<h3 class='sub-header'>Add New Expense</h3>", unsafe_allow_html=True)
+    
+    # Date Selection
+    selected_date = st.date_input("Select Date", 
+                                min_value=datetime(current_year, month_number, 1), 
+                                max_value=datetime(current_year, month_number, calendar.monthrange(current_year, month_number)[1]))
+    
+    # Expense Entry
+    expense_item = st.text_input("Expense Item", "")
+    expense_amount = st.number_input("Amount (₹)", min_value=0.0, format="%.2f")
+    
+    if st.button("Add Expense"):
+        if expense_item and expense_amount > 0:
+            storage.add_personal_expenses([(selected_date.strftime('%Y-%m-%d'), expense_item, to_paise(expense_amount))])
+            st.session_state.expenses.append(selected_date, expense_item, expense_amount)
+            rerun_with_message("tracker", "Expense added successfully!")  # Refresh to update calendar highlights
         else:
-            # Calculate balances
-            balances = {member: 0 for member in members}
-            for expense in expenses:
-                per_person = expense["amount"] / len(expense["split_among"])
-                for member in expense["split_among"]:
-                    if member != expense["paid_by"]:
-                        balances[member] -= per_person
-                        balances[expense["paid_by"]] += per_person
-            
-            # Mark payments section directly here
-            st.markdown("#### Mark as Paid")
-            for member in members:
-                paid_checkbox = st.checkbox(
-                    f"{member} has paid",
-                    value=paid_status.get(member, False),
-                    key=f"paid_{selected_group}_{member}"
+            st.warning("Please enter both an item name and an amount greater than zero.")
+    show_message("tracker")
+    
+    # Bulk import (validated in chunks, inserted in one batch)
+    with st.expander("Bulk Import Expenses"):
+        st.caption("CSV or Parquet with Date (YYYY-MM-DD), Item and Amount columns.")
+        upload = st.file_uploader("Expense File", type=["csv", "parquet"], key="import_tracker")
+        if upload is not None and st.button("Import Expenses"):
+            fmt = "parquet" if upload.name.endswith(".parquet") else "csv"
+            try:
+                rows, errors = import_personal_expenses(upload, fmt)
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                storage.add_personal_expenses(rows)
+                # Months not loaded yet will be read from storage when first viewed
+                loaded = st.session_state.loaded_months
+                st.session_state.expenses.extend(
+                    [row for row in rows if (int(row[0][:4]), int(row[0][5:7])) in loaded]
                 )
-                paid_status[member] = paid_checkbox
-            
-            # Apply paid status after checkboxes
-            for member in members:
-                if paid_status.get(member, False):
-                    balances[member] = 0
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                st.markdown("#### Who needs to pay")
-                for person, balance in balances.items():
-                    if balance < 0:
-                        st.warning(f"{person} needs to pay ₹{-balance:.2f}")
-                    elif balance == 0:
-                        st.info(f"{person} is settled up.")
-            
-            with col2:
-                st.markdown("#### Who will receive")
-                for person, balance in balances.items():
-                    if balance > 0:
-                        st.success(f"{person} will receive ₹{balance:.2f}")
-            
-            # Balance table
-            df_balances = pd.DataFrame(list(balances.items()), columns=["Member", "Balance"])
-            df_balances["Balance"] = df_balances["Balance"].round(2)
-            df_balances.index = df_balances.index + 1
-            st.dataframe(df_balances, use_container_width=True)
-            
-            # Download option
-            balance_csv = df_balances.to_csv(index=True).encode('utf-8')
-            st.download_button(
-                label="Download Balance CSV",
-                data=balance_csv,
-                file_name=f"{selected_group}_balances.csv",
-                mime="text/csv"
-            )
-            
-            # Visualize balances with controlled width
-            st.markdown("#### Balance Visualization")
-            chart_data = pd.DataFrame({
-                "Members": list(balances.keys()),
-                "Balances": list(balances.values())
-            })
-            container = st.container()
-            with container:
-                col1, col2 = st.columns([2, 1])
-                with col1:
-                    st.bar_chart(chart_data.set_index("Members"), width=400)
-                
-                # Leaderboard in the right column
-                with col2:
-                    st.markdown("#### Leaderboard")
-                    sorted_balances = sorted(balances.items(), key=lambda x: x[1], reverse=True)
-                    for idx, (member, balance) in enumerate(sorted_balances):
-                        if idx == 0:
-                            st.markdown(f"🥇 **Top Contributor**: {member} (₹{balance:.2f})")
-                        else:
-                            st.write(f"#{idx+1}: {member} (₹{balance:.2f})")
+                st.session_state.tracker_import_result = (len(rows), errors)
+                st.rerun()
+        result = st.session_state.get("tracker_import_result")
+        if result:
+            st.success(f"Imported {result[0]} expenses.")
+            if result[1]:
+                st.warning(f"Skipped {len(result[1])} invalid rows.")
+                st.dataframe(pd.DataFrame(result[1][:1000], columns=["Row", "Problem"]), use_container_width=True)
+
+@st.fragment
+@timed("Tracker Calendar")
+def tracker_calendar_panel(selected_month, current_year, month_number):
+    st.markdown(f"<h3 class='sub-header'>Calendar for {selected_month} {current_year}</h3>", unsafe_allow_html=True)
     
-    with tab4:
-        st.markdown("<h3 class='sub-header'>Process Payments</h3>", unsafe_allow_html=True)
+    # Rebuilt only when the store changes; expense days and budget status
+    # come from the month's cached aggregates in the store
+    store = st.session_state.expenses
+    key = (current_year, month_number, store.version)
+    cached = st.session_state.get("calendar_html")
+    if cached is None or cached[0] != key:
+        over_budget = {}
+        for name, budget, spent, over_day in store.budget_status(current_year, month_number):
+            if over_day is not None:
+                over_budget.setdefault(over_day, []).append(budget_label(name))
+        cached = st.session_state.calendar_html = (
+            key, calendar_html(current_year, month_number, store.expense_days(current_year, month_number), over_budget)
+        )
+    st.markdown(cached[1], unsafe_allow_html=True)
+    for name, budget, spent, over_day in store.budget_status(current_year, month_number):
+        if over_day is not None:
+            st.warning(f"Over budget on {budget_label(name)}: spent {format_inr(spent)} of {format_inr(budget)} "
+                       f"(since the {ordinal(over_day)})")
+
+@st.fragment
+@timed("Tracker List")
+def tracker_list_panel(selected_month, current_year, month_number):
+    # Display Expenses for Selected Month
+    st.markdown(f"<h3 class='sub-header'>Expenses for {selected_month} {current_year}</h3>", unsafe_allow_html=True)
+    
+    filtered_expenses = st.session_state.expenses.month(current_year, month_number)
+    
+    if not filtered_expenses.empty:
+        st.dataframe(
+            filtered_expenses,
+            use_container_width=True,
+            column_config={"Date": st.column_config.DateColumn(format="YYYY-MM-DD")}
+        )
+        total_expenses = st.session_state.expenses.month_total(current_year, month_number)
+        st.markdown(f"### 💵 Total Expenses: {format_inr(total_expenses)}")
         
-        # Razorpay Integration (if API keys are available)
-        if RAZORPAY_KEY and RAZORPAY_SECRET:
-            # Calculate balances for dropdown
-            balances = {member: 0 for member in members}
-            for expense in expenses:
-                per_person = expense["amount"] / len(expense["split_among"])
-                for member in expense["split_among"]:
-                    if member != expense["paid_by"]:
-                        balances[member] -= per_person
-                        balances[expense["paid_by"]] += per_person
-            
-            # Apply paid status
-            for member in members:
-                if paid_status.get(member, False):
-                    balances[member] = 0
-            
-            pay_to = st.selectbox("Pay To:", [p for p in balances if balances[p] > 0] or ["No one to pay"])
-            pay_amount = st.number_input("Amount to Pay (₹)", min_value=0.0, format="%.2f", key="pay_amount")
-            
-            if st.button("Pay Now"):
-                if pay_to != "No one to pay" and pay_amount > 0:
-                    try:
-                        payment = razorpay_client.order.create({
-                            "amount": int(pay_amount * 100),  # Convert to paise
-                            "currency": "INR",
-                            "payment_capture": "1"
-                        })
-                        st.success(f"Payment Link (Order ID): {payment['id']}")
-                    except Exception as e:
-                        st.error(f"Payment error: {str(e)}")
-                else:
-                    st.warning("Please select a valid payee and amount.")
-        else:
-            st.info("Razorpay payment integration requires API keys.")
+        # Download option (generated only on request)
+        lazy_download_button(
+            "Expense Report",
+            key="expense_report",
+            file_stem=f"expenses_{selected_month}_{current_year}",
+            columns=["Date", "Item", "Category", "Amount"],
+            make_rows=lambda: zip(
+                filtered_expenses["Date"].dt.strftime("%Y-%m-%d"),
+                filtered_expenses["Item"],
+                filtered_expenses["Category"],
+                filtered_expenses["Amount"]
+            ),
+            content=(current_year, month_number, st.session_state.expenses.version),
+            cache=st.session_state.exports
+        )
+        
+        # Display top categories without the graph
+        st.markdown("#### Top Categories")
+        # Top 5 categories (or all if fewer) from the cached monthly rollup;
+        # items are tagged offline, so "Uber" and "Cab" add up as Transport
+        top_categories = st.session_state.expenses.top_categories(current_year, month_number, 5)
+        for i, (category, amount) in enumerate(top_categories):
+            if i == 0:
+                st.markdown(f"🥇 **Highest**: {category} ({format_inr(amount)})")
+            else:
+                st.write(f"#{i+1}: {category} ({format_inr(amount)})")
+    else:
+        st.info("No expenses recorded for this month. Add some expenses to see them here.")
+
+def budget_label(name):
+    return "All spending" if name == OVERALL else name
+
+def ordinal(day):
+    suffix = "th" if 10 <= day % 100 <= 20 else {1: "st", 2: "nd", 3: "rd"}.get(day % 10, "th")
+    return f"{day}{suffix}"
+
+@st.fragment
+@timed("Tracker Plans")
+def tracker_plans_panel(selected_month, current_year, month_number):
+    store = st.session_state.expenses
+    col1, col2 = st.columns(2)
     
-    # Separate tab for AI Insights
-    with tab5:
-        st.markdown("<h3 class='sub-header'>AI Insights</h3>", unsafe_allow_html=True)
+    # Recurring expenses are saved once as rules, not as a row per month
+    with col1:
+        st.markdown("<h3 class='sub-header'>Recurring Expenses</h3>", unsafe_allow_html=True)
+        item = st.text_input("Recurring Item", key="recurring_item")
+        amount = st.number_input("Recurring Amount (₹)", min_value=0.0, format="%.2f", key="recurring_amount")
+        repeat_col, every_col = st.columns(2)
+        with repeat_col:
+            frequency = st.selectbox("Repeats", FREQUENCIES, format_func=str.capitalize, key="recurring_frequency")
+        with every_col:
+            every = st.number_input("Every", min_value=1, value=1, step=1, key="recurring_every")
+        start_col, end_col = st.columns(2)
+        with start_col:
+            start = st.date_input("Starts", value=datetime(current_year, month_number, 1), key="recurring_start")
+        with end_col:
+            end = st.date_input("Ends (optional)", value=None, key="recurring_end")
+        if st.button("Add Recurring Expense"):
+            rule = {
+                "item": item.strip(), "amount_paise": to_paise(amount), "start": start.isoformat(),
+                "frequency": frequency, "every": int(every), "end": end.isoformat() if end else None,
+            }
+            try:
+                check_rule(rule)
+            except ValueError as e:
+                st.warning(str(e))
+            else:
+                storage.add_recurring_expense(rule)
+                store.set_recurring(store.recurring + [rule])
+                rerun_with_message("recurring", f"Added {describe_rule(rule)}.")
+        show_message("recurring")
         
-        if GENAI_API_KEY and expenses:
-            if st.button("Get AI Suggestions"):
-                try:
-                    model = genai.GenerativeModel("gemini-1.5-flash")
-                    response = model.generate_content(
-                        f"Analyze this expense data and generate a well-explained summary in Indian rupees:\n{expenses}"
-                    )
-                    st.write(response.text)
-                except Exception as e:
-                    st.error(f"AI error: {str(e)}")
+        rules = store.recurring
+        if rules:
+            st.dataframe(
+                pd.DataFrame(
+                    [(describe_rule(rule), to_rupees(rule["amount_paise"])) for rule in rules],
+                    columns=["Recurring Expense", "Amount"]
+                ),
+                hide_index=True,
+                use_container_width=True
+            )
+            remove_idx = st.selectbox(
+                "Remove Recurring Expense:", range(len(rules)), format_func=lambda i: describe_rule(rules[i]),
+                key="recurring_remove"
+            )
+            remove = rules[remove_idx]
+            if st.button("Remove Recurring Expense"):
+                storage.delete_recurring_expense(remove["id"])
+                store.set_recurring([rule for rule in rules if rule["id"] != remove["id"]])
+                rerun_with_message("recurring", f"Removed {remove['item']}.")
+    
+    # Monthly budgets per item or category (or for all spending), checked against this month
+    with col2:
+        st.markdown(f"<h3 class='sub-header'>Budgets for {selected_month}</h3>", unsafe_allow_html=True)
+        name = st.text_input("Budget For (item or category; empty for all spending)", key="budget_name").strip() or OVERALL
+        st.caption(f"Categories: {', '.join(get_classifier().categories)}")
+        limit = st.number_input("Monthly Budget (₹, 0 removes it)", min_value=0.0, format="%.2f", key="budget_amount")
+        if st.button("Set Budget"):
+            amount_paise = to_paise(limit) or None
+            budgets = store.budgets
+            for old in [old for old in budgets if budget_key(old) == budget_key(name)]:
+                del budgets[old]
+                if old != name:
+                    storage.set_budget(old, None)  # same budget, spelled differently
+            storage.set_budget(name, amount_paise)
+            if amount_paise:
+                budgets[name] = amount_paise
+            store.set_budgets(budgets)
+            rerun_with_message("budgets", f"Budget for {budget_label(name)} {'set' if amount_paise else 'removed'}.")
+        show_message("budgets")
+        
+        status = store.budget_status(current_year, month_number)
+        if status:
+            st.dataframe(
+                pd.DataFrame(
+                    [
+                        (budget_label(name), to_rupees(budget), to_rupees(spent), to_rupees(budget - spent),
+                         "Over" if spent > budget else "OK")
+                        for name, budget, spent, over_day in status
+                    ],
+                    columns=["Budget For", "Budget", "Spent", "Remaining", "Status"]
+                ),
+                hide_index=True,
+                use_container_width=True
+            )
         else:
-            st.info("AI insights require Google API key to be configured.")
+            st.info("No budgets set. Budgets apply to every month.")
 
-# MONTHLY EXPENSE TRACKER FEATURE
+@timed("Expense Tracker")
 def show_expense_tracker():
     st.markdown("<h1 class='main-header'>💸 Monthly Expense Tracker</h1>", unsafe_allow_html=True)
     
@@ -358,100 +1006,31 @@ def show_expense_tracker():
     month_number = month_names.index(selected_month) + 1
     current_year = datetime.now().year  # Use the current year
     
+    # Load the selected month from storage the first time it is viewed
+    if (current_year, month_number) not in st.session_state.loaded_months:
+        rows = storage.personal_expenses(current_year, month_number)
+        if rows:
+            st.session_state.expenses.extend(rows)
+        st.session_state.loaded_months.add((current_year, month_number))
+    
     # Layout
     col1, col2 = st.columns([1, 1])
     
     with col1:
-        st.markdown("<h3 class='sub-header'>Add New Expense</h3>", unsafe_allow_html=True)
-        
-        # Date Selection
-        selected_date = st.date_input("Select Date", 
-                                    min_value=datetime(current_year, month_number, 1), 
-                                    max_value=datetime(current_year, month_number, calendar.monthrange(current_year, month_number)[1]))
-        
-        # Expense Entry
-        expense_item = st.text_input("Expense Item", "")
-        expense_amount = st.number_input("Amount (₹)", min_value=0.0, format="%.2f")
-        
-        if st.button("Add Expense"):
-            if expense_item and expense_amount > 0:
-                new_expense = pd.DataFrame({
-                    "Date": [selected_date.strftime('%Y-%m-%d')], 
-                    "Item": [expense_item], 
-                    "Amount": [expense_amount]
-                })
-                st.session_state.expenses = pd.concat([st.session_state.expenses, new_expense], ignore_index=True)
-                st.markdown("<div class='success-msg'>Expense added successfully!</div>", unsafe_allow_html=True)
-                st.rerun()  # Refresh to update calendar highlights
-            else:
-                st.warning("Please enter both an item name and an amount greater than zero.")
+        tracker_entry_panel(current_year, month_number)
     
     with col2:
-        st.markdown(f"<h3 class='sub-header'>Calendar for {selected_month} {current_year}</h3>", unsafe_allow_html=True)
-        
-        # Get all recorded expense dates
-        expense_dates = st.session_state.expenses["Date"].tolist()
-        expense_dates = [datetime.strptime(date, "%Y-%m-%d").day for date in expense_dates 
-                        if date.startswith(f"{current_year}-{month_number:02d}")]
-        
-        # Generate a monthly calendar with highlighted expense dates
-        month_calendar = calendar.monthcalendar(current_year, month_number)
-        calendar_html = "<table style='width:100%; text-align:center; font-size:16px;'>"
-        
-        # Table headers
-        calendar_html += "<tr><th>Mon</th><th>Tue</th><th>Wed</th><th>Thu</th><th>Fri</th><th style='color:#e03131;'>Sat</th><th style='color:#e03131;'>Sun</th></tr>"
-        
-        # Populate calendar with highlighted days
-        for week in month_calendar:
-            calendar_html += "<tr>"
-            for day in week:
-                if day == 0:
-                    calendar_html += "<td></td>"  # Empty cell for padding
-                elif day in expense_dates:
-                    calendar_html += f"<td style='background-color:#8ce99a; border-radius: 5px; padding:8px;'>{day}</td>"  # Highlighted in light green
-                else:
-                    calendar_html += f"<td style='padding:8px;'>{day}</td>"
-            calendar_html += "</tr>"
-        
-        calendar_html += "</table>"
-        st.markdown(calendar_html, unsafe_allow_html=True)
-    
-    # Display Expenses for Selected Month
-    st.markdown(f"<h3 class='sub-header'>Expenses for {selected_month} {current_year}</h3>", unsafe_allow_html=True)
+        tracker_calendar_panel(selected_month, current_year, month_number)
     
-    filtered_expenses = st.session_state.expenses[st.session_state.expenses["Date"].str.startswith(f"{current_year}-{month_number:02d}")]
-    
-    if not filtered_expenses.empty:
-        st.dataframe(filtered_expenses, use_container_width=True)
-        total_expenses = filtered_expenses["Amount"].sum()
-        st.markdown(f"### 💵 Total Expenses: ₹{total_expenses:.2f}")
-        
-        # Download option
-        csv = filtered_expenses.to_csv(index=False).encode("utf-8")
-        st.download_button("Download Expense Report", csv, f"expenses_{selected_month}_{current_year}.csv", "text/csv")
-        
-        # Display top expenses without the graph
-        st.markdown("#### Top Expenses")
-        category_data = filtered_expenses.groupby("Item")["Amount"].sum().reset_index()
-        sorted_expenses = category_data.sort_values("Amount", ascending=False)
-        
-        # Display top 5 expenses (or all if less than 5)
-        num_to_display = min(5, len(sorted_expenses))
-        for i in range(num_to_display):
-            item = sorted_expenses.iloc[i]["Item"]
-            amount = sorted_expenses.iloc[i]["Amount"]
-            if i == 0:
-                st.markdown(f"🥇 **Highest**: {item} (₹{amount:.2f})")
-            else:
-                st.write(f"#{i+1}: {item} (₹{amount:.2f})")
-    else:
-        st.info("No expenses recorded for this month. Add some expenses to see them here.")
+    tracker_list_panel(selected_month, current_year, month_number)
+    tracker_plans_panel(selected_month, current_year, month_number)
 
-# Main app logic - show the selected feature
-if st.session_state.active_tab == "Expense Splitter":
-    show_expense_splitter()
-else:
-    show_expense_tracker()
+# Main app logic - show the selected feature (under cProfile if asked for in the debug panel)
+with profiled(st.session_state.active_tab, enabled=st.session_state.pop("profile_next_run", False)):
+    if st.session_state.active_tab == "Expense Splitter":
+        show_expense_splitter()
+    else:
+        show_expense_tracker()
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,97 @@
+"""The Tornado backend: JSON in and out, If-Match conflicts, and 400s for bad input."""
+import json
+
+from tornado.testing import AsyncHTTPTestCase
+
+from backend import make_app
+from storage import SQLiteStorage
+
+
+class BackendTest(AsyncHTTPTestCase):
+    def get_app(self):
+        self.storage = SQLiteStorage(":memory:")
+        return make_app(self.storage)
+
+    def tearDown(self):
+        super().tearDown()
+        self.storage.close()
+
+    def call(self, method, path, body=None, version=None):
+        headers = {} if version is None else {"If-Match": f'"{version}"'}
+        response = self.fetch(
+            path, method=method, headers=headers, body=None if body is None else json.dumps(body),
+            allow_nonstandard_methods=True,
+        )
+        is_json = response.headers.get("Content-Type", "").startswith("application/json")
+        return response.code, json.loads(response.body) if is_json else None
+
+    def group(self, *members):
+        self.call("POST", "/groups", {"name": "trip"})
+        for member in members:
+            self.call("POST", "/groups/trip/members", {"member": member})
+
+    def expense(self, **change):
+        return dict({"desc": "Dinner", "amount_minor": 1200, "paid_by": "A", "split": ["equal", 3, None]}, **change)
+
+    def test_expenses_round_trip(self):
+        self.group("A", "B")
+        code, reply = self.call("POST", "/groups/trip/expenses", {"expenses": [self.expense()]})
+        assert code == 200 and reply == {"version": 3, "ids": [1]}
+        code, group = self.call("GET", "/groups/trip")
+        assert code == 200
+        assert group["balances"] == {"INR": {"A": 600, "B": -600}}
+        assert self.fetch("/groups/trip").headers["ETag"] == '"3"'
+
+    def test_stale_if_match_is_a_conflict(self):
+        self.group("A", "B")
+        code, reply = self.call("POST", "/groups/trip/expenses", {"expenses": [self.expense()]}, version=1)
+        assert code == 409 and reply["version"] == 2
+        assert self.call("GET", "/groups/trip/version")[1] == {"version": 2}
+        code, reply = self.call("PUT", "/groups/trip/expenses/1", self.expense(), version=2)
+        assert code == 404  # nothing was written by the rejected request
+        code, reply = self.call("POST", "/groups/trip/expenses", {"expenses": [self.expense()]}, version=2)
+        assert code == 200 and reply["version"] == 3
+
+    def test_malformed_if_match_is_rejected(self):
+        self.group("A")
+        response = self.fetch("/groups/trip/members", method="POST", headers={"If-Match": "soon"}, body='{"member":"B"}')
+        assert response.code == 400
+
+    def test_malformed_bodies_are_rejected(self):
+        self.group("A", "B")
+        for body in [
+            self.expense(amount_minor=12.7),
+            self.expense(amount_minor="12"),
+            self.expense(amount_minor=True),
+            self.expense(amount_minor=-500),
+            self.expense(desc=None),
+            self.expense(paid_by="ghost"),
+            self.expense(split="everyone"),
+        ]:
+            assert self.call("POST", "/groups/trip/expenses", {"expenses": [body]})[0] == 400, body
+        for body in [{"name": ["x"]}, {"name": ""}]:
+            assert self.call("POST", "/groups", body)[0] == 400
+        assert self.call("POST", "/groups/trip/members", {"member": {"name": "C"}})[0] == 400
+        assert self.call("POST", "/groups/trip/payments", {"payer": "B", "payee": "A", "amount_minor": 1.5})[0] == 400
+        assert self.call("POST", "/groups/trip/payments", {"payer": "B", "payee": "ghost", "amount_minor": 100})[0] == 400
+        assert self.fetch("/groups", method="POST", body="[1]").code == 400
+        assert self.call("GET", "/groups/trip/version")[1] == {"version": 2}
+
+    def test_history_arguments_are_checked(self):
+        self.group("A", "B")
+        assert [event["seq"] for event in self.call("GET", "/groups/trip/events?since=1")[1]["events"]] == [2]
+        for query in ["since=x", "limit=-1", "limit=1.5"]:
+            assert self.fetch(f"/groups/trip/events?{query}").code == 400
+        assert self.fetch("/groups/nowhere/events").code == 404
+        assert self.call("GET", "/groups/trip/at?version=1")[1]["members"] == ["A"]
+
+    def test_unknown_expense_delete_writes_nothing(self):
+        self.group("A")
+        assert self.call("DELETE", "/groups/trip/expenses/99")[0] == 404
+        assert self.call("GET", "/groups/trip/version")[1] == {"version": 1}
+
+    def test_personal_rows_are_checked(self):
+        for row in [["2026-13-01", "Tea", 500], ["2026-10-01", "Tea", "500"], ["2026-10-01", "", 500], ["20261001", "Tea", 5]]:
+            assert self.call("POST", "/personal", {"rows": [row]})[0] == 400, row
+        assert self.call("POST", "/personal", {"rows": [["2026-10-01", "Tea", 500]]})[0] == 201
+        assert self.call("GET", "/personal/2026/10")[1] == {"rows": [["2026-10-01", "Tea", 500]]}
@@ -0,0 +1,91 @@
+"""Bulk import: bad rows are reported by number, bad headers reject the file."""
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from importer import import_group_expenses, import_personal_expenses
+from splits import encode
+
+MEMBERS = ["A", "B", "C"]
+
+
+def csv_file(text):
+    return io.BytesIO(text.encode())
+
+
+def test_group_rows_are_checked():
+    source = csv_file(
+        "desc,amount,paid_by,split_among,currency,date\n"
+        "Dinner,12.50,A,A;B,,2026-10-01\n"
+        "Cab,-3,A,,,\n"
+        "Tea,2,Z,,,\n"
+        "Hotel,80,B,A;Q,,\n"
+        "Snacks,abc,C,,,\n"
+        "Museum,10,C,,rupees,\n"
+        "Lunch,9,C,,USD,01/10/2026\n"
+        "Taxi,7,B,,usd,\n"
+    )
+    expenses, errors = import_group_expenses(source, "csv", MEMBERS)
+    assert errors == [
+        (2, "amount must be positive"),
+        (3, "paid_by is not a group member"),
+        (4, "split_among names someone who is not a group member"),
+        (5, "amount is missing or not a number"),
+        (6, "currency is not a currency code"),
+        (7, "date is not YYYY-MM-DD"),
+    ]
+    assert expenses == [
+        {"desc": "Dinner", "amount_minor": 1250, "paid_by": "A", "split": encode(MEMBERS, ["A", "B"]),
+         "currency": "INR", "date": "2026-10-01"},
+        {"desc": "Taxi", "amount_minor": 700, "paid_by": "B", "split": encode(MEMBERS, MEMBERS),
+         "currency": "USD", "date": None},
+    ]
+
+
+def test_missing_required_column_rejects_the_file():
+    with pytest.raises(ValueError, match="Missing required columns: paid_by"):
+        import_group_expenses(csv_file("desc,amount,split_among\nDinner,10,\n"), "csv", MEMBERS)
+    with pytest.raises(ValueError, match="Missing required columns: Amount"):
+        import_personal_expenses(csv_file("Date,Item\n2026-10-01,Tea\n"), "csv")
+
+
+def test_optional_columns_may_be_left_out(tmp_path):
+    path = tmp_path / "group.csv"
+    path.write_text("\ufeffdesc,amount,paid_by,split_among\nDinner,10,A,\n")
+    expenses, errors = import_group_expenses(str(path), "csv", MEMBERS)
+    assert errors == []
+    assert [(e["amount_minor"], e["currency"], e["date"]) for e in expenses] == [(1000, "INR", None)]
+
+
+def test_parquet_split_lists(tmp_path):
+    path = tmp_path / "group.parquet"
+    pq.write_table(pa.table({
+        "desc": ["Dinner", "Hotel"],
+        "amount": [30.0, 90.0],
+        "paid_by": ["A", "B"],
+        "split_among": [["B", "C"], []],
+    }), path)
+    expenses, errors = import_group_expenses(str(path), "parquet", MEMBERS)
+    assert errors == []
+    assert [e["split"] for e in expenses] == [encode(MEMBERS, ["B", "C"]), encode(MEMBERS, MEMBERS)]
+    with pytest.raises(ValueError, match="Missing required columns: Date, Item, Amount"):
+        import_personal_expenses(str(path), "parquet")
+
+
+def test_tracker_rows_are_checked():
+    rows, errors = import_personal_expenses(csv_file(
+        "Date,Item,Amount\n"
+        "2026-10-01,Tea,20\n"
+        "2026-10-32,Tea,20\n"
+        "2026-10-02,,20\n"
+        "2026-10-03,Lunch,0\n"
+        "2026-10-04, Metro ,45.5\n"
+    ), "csv")
+    assert rows == [("2026-10-01", "Tea", 2000), ("2026-10-04", "Metro", 4550)]
+    assert errors == [
+        (2, "Date is missing or not YYYY-MM-DD"),
+        (3, "Item is missing"),
+        (4, "Amount must be positive"),
+    ]
@@ -0,0 +1,92 @@
+"""InsightsService with a fake model: timeouts, the response cache and shared calls."""
+import threading
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from insights import InsightsService, summarize_group
+from model import compact_group
+from splits import EQUAL, everyone
+
+
+class FakeModel:
+    """Answers once `release` is set, counting the prompts it was sent."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.prompts = []
+
+    def generate_content(self, prompt):
+        self.prompts.append(prompt)
+        self.release.wait(5)
+        return type("Response", (), {"text": f"insight {len(self.prompts)}"})()
+
+
+@pytest.fixture
+def model():
+    model = FakeModel()
+    yield model
+    model.release.set()
+
+
+def test_slow_model_times_out_then_answers(model):
+    service = InsightsService(lambda: model)
+    summary = {"members": 2}
+    with pytest.raises(TimeoutError):
+        service.get(summary, timeout=0.05)
+    assert service.cached(summary) is None
+    model.release.set()
+    assert service.get(summary, timeout=5) == "insight 1"
+    assert service.cached(summary) == "insight 1"
+
+
+def test_unchanged_summary_is_answered_from_the_cache(model):
+    model.release.set()
+    service = InsightsService(lambda: model)
+    assert service.get({"members": 2, "currency": "INR"}, timeout=5) == "insight 1"
+    future = service.request({"currency": "INR", "members": 2})  # same summary, other key order
+    assert future.done() and future.result() == "insight 1"
+    assert service.get({"members": 3}, timeout=5) == "insight 2"
+    assert len(model.prompts) == 2
+
+
+def test_identical_requests_share_one_call(model):
+    service = InsightsService(lambda: model, max_workers=4)
+    futures = [service.request({"members": 2}) for _ in range(5)]
+    assert len(set(map(id, futures))) == 1
+    model.release.set()
+    assert [future.result(timeout=5) for future in futures] == ["insight 1"] * 5
+    assert len(model.prompts) == 1
+
+
+def test_failed_call_is_not_cached(model):
+    calls = []
+
+    def factory():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("no API key")
+        return model
+
+    model.release.set()
+    service = InsightsService(factory)
+    with pytest.raises(RuntimeError):
+        service.get({"members": 2}, timeout=5)
+    assert service.get({"members": 2}, timeout=5) == "insight 1"
+
+
+def test_summary_of_a_group():
+    group = compact_group({
+        "members": ["A", "B"],
+        "expenses": [
+            {"id": 1, "desc": "Uber", "amount_minor": 30000, "paid_by": "A", "split": [EQUAL, everyone(2), None]},
+            {"id": 2, "desc": "Dinner", "amount_minor": 10000, "paid_by": "B", "split": [EQUAL, everyone(2), None]},
+        ],
+        "payments": [{"payer": "B", "payee": "A", "amount_minor": 5000}],
+    })
+    summary = summarize_group(group, {"A": 5000, "B": -5000})
+    assert summary["total_spent"] == 400
+    assert summary["paid_by_member"] == {"A": 300, "B": 100}
+    assert summary["settled_so_far"] == 50
+    assert summary["top_categories"]["Transport"] == 300
+    assert summary["settlement_plan"] == [{"from": "B", "to": "A", "amount": 50}]
@@ -0,0 +1,123 @@
+"""Balances stay exact: every currency nets to zero and amounts round-trip."""
+import random
+from decimal import Decimal
+
+import pytest
+
+from ledger import BalanceLedger
+from model import Expense, ExpenseTable
+from money import split_paise, to_major, to_minor, to_paise, to_rupees
+from splits import BASIS_POINTS, EQUAL, EXACT, MODES, SHARES, WEIGHTED, member_ids, shares
+from vectorized import SCALAR_LIMIT, balances_by_currency
+
+CURRENCIES = ("INR", "USD", "JPY", "KWD")
+
+
+def random_weights(rng, count, total):
+    # `count` non-negative ints adding up to `total`
+    cuts = sorted(rng.randint(0, total) for _ in range(count - 1))
+    return [b - a for a, b in zip([0] + cuts, cuts + [total])]
+
+
+def random_expense(rng, member_count, expense_id):
+    amount = rng.randint(1, 10 ** rng.randint(1, 9))
+    mask = rng.randint(1, (1 << member_count) - 1)
+    count = len(member_ids(mask))
+    mode = rng.choice(MODES)
+    if mode == EQUAL:
+        weights = None
+    elif mode == WEIGHTED:
+        weights = [w + 1 for w in random_weights(rng, count, BASIS_POINTS - count)]
+    elif mode == SHARES:
+        weights = [rng.randint(1, 5) for _ in range(count)]
+    else:
+        weights = random_weights(rng, count, amount)
+    return Expense(
+        expense_id, f"Expense {expense_id}", amount, rng.randrange(member_count),
+        mode, mask, weights, rng.choice(CURRENCIES),
+    )
+
+
+def random_group(seed, expense_count):
+    rng = random.Random(seed)
+    members = [f"M{i}" for i in range(rng.randint(1, 12))]
+    expenses = [random_expense(rng, len(members), i + 1) for i in range(expense_count)]
+    payments = [
+        {"payer": rng.choice(members), "payee": rng.choice(members), "amount_minor": rng.randint(1, 10 ** 6),
+         "currency": rng.choice(CURRENCIES)}
+        for _ in range(rng.randint(0, 5))
+    ]
+    return members, expenses, payments
+
+
+def assert_nets_to_zero(ledger):
+    for currency, balances in ledger.balances.items():
+        assert sum(balances.values()) == 0, currency
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_random_group_balances_sum_to_zero(seed):
+    members, expenses, payments = random_group(seed, random.Random(seed).randint(0, 60))
+    ledger = BalanceLedger.from_expenses(members, expenses, payments)
+    assert_nets_to_zero(ledger)
+
+    rng = random.Random(seed)
+    for expense in expenses[: len(expenses) // 2]:
+        ledger.edit_expense(expense, random_expense(rng, len(members), expense.id))
+    for payment in payments:
+        ledger.remove_payment(payment)
+    assert_nets_to_zero(ledger)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_vectorized_balances_match_the_ledger(seed):
+    members, expenses, _ = random_group(seed, SCALAR_LIMIT + 100)
+    ledger = BalanceLedger()
+    ledger.members.extend(members)
+    for expense in expenses:
+        ledger.add_expense(expense)
+    books = balances_by_currency(ledger.members, ExpenseTable(expenses))
+    assert books == {currency: ledger.in_currency(currency) for currency in books}
+    for balances in books.values():
+        assert sum(balances.values()) == 0
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_shares_add_up_to_the_amount(seed):
+    rng = random.Random(seed)
+    for _ in range(100):
+        expense = random_expense(rng, rng.randint(1, 70), 1)
+        parts = shares(expense.split, expense.amount_minor)
+        assert sum(share for _, share in parts) == expense.amount_minor
+        assert [member_id for member_id, _ in parts] == list(member_ids(expense.mask))
+        if expense.mode == EXACT:
+            assert [share for _, share in parts] == list(expense.weights)
+
+
+def test_split_paise_gives_leftovers_to_the_first_shares():
+    assert split_paise(1000, 3) == [334, 333, 333]
+    assert split_paise(2, 3) == [1, 1, 0]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_rupees_and_paise_round_trip(seed):
+    rng = random.Random(seed)
+    for _ in range(1000):
+        paise = rng.randint(-10 ** 12, 10 ** 12)
+        assert to_paise(to_rupees(paise)) == paise
+        rupees = Decimal(paise).scaleb(-2)
+        assert to_paise(str(rupees)) == paise
+        assert to_paise(rupees) == paise
+
+
+@pytest.mark.parametrize("currency", CURRENCIES)
+def test_minor_units_round_trip(currency):
+    rng = random.Random(currency)
+    for _ in range(1000):
+        minor = rng.randint(-10 ** 12, 10 ** 12)
+        assert to_minor(to_major(minor, currency), currency) == minor
+
+
+def test_to_paise_rounds_half_up():
+    assert to_paise("10.005") == 1001
+    assert to_paise(0.1 + 0.2) == 30
@@ -0,0 +1,144 @@
+"""PaymentOrchestrator against a fake Razorpay client: retries, failures and no duplicate orders."""
+import threading
+
+import pytest
+
+from payments import CREATED, FAILED, PENDING, MemoryOrderStore, PaymentOrchestrator, receipt_id
+from storage import SQLiteStorage
+
+LOST = "lost"  # the order is created but the reply never arrives
+
+
+class FakeOrders:
+    """Razorpay's order API; `failures` are raised (or LOST) by the next create() calls."""
+
+    def __init__(self, failures=()):
+        self.created = []
+        self.failures = list(failures)
+        self.lock = threading.Lock()
+
+    def create(self, payload):
+        with self.lock:
+            failure = self.failures.pop(0) if self.failures else None
+            if isinstance(failure, Exception):
+                raise failure
+            order = {"id": f"order_{len(self.created) + 1}", "receipt": payload["receipt"], "amount": payload["amount"]}
+            self.created.append(order)
+        if failure == LOST:
+            raise OSError("connection reset")
+        return order
+
+    def all(self, options):
+        with self.lock:
+            return {"items": [order for order in self.created if order["receipt"] == options["receipt"]]}
+
+
+class FakeClient:
+    def __init__(self, orders):
+        self.order = orders
+
+
+def orchestrator(orders, store=None, **options):
+    return PaymentOrchestrator(lambda: FakeClient(orders), store, backoff=0, **options)
+
+
+def receipts(orders):
+    return [order["receipt"] for order in orders.created]
+
+
+def test_settle_creates_one_order_per_transfer():
+    orders = FakeOrders()
+    records = orchestrator(orders).settle("trip", 3, [("A", "B", 500), ("C", "B", 250)])
+    assert [(r["state"], r["order_id"], r["attempts"]) for r in records] == [(CREATED, "order_1", 1), (CREATED, "order_2", 1)]
+    assert sorted(receipts(orders)) == sorted(r["receipt"] for r in records)
+    assert records[0]["receipt"] == receipt_id("trip", 3, "A", "B", 500)
+
+
+def test_transient_errors_are_retried():
+    orders = FakeOrders([OSError("timeout")])
+    record = orchestrator(orders).create_order("trip", 1, "A", "B", 500)
+    assert (record["state"], record["attempts"]) == (CREATED, 2)
+    assert len(orders.created) == 1
+
+
+def test_non_retryable_errors_fail_until_settled_again():
+    orders = FakeOrders([ValueError("bad amount")])
+    payments = orchestrator(orders)
+    record = payments.create_order("trip", 1, "A", "B", 500)
+    assert (record["state"], record["error"], record["attempts"]) == (FAILED, "bad amount", 1)
+    record = payments.create_order("trip", 1, "A", "B", 500)
+    assert (record["state"], record["attempts"]) == (CREATED, 2)
+    assert len(orders.created) == 1
+
+
+def test_retries_run_out():
+    orders = FakeOrders([OSError("down")] * 3)
+    record = orchestrator(orders, retries=3).create_order("trip", 1, "A", "B", 500)
+    assert (record["state"], record["error"], record["attempts"]) == (FAILED, "down", 3)
+    assert orders.created == []
+
+
+def test_settling_twice_sends_nothing_new():
+    orders = FakeOrders()
+    payments = orchestrator(orders)
+    transfers = [("A", "B", 500), ("C", "B", 250)]
+    first = payments.settle("trip", 3, transfers)
+    assert payments.settle("trip", 3, transfers) == first
+    assert len(orders.created) == 2
+    payments.settle("trip", 4, transfers)  # a new version is a new plan
+    assert len(orders.created) == 4
+
+
+@pytest.mark.parametrize("failures", [[LOST], [LOST, LOST], [OSError("timeout"), LOST]])
+def test_lost_replies_do_not_duplicate_orders(failures):
+    orders = FakeOrders(failures)
+    record = orchestrator(orders).create_order("trip", 1, "A", "B", 500)
+    assert record["state"] == CREATED
+    assert receipts(orders) == [record["receipt"]]
+    assert record["order_id"] == orders.created[0]["id"]
+
+
+def test_lost_reply_found_by_a_later_settle():
+    orders = FakeOrders([LOST])
+    payments = orchestrator(orders, retries=1)
+    assert payments.create_order("trip", 1, "A", "B", 500)["state"] == FAILED
+    record = payments.create_order("trip", 1, "A", "B", 500)
+    assert (record["state"], record["order_id"]) == (CREATED, "order_1")
+    assert len(orders.created) == 1
+
+
+def test_orchestrators_sharing_storage(tmp_path):
+    store = SQLiteStorage(str(tmp_path / "expenses.db"))
+    store.create_group("trip")
+    orders = FakeOrders()
+    transfers = [("A", "B", 500), ("C", "B", 250)]
+    first = orchestrator(orders, store).settle("trip", 3, transfers)
+    second = orchestrator(orders, SQLiteStorage(str(tmp_path / "expenses.db"))).settle("trip", 3, transfers)
+    assert [r["order_id"] for r in second] == [r["order_id"] for r in first]
+    assert len(orders.created) == 2
+    assert [r["state"] for r in store.orders("trip")] == [CREATED, CREATED]
+    store.close()
+
+
+def test_pending_orders_are_left_alone_until_stale():
+    orders = FakeOrders()
+    store = MemoryOrderStore()
+    receipt = receipt_id("trip", 1, "A", "B", 500)
+    order = {"receipt": receipt, "payer": "A", "payee": "B", "amount_minor": 500, "currency": "INR"}
+    record, _ = store.claim_order("trip", order, stale_after=300)
+    # Another process claimed it, created the order and died before saving the reply
+    store.update_order("trip", dict(record, attempts=1))
+    orders.created.append({"id": "order_1", "receipt": receipt, "amount": 500})
+
+    assert orchestrator(orders, store).create_order("trip", 1, "A", "B", 500)["state"] == PENDING
+    record = orchestrator(orders, store, stale_after=0).create_order("trip", 1, "A", "B", 500)
+    assert (record["state"], record["order_id"], record["attempts"]) == (CREATED, "order_1", 2)
+    assert len(orders.created) == 1
+
+
+def test_client_factory_failure_fails_the_order():
+    def broken():
+        raise RuntimeError("no API key")
+
+    record = PaymentOrchestrator(broken, backoff=0).create_order("trip", 1, "A", "B", 500)
+    assert (record["state"], record["error"], record["attempts"]) == (FAILED, "no API key", 0)
@@ -0,0 +1,88 @@
+"""Recurring expense dates at month ends, and budgets in the tracker."""
+from datetime import date
+
+import pytest
+
+from expense_store import ExpenseStore
+from recurring import MONTHLY, OVERALL, WEEKLY, YEARLY, check_rule, occurrences
+
+
+def rule(start, frequency=MONTHLY, every=1, end=None, item="Rent", amount_paise=1500000):
+    return check_rule({
+        "id": 1, "item": item, "amount_paise": amount_paise, "start": start,
+        "frequency": frequency, "every": every, "end": end,
+    })
+
+
+@pytest.mark.parametrize("year, month, day", [
+    (2025, 1, 31), (2025, 2, 28), (2025, 4, 30), (2025, 12, 31), (2028, 2, 29),
+])
+def test_monthly_on_the_31st_falls_on_the_last_day(year, month, day):
+    assert occurrences(rule("2025-01-31"), year, month) == [date(year, month, day)]
+
+
+def test_yearly_from_a_leap_day():
+    leap = rule("2024-02-29", YEARLY)
+    assert occurrences(leap, 2025, 2) == [date(2025, 2, 28)]
+    assert occurrences(leap, 2028, 2) == [date(2028, 2, 29)]
+    assert occurrences(leap, 2025, 3) == []
+
+
+def test_weekly_across_a_month_boundary():
+    weekly = rule("2025-01-29", WEEKLY)
+    assert occurrences(weekly, 2025, 1) == [date(2025, 1, 29)]
+    assert occurrences(weekly, 2025, 2) == [date(2025, 2, day) for day in (5, 12, 19, 26)]
+    assert occurrences(weekly, 2024, 12) == []
+
+
+def test_every_other_period():
+    assert occurrences(rule("2025-01-15", every=2), 2025, 2) == []
+    assert occurrences(rule("2025-01-15", every=2), 2025, 3) == [date(2025, 3, 15)]
+    fortnightly = rule("2025-01-01", WEEKLY, every=2)
+    assert occurrences(fortnightly, 2025, 2) == [date(2025, 2, 12), date(2025, 2, 26)]
+
+
+def test_end_date_is_inclusive():
+    ending = rule("2025-01-31", end="2025-04-30")
+    assert occurrences(ending, 2025, 4) == [date(2025, 4, 30)]
+    assert occurrences(ending, 2025, 5) == []
+    assert occurrences(rule("2025-01-05", WEEKLY, end="2025-01-12"), 2025, 1) == [date(2025, 1, 5), date(2025, 1, 12)]
+
+
+@pytest.mark.parametrize("change, message", [
+    ({"item": " "}, "needs an item"),
+    ({"amount_paise": 0}, "positive amount"),
+    ({"amount_paise": 10.5}, "positive amount"),
+    ({"frequency": "daily"}, "Frequency must be one of"),
+    ({"every": 0}, "1 or more"),
+    ({"start": "31/01/2025"}, "YYYY-MM-DD"),
+    ({"end": "2024-12-31"}, "end before it starts"),
+])
+def test_invalid_rules_are_rejected(change, message):
+    raw = {"item": "Rent", "amount_paise": 100, "start": "2025-01-31", "frequency": MONTHLY}
+    with pytest.raises(ValueError, match=message):
+        check_rule(dict(raw, **change))
+
+
+def test_recurring_expenses_fill_the_viewed_month():
+    store = ExpenseStore()
+    store.append("2025-02-10", "Chai", 20)
+    store.set_recurring([rule("2025-01-31")])
+    frame = store.month(2025, 2)
+    assert list(frame["Item"]) == ["Chai", "Rent"]
+    assert list(frame["Recurring"]) == [False, True]
+    assert store.expense_days(2025, 2) == {10, 28}
+    store.set_recurring([])
+    assert store.month_total(2025, 2) == 2000
+
+
+def test_budgets_by_item_category_and_overall():
+    store = ExpenseStore()
+    for day, item, rupees in [(1, "Uber", 100), (3, "Metro", 50), (5, "Uber", 200), (6, "Groceries", 400)]:
+        store.append(f"2026-10-0{day}", item, rupees)
+    store.set_budgets({"Transport": 20000, "uber": 50000, OVERALL: 60000})
+    status = {name: (spent, over_day) for name, _, spent, over_day in store.budget_status(2026, 10)}
+    assert status["Transport"] == (35000, 5)
+    assert status["uber"] == (30000, None)
+    assert status[OVERALL] == (75000, 6)
+    assert [spent for _, _, spent, _ in store.budget_status(2026, 11)] == [0, 0, 0]
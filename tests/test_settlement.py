@@ -0,0 +1,83 @@
+"""Settlement plans clear every balance, with the fewest transfers for small groups."""
+import random
+
+import pytest
+
+from settlement import EXACT_LIMIT, settle
+
+
+def random_balances(rng, n):
+    balances = {f"M{i}": rng.randint(-5000, 5000) for i in range(n)}
+    balances["M0"] -= sum(balances.values())
+    return balances
+
+
+def zero_sum_pairs(rng, pairs):
+    # Members paired off so every pair nets to zero: the optimum is one transfer per pair
+    balances = {}
+    for i in range(pairs):
+        amount = rng.randint(1, 5000)
+        balances[f"D{i}"] = -amount
+        balances[f"C{i}"] = amount
+    return balances
+
+
+def fewest_transfers(balances):
+    # Brute force: n non-zero members need n - (most disjoint zero-sum subgroups) transfers
+    values = [value for value in balances.values() if value]
+
+    def most_groups(remaining):
+        if not remaining:
+            return 0
+        first, rest = remaining[0], remaining[1:]
+        best = 0
+        for mask in range(1 << len(rest)):
+            chosen = [rest[i] for i in range(len(rest)) if mask >> i & 1]
+            if first + sum(chosen) == 0:
+                others = [rest[i] for i in range(len(rest)) if not mask >> i & 1]
+                best = max(best, 1 + most_groups(others))
+        return best
+
+    return len(values) - most_groups(values)
+
+
+def assert_clears(balances, transfers):
+    left = dict(balances)
+    for payer, payee, amount in transfers:
+        assert amount > 0
+        assert left[payer] < 0 < left[payee]
+        left[payer] += amount
+        left[payee] -= amount
+    assert not any(left.values())
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_exact_settlement_is_minimal(seed):
+    rng = random.Random(seed)
+    balances = random_balances(rng, rng.randint(1, 7))
+    if seed % 2:
+        # Hidden zero-sum subgroups are where a greedy plan loses
+        balances = dict(balances, **zero_sum_pairs(rng, 2))
+    transfers = settle(balances)
+    assert_clears(balances, transfers)
+    assert len(transfers) == fewest_transfers(balances)
+
+
+def test_exact_settlement_finds_pairs():
+    balances = {"A": -700, "B": -300, "C": 300, "D": 700}
+    transfers = settle(balances)
+    assert sorted(transfers) == [("A", "D", 700), ("B", "C", 300)]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_greedy_settlement_clears_large_groups(seed):
+    rng = random.Random(seed)
+    balances = random_balances(rng, EXACT_LIMIT + 1 + rng.randint(0, 200))
+    transfers = settle(balances)
+    assert_clears(balances, transfers)
+    assert len(transfers) <= sum(1 for value in balances.values() if value) - 1
+
+
+def test_settled_group_needs_no_transfers():
+    assert settle({}) == []
+    assert settle({"A": 0, "B": 0}) == []
@@ -0,0 +1,189 @@
+"""SQLiteStorage: event replay, snapshots, optimistic concurrency and write checks."""
+import random
+
+import pytest
+
+import storage as storage_module
+from events import GroupState
+from splits import EQUAL, EXACT, everyone
+from storage import SQLiteStorage, VersionConflict
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteStorage(str(tmp_path / "expenses.db"))
+    yield store
+    store.close()
+
+
+def expense(members, rng, currency="INR"):
+    amount = rng.randint(1, 100000)
+    if rng.random() < 0.5:
+        split = [EQUAL, everyone(len(members)), None]
+    else:
+        first = rng.randint(0, amount)
+        split = [EXACT, 0b11, [first, amount - first]]
+    return {
+        "desc": f"Expense {rng.randint(1, 999)}", "amount_minor": amount, "paid_by": rng.choice(members),
+        "split": split, "currency": currency, "date": "2026-10-01",
+    }
+
+
+def without_empty_books(group):
+    # A replayed ledger keeps a currency's all-zero book after its last expense goes
+    group = dict(group)
+    group["balances"] = {currency: book for currency, book in group["balances"].items() if any(book.values())}
+    return group
+
+
+def random_history(store, rng, writes):
+    """Make `writes` random writes; return {version: group as loaded right after it}."""
+    store.create_group("trip")
+    members = ["A", "B", "C"]
+    for member in members:
+        store.add_member("trip", member)
+    states = {}
+    for _ in range(writes):
+        ids = [e["id"] for e in store.load_group("trip")["expenses"]]
+        roll = rng.random()
+        if roll < 0.4 or not ids:
+            batch = [expense(members, rng, rng.choice(["INR", "USD"])) for _ in range(rng.randint(1, 4))]
+            version = store.add_expenses("trip", batch)
+        elif roll < 0.6:
+            version = store.edit_expense("trip", rng.choice(ids), expense(members, rng))
+        elif roll < 0.8:
+            version = store.delete_expense("trip", rng.choice(ids))
+        else:
+            payer, payee = rng.sample(members, 2)
+            version = store.add_payment("trip", {"payer": payer, "payee": payee, "amount_minor": rng.randint(1, 5000)})
+        states[version] = store.load_group("trip")
+    return states
+
+
+def full_replay(store, version):
+    state = GroupState()
+    for event in store.group_history("trip"):
+        if event["seq"] > version:
+            break
+        state.apply(event["seq"], event["kind"], event["payload"])
+    return state.to_group()
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_replay_matches_live_state(store, monkeypatch, seed):
+    # Snapshot often, so most versions are a snapshot plus a short tail
+    monkeypatch.setattr(storage_module, "SNAPSHOT_EVERY", 7)
+    states = random_history(store, random.Random(seed), 60)
+    for version, live in states.items():
+        at = store.group_at("trip", version)
+        assert at["version"] == version
+        assert without_empty_books(at) == without_empty_books(live)
+        assert without_empty_books(full_replay(store, version)) == without_empty_books(at)
+
+
+def test_old_snapshots_are_pruned(store, monkeypatch):
+    monkeypatch.setattr(storage_module, "SNAPSHOT_EVERY", 5)
+    random_history(store, random.Random(0), 80)
+    seqs = [seq for (seq,) in store._conn.execute("SELECT seq FROM group_snapshots ORDER BY seq")]
+    assert seqs[0] == 0
+    assert len(seqs) == 1 + storage_module.SNAPSHOTS_KEPT
+
+
+def test_each_write_is_one_event(store):
+    store.create_group("trip")
+    store.add_member("trip", "A")
+    store.add_member("trip", "B")
+    store.add_expenses("trip", [expense(["A", "B"], random.Random(0))])
+    events = store.group_history("trip")
+    assert [event["seq"] for event in events] == [1, 2, 3]
+    assert [event["kind"] for event in events] == ["member_added", "member_added", "expenses_added"]
+    assert store.group_history("trip", since=1, limit=1)[0]["seq"] == 2
+    assert events[0]["payload"] == {"member": "A"}
+
+
+def test_stale_write_raises_version_conflict(store):
+    store.create_group("trip")
+    store.add_member("trip", "A")
+    seen = store.add_member("trip", "B")
+    store.add_member("trip", "C")  # someone else writes meanwhile
+    with pytest.raises(VersionConflict) as conflict:
+        store.add_expenses("trip", [expense(["A", "B"], random.Random(0))], expected_version=seen)
+    assert conflict.value.version == 3
+    assert store.group_version("trip") == 3
+    assert store.load_group("trip")["expenses"] == []
+    assert store.add_member("trip", "D", expected_version=3) == 4
+
+
+def test_no_op_writes_leave_the_version_alone(store):
+    store.create_group("trip")
+    assert store.add_member("trip", "A") == 1
+    assert store.add_member("trip", "A") == 1
+    assert store.add_expenses("trip", []) == 1
+    with pytest.raises(KeyError):
+        store.delete_expense("trip", 42)
+    assert store.group_version("trip") == 1
+    assert len(store.group_history("trip")) == 1
+
+
+def test_expense_ids_are_never_reused(store):
+    store.create_group("trip")
+    store.add_member("trip", "A")
+    rng = random.Random(0)
+    first = [expense(["A"], rng) for _ in range(2)]
+    for item in first:
+        item["split"] = [EQUAL, 1, None]
+    store.add_expenses("trip", first)
+    store.delete_expense("trip", first[1]["id"])
+    second = dict(first[0], split=[EQUAL, 1, None])
+    store.add_expenses("trip", [second])
+    assert second["id"] > first[1]["id"]
+
+
+@pytest.mark.parametrize("change, message", [
+    ({"amount_minor": 0}, "positive amount"),
+    ({"amount_minor": -500}, "positive amount"),
+    ({"amount_minor": 12.5}, "positive amount"),
+    ({"paid_by": "Z"}, "not a group member"),
+    ({"split": [EQUAL, 0b100, None]}, "all of them in the group"),
+    ({"currency": "rupees"}, "currency code"),
+    ({"date": "01/10/2026"}, "YYYY-MM-DD"),
+])
+def test_invalid_expenses_are_rejected(store, change, message):
+    store.create_group("trip")
+    store.add_member("trip", "A")
+    store.add_member("trip", "B")
+    bad = {**expense(["A", "B"], random.Random(0)), "split": [EQUAL, 0b11, None], **change}
+    with pytest.raises(ValueError, match=message):
+        store.add_expenses("trip", [bad])
+    assert store.group_version("trip") == 2
+
+
+def test_invalid_payments_are_rejected(store):
+    store.create_group("trip")
+    store.add_member("trip", "A")
+    store.add_member("trip", "B")
+    for payment in [
+        {"payer": "A", "payee": "ghost", "amount_minor": 100},
+        {"payer": "A", "payee": "A", "amount_minor": 100},
+        {"payer": "A", "payee": "B", "amount_minor": 0},
+        {"payer": "A", "payee": "B", "amount_minor": True},
+    ]:
+        with pytest.raises(ValueError):
+            store.add_payment("trip", payment)
+    assert store.group_version("trip") == 2
+    store.add_payment("trip", {"payer": "B", "payee": "A", "amount_minor": 100})
+    assert store.load_group("trip")["balances"]["INR"] == {"A": -100, "B": 100}
+
+
+def test_order_claims_are_shared(store):
+    store.create_group("trip")
+    order = {"receipt": "rcpt_1", "payer": "A", "payee": "B", "amount_minor": 100, "currency": "INR"}
+    record, claimed = store.claim_order("trip", order, stale_after=300)
+    assert claimed and record["state"] == "pending"
+    assert store.claim_order("trip", order, stale_after=300)[1] is False
+    store.update_order("trip", dict(record, state="failed", error="timeout", attempts=3))
+    record, claimed = store.claim_order("trip", order, stale_after=300)
+    assert claimed and record["attempts"] == 3
+    store.update_order("trip", dict(record, state="created", order_id="order_1", attempts=4))
+    assert store.claim_order("trip", order, stale_after=0)[1] is False
+    assert [o["order_id"] for o in store.orders("trip")] == ["order_1"]
@@ -0,0 +1,131 @@
+"""Vectorized balance computation for large (bulk-imported) groups.
+
+Expenses come as an ExpenseTable (see model.py), whose amount, payer,
+mode and mask columns load straight into NumPy. Amounts must all be in
+one currency: callers pick the expenses of one currency or pass amounts
+converted with fx.RateTable. Splits are expanded into
+a sparse member x expense split matrix in COO form (row = member id,
+col = expense, value = share in paise). Net balances are then two
+weighted bincounts: what each member paid minus what each member owes.
+"""
+from itertools import chain
+
+import numpy as np
+
+from model import MODE_CODES
+from splits import EQUAL, everyone, member_ids, shares as split_shares
+
+# Below this many expenses the per-expense ledger loop is faster
+SCALAR_LIMIT = 500
+# Expenses per block when unpacking member masks into bits
+MASK_CHUNK = 1 << 16
+EQUAL_CODE = MODE_CODES[EQUAL]
+
+
+def _mask_bits(masks, member_count):
+    """(expense, member id) pairs of the set bits, by expense then id."""
+    shifts = np.arange(min(member_count, 64), dtype=np.uint64)
+    positions, ids = [], []
+    for start in range(0, len(masks), MASK_CHUNK):
+        bits = (masks[start:start + MASK_CHUNK, None] >> shifts) & np.uint64(1)
+        chunk_positions, chunk_ids = np.nonzero(bits)
+        positions.append(chunk_positions + start)
+        ids.append(chunk_ids)
+    if not positions:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(positions).astype(np.int64), np.concatenate(ids).astype(np.int64)
+
+
+def split_matrix(table, positions, member_count, amounts):
+    """Return (rows, cols, shares) of the split matrix for the expenses at `positions`.
+
+    Equal splits are expanded with NumPy straight from their member masks
+    and follow money.split_paise: the leftover paise of each expense go
+    one each to its lowest member ids. Weighted, share and exact splits
+    (rarer) go through splits.shares. `amounts` holds every expense's amount.
+    """
+    is_equal = table.mode_array()[positions] == EQUAL_CODE
+    equal = positions[is_equal]
+    count = len(equal)
+    equal_amounts = amounts[equal]
+    masks = table.mask_array()
+    if masks is not None:
+        local, rows = _mask_bits(masks[equal], member_count)
+        sizes = np.bincount(local, minlength=count)
+    else:
+        ids = [member_ids(table.masks[i]) for i in equal.tolist()]
+        sizes = np.fromiter(map(len, ids), dtype=np.int64, count=count)
+        rows = np.fromiter(chain.from_iterable(ids), dtype=np.int64, count=int(sizes.sum()))
+        local = np.repeat(np.arange(count), sizes)
+    cols = equal[local]
+
+    # Position of each entry within its expense's split
+    starts = np.cumsum(sizes) - sizes
+    position = np.arange(len(rows)) - starts[local]
+    base, remainder = np.divmod(equal_amounts, np.maximum(sizes, 1))
+    values = base[local] + (position < remainder[local])
+
+    other = [
+        (member_id, i, share)
+        for i in positions[~is_equal].tolist()
+        for member_id, share in split_shares(table[i].split, int(amounts[i]))
+    ]
+    if other:
+        extra_rows, extra_cols, extra_values = (np.array(column, dtype=np.int64) for column in zip(*other))
+        rows = np.concatenate([rows, extra_rows])
+        cols = np.concatenate([cols, extra_cols])
+        values = np.concatenate([values, extra_values])
+    return rows, cols, values
+
+
+def vectorized_balances(members, table, positions=None, amounts=None):
+    """Net balance in paise per member, computed with NumPy.
+
+    Only the expenses at `positions` count (all by default). `amounts`
+    replaces the table's amounts, e.g. with amounts converted to another
+    currency.
+    """
+    group_size = len(members)
+    if amounts is None:
+        amounts = table.amount_array()
+    if positions is None:
+        positions = np.arange(len(table))
+    payers = table.payer_array()[positions]
+
+    # Equal splits across the whole group (the default in the UI) need no
+    # per-member matrix entries: everyone owes the same base share and the
+    # first members pick up the leftover paise.
+    all_members = everyone(group_size)
+    masks = table.mask_array()
+    if masks is None:
+        in_all = np.fromiter((table.masks[i] == all_members for i in positions.tolist()), dtype=bool, count=len(positions))
+    elif group_size <= 64:
+        in_all = masks[positions] == np.uint64(all_members)
+    else:  # "everyone" needs more bits than any stored mask has
+        in_all = np.zeros(len(positions), dtype=bool)
+    is_everyone = in_all & (table.mode_array()[positions] == EQUAL_CODE)
+    owed_everyone = np.zeros(group_size, dtype=np.int64)
+    if group_size and is_everyone.any():
+        base, remainder = np.divmod(amounts[positions[is_everyone]], group_size)
+        # Member k gets an extra paisa for every expense whose remainder exceeds k
+        extra = len(remainder) - np.cumsum(np.bincount(remainder, minlength=group_size))
+        owed_everyone += int(base.sum()) + extra
+
+    rows, _, shares = split_matrix(table, positions[~is_everyone], group_size, amounts)
+
+    # Float64 bincounts are exact for totals below 2**53 paise
+    paid = np.rint(np.bincount(payers, weights=amounts[positions], minlength=group_size)).astype(np.int64)
+    owed = np.rint(np.bincount(rows, weights=shares, minlength=group_size)).astype(np.int64)
+    net = paid - owed - owed_everyone
+    return {member: int(net[i]) for i, member in enumerate(members)}
+
+
+def balances_by_currency(members, table):
+    """{currency: net balances} over the table, each currency on its own."""
+    codes = table.currency_array()
+    books = {}
+    for code, currency in enumerate(table.currency_names):
+        positions = np.flatnonzero(codes == code)
+        if len(positions):
+            books[currency] = vectorized_balances(members, table, positions)
+    return books